@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Itinerary streaming (SSE, /trip/<pk>/stream/) async view. Uni WSGI worker'ni
+band qilmasdan ishlatish uchun ilovani ASGI server orqali ishga tushiring:
+
+    uvicorn config.asgi:application --workers 2
 """
 
 import os
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# ASGI ostida SSE worker'ni bloklamaydi — itinerary streaming standart holatda yoqiladi
+os.environ.setdefault('ITINERARY_STREAMING', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,328 @@
+# config/benchmarks.py
+#
+# View'lar uchun query soni / javob vaqti regression testlarining umumiy qismi (trips/tests.py, stories/tests.py).
+# - seed_dataset(): bulk factory'lar — minglab user/trip/story/komment/layk bir necha soniyada
+# - tashqi servislar lokal stub'lar bilan: Groq -> StubGroq, Amadeus -> LocalProvider, Cloudinary -> InMemoryStorage
+# - natijalar BENCHMARK_OUTPUT (JSON) fayliga: har bir benchmark uchun joriy va oldingi ishga tushirish qiymatlari
+#
+# Ishga tushirish: python manage.py test trips stories
+# Sekin CI mashinasida vaqt chegaralari: BENCHMARK_TIME_FACTOR=3
+
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from config.media import clear_media_urls
+from stories.models import Comment, Story, StoryImage
+from trips.models import Profile, Trip, normalize_search_text
+from trips.places import place_ids
+
+BENCHMARK_OUTPUT = Path(os.getenv('BENCHMARK_OUTPUT', settings.BASE_DIR / 'benchmark_results.json'))
+BENCHMARK_TIME_FACTOR = float(os.getenv('BENCHMARK_TIME_FACTOR', 1))
+RUN_ID = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+DESTINATIONS = ['Paris', 'Tokyo', 'Samarkand', 'New York', 'São Paulo', 'Istanbul', 'Rome', 'Bukhara', 'Kyoto', 'Lisbon']
+BUDGETS = ['Economy', 'Standard', 'Luxury']
+
+STUB_ITINERARY = {
+    'estimated_cost': 900,
+    'currency': 'USD',
+    'days': [
+        {
+            'day': day,
+            'title': f"Day {day} highlights",
+            'activities': [
+                {
+                    'time': f"{9 + 3 * n:02d}:00",
+                    'title': f"Activity {n + 1}",
+                    'description': "Walk through the old town and try the local food.",
+                    'location': "City centre",
+                    'type': 'morning',
+                    'icon': 'coffee',
+                    'cost': f"${10 * (n + 1)}",
+                }
+                for n in range(4)
+            ],
+        }
+        for day in range(1, 4)
+    ],
+}
+
+# Tashqi servislarsiz sozlamalar
+STUB_SETTINGS = {
+    # Cloudinary o'rniga
+    'STORAGES': {**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}},
+    # Amadeus o'rniga yozib olingan offer'lar
+    'FLIGHT_PROVIDER': 'local',
+    # Groq: StubGroq (BenchmarkTestCase patch qiladi), generatsiya request ichida va streaming'siz
+    'GROQ_API_KEY': 'stub',
+    'ITINERARY_ASYNC': False,
+    'ITINERARY_STREAMING': False,
+    'ITINERARY_MAX_RETRIES': 1,
+    'STORY_IMAGE_ASYNC': False,
+    'TRIP_EXPORT_USE_THREADS': False,
+    # Fon bufferlari (ko'rishlar, qidiruv navbati, LLM hisobi) test davomida thread'da flush qilinmasin
+    'STORY_VIEW_FLUSH_INTERVAL': 3600,
+    'STORY_SEARCH_REINDEX_INTERVAL': 3600,
+    'LLM_USAGE_FLUSH_INTERVAL': 3600,
+    'PERF_SAMPLE_RATE': 0,
+}
+
+
+class StubGroq:
+    """groq.Groq o'rniga: tarmoqsiz, darhol STUB_ITINERARY qaytaradi."""
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, model, stream=False, **kwargs):
+        StubGroq.calls += 1
+        content = json.dumps(STUB_ITINERARY)
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+# --- Bulk factory'lar ---
+
+def make_users(count, prefix='user'):
+    # Bitta parol hash'i hammaga: har bir user uchun PBKDF2 seed'ni daqiqalarga cho'zadi
+    password = make_password('bench-pass')
+    users = User.objects.bulk_create([
+        User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password=password)
+        for i in range(count)
+    ])
+    # bulk_create signal yubormaydi — Profile'lar ham bulk (har uchinchisida avatar)
+    Profile.objects.bulk_create([
+        Profile(user=user, profile_picture=f"profile_pics/{user.pk}.jpg" if i % 3 == 0 else None)
+        for i, user in enumerate(users)
+    ])
+    return users
+
+
+def make_trips(users, per_user, itinerary=STUB_ITINERARY):
+    places = place_ids(DESTINATIONS)
+    trips = []
+    for user_index, user in enumerate(users):
+        for n in range(per_user):
+            destination = DESTINATIONS[(user_index + n) % len(DESTINATIONS)]
+            trips.append(Trip(
+                user=user,
+                destination=destination,
+                destination_search=normalize_search_text(destination),  # bulk_create save() ni chaqirmaydi
+                place_id=places.get(destination),
+                duration_days=3,
+                budget_type=BUDGETS[n % len(BUDGETS)],
+                budget_amount=300 + 50 * n,
+                itinerary=itinerary,
+                generation_status=Trip.GENERATION_DONE,
+            ))
+    return Trip.objects.bulk_create(trips, batch_size=1000)
+
+
+def make_stories(authors, count, images_per_story=3):
+    places = place_ids(DESTINATIONS)
+    stories = Story.objects.bulk_create([
+        Story(
+            author=authors[i % len(authors)],
+            title=f"Story {i}",
+            location=DESTINATIONS[i % len(DESTINATIONS)],
+            place_id=places.get(DESTINATIONS[i % len(DESTINATIONS)]),
+            content="A long day of walking, eating and getting lost. " * 8,
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    StoryImage.objects.bulk_create([
+        StoryImage(
+            story=story,
+            image=f"story_images/{story.pk}-{n}.jpg",
+            thumbnail=f"story_images/thumbs/{story.pk}-{n}.webp",
+            feed_image=f"story_images/feed/{story.pk}-{n}.webp",
+            status=StoryImage.STATUS_READY,
+            width=2048,
+            height=1365,
+        )
+        for story in stories for n in range(images_per_story)
+    ], batch_size=1000)
+    return stories
+
+
+def make_comments(stories, users, count, hot_story=None, hot_count=0):
+    """count ta komment story'lar bo'yicha teng, hot_story'ga esa qo'shimcha hot_count ta."""
+    comments = [
+        Comment(story=stories[i % len(stories)], author=users[(i * 7) % len(users)], text=f"Comment {i}")
+        for i in range(count)
+    ]
+    if hot_story is not None:
+        comments += [
+            Comment(story=hot_story, author=users[(i * 11) % len(users)], text=f"Hot comment {i}")
+            for i in range(hot_count)
+        ]
+    Comment.objects.bulk_create(comments, batch_size=2000)
+    _sync_counter(Comment, 'comments_count', [(c.story_id, 1) for c in comments])
+
+
+def make_memberships(through, counter_field, stories, users, count):
+    """Like/Save: takrorlanmaydigan (story, user) juftliklari + denormalizatsiya qilingan hisoblagich."""
+    pairs = []
+    per_story = max(count // len(stories), 1)
+    for i, story in enumerate(stories):
+        for n in range(per_story):
+            pairs.append((story.pk, users[(i + n * 13) % len(users)].pk))
+            if len(pairs) >= count:
+                break
+        if len(pairs) >= count:
+            break
+    pairs = list(dict.fromkeys(pairs))
+    through.objects.bulk_create([through(story_id=s, user_id=u) for s, u in pairs], batch_size=2000)
+    _sync_counter(through, counter_field, [(s, 1) for s, _ in pairs])
+
+
+def _sync_counter(model, counter_field, increments):
+    totals = {}
+    for story_id, delta in increments:
+        totals[story_id] = totals.get(story_id, 0) + delta
+    stories = [Story(pk=story_id, **{counter_field: total}) for story_id, total in totals.items()]
+    Story.objects.bulk_update(stories, [counter_field], batch_size=1000)
+
+
+def seed_dataset(users=2000, trips_per_user=2, owner_trips=40, stories=1500, comments=15000,
+                 hot_comments=2000, likes=20000, saves=5000):
+    """Realistik hajm. owner — benchmark'lar shu user nomidan; hot_story — minglab kommentli story."""
+    people = make_users(users)
+    owner = people[0]
+
+    trips = make_trips(people[1:], trips_per_user)
+    own = make_trips([owner], owner_trips)
+    # Detail sahifa ItineraryDay/Activity qatorlaridan o'qiydi — faqat owner'ning triplari uchun
+    for trip in own:
+        trip.sync_itinerary_rows()
+
+    story_rows = make_stories(people, stories)
+    hot_story = story_rows[-1]  # eng yangisi: feed'ning birinchi sahifasida
+    make_comments(story_rows, people, comments, hot_story=hot_story, hot_count=hot_comments)
+    make_memberships(Story.likes.through, 'likes_count', story_rows, people, likes)
+    make_memberships(Story.saved_by.through, 'saves_count', story_rows, people, saves)
+
+    return SimpleNamespace(
+        owner=owner,
+        users=people,
+        trips=trips,
+        owner_trips=own,
+        stories=story_rows,
+        hot_story=hot_story,
+    )
+
+
+# --- Natijalar fayli ---
+
+_results = {}
+
+
+def record_result(name, **values):
+    _results[name] = {'run_id': RUN_ID, **values}
+
+
+def write_results():
+    """Joriy natijalarni faylga qo'shadi; oldingi ishga tushirish qiymati 'previous' da qoladi."""
+    if not _results:
+        return
+    try:
+        existing = json.loads(BENCHMARK_OUTPUT.read_text()).get('benchmarks', {})
+    except (FileNotFoundError, ValueError):
+        existing = {}
+
+    for name, result in _results.items():
+        old = existing.get(name)
+        if old and old.get('run_id') != RUN_ID:
+            result['previous'] = {key: old.get(key) for key in ('run_id', 'queries', 'ms')}
+        elif old and 'previous' in old:
+            result['previous'] = old['previous']
+        existing[name] = result
+
+    BENCHMARK_OUTPUT.write_text(json.dumps({'run_id': RUN_ID, 'benchmarks': existing}, indent=2, sort_keys=True))
+    _results.clear()
+
+
+@override_settings(**STUB_SETTINGS)
+class BenchmarkTestCase(TestCase):
+    """Seed class uchun bir marta (setUpTestData); har bir test tranzaksiyada, oxirida rollback."""
+    seed_options = {}
+    runs = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        groq_patch = mock.patch('trips.llm.Groq', StubGroq)
+        groq_patch.start()
+        cls.addClassCleanup(groq_patch.stop)
+        # Gateway client'ining HTTP transport'i birinchi marta httpcore'ni import qiladi (~0.2 s) — o'lchovga kirmasin
+        httpx.Client().close()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(**cls.seed_options)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        write_results()
+
+    def setUp(self):
+        self.reset_caches()
+
+    def reset_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        clear_media_urls()
+
+    def assertBenchmark(self, name, func, max_queries, max_ms, status=200, runs=None, before=None):
+        """
+        func() ni runs marta chaqiradi. Query soni — birinchi (sovuq) chaqiruvdan, vaqt — median.
+        before() har bir chaqiruvdan oldin (masalan keshni tozalash), o'lchovga kirmaydi.
+        """
+        timings = []
+        queries = None
+        response = None
+        for run in range(runs or self.runs):
+            if before is not None:
+                before()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = func()
+                timings.append((time.perf_counter() - started) * 1000)
+            if queries is None:
+                queries = context.captured_queries
+
+            self.assertEqual(response.status_code, status, f"{name}: unexpected status")
+
+        elapsed_ms = statistics.median(timings)
+        limit_ms = max_ms * BENCHMARK_TIME_FACTOR
+        record_result(
+            name,
+            queries=len(queries),
+            max_queries=max_queries,
+            ms=round(elapsed_ms, 1),
+            max_ms=limit_ms,
+            passed=len(queries) <= max_queries and elapsed_ms <= limit_ms,
+        )
+
+        sql = '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries, start=1))
+        self.assertLessEqual(len(queries), max_queries, f"{name}: {len(queries)} queries\n{sql}")
+        self.assertLessEqual(elapsed_ms, limit_ms, f"{name}: {elapsed_ms:.1f} ms")
+        return response
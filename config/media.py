@@ -0,0 +1,57 @@
+# config/media.py
+#
+# Media fayl URL'larini memoizatsiya qilish. Feed/detail sahifalarida har bir avatar va rasm uchun
+# storage.url() chaqiriladi; Cloudinary'da bu har safar URL qurish (SDK, transformatsiyalar) demakdir.
+# (storage, fayl nomi) bo'yicha chegaralangan LRU + TTL: nom o'zgarsa (yangi rendition) kalit ham o'zgaradi.
+# Storage MEDIA_STORAGE / STORAGES orqali tanlanadi (settings.py).
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# (id(storage), name) -> (url, muddati)
+_urls = OrderedDict()
+_urls_lock = threading.Lock()
+
+
+def media_url(fieldfile):
+    """FieldFile URL'i (bo'sh bo'lsa None). MEDIA_URL_CACHE_TTL=0 bo'lsa keshsiz."""
+    if not fieldfile:
+        return None
+
+    ttl = settings.MEDIA_URL_CACHE_TTL
+    if not ttl:
+        return fieldfile.url
+
+    key = (id(fieldfile.storage), fieldfile.name)
+    now = time.monotonic()
+    with _urls_lock:
+        cached = _urls.get(key)
+        if cached is not None and cached[1] > now:
+            _urls.move_to_end(key)
+            return cached[0]
+
+    # URL lock'dan tashqarida quriladi (tarmoq/SDK sekin bo'lishi mumkin)
+    url = fieldfile.url
+    with _urls_lock:
+        _urls[key] = (url, now + ttl)
+        _urls.move_to_end(key)
+        while len(_urls) > settings.MEDIA_URL_CACHE_SIZE:
+            _urls.popitem(last=False)
+    return url
+
+
+def clear_media_urls():
+    with _urls_lock:
+        _urls.clear()
+
+
+@receiver(setting_changed)
+def reset_media_urls(setting, **kwargs):
+    # override_settings(STORAGES=...) da eski storage URL'lari qaytmasligi uchun
+    if setting in ('STORAGES', 'MEDIA_URL', 'MEDIA_URL_CACHE_TTL', 'MEDIA_URL_CACHE_SIZE'):
+        clear_media_urls()
@@ -0,0 +1,203 @@
+# config/perf.py
+#
+# Request darajasidagi o'lchovlar: umumiy vaqt, SQL so'rovlar soni/vaqti (connection.execute_wrapper)
+# va tashqi chaqiruvlar (Groq, Amadeus, media storage) — `with timed('groq'): ...`.
+# Natija: `Server-Timing` header, bitta strukturali log qatori ("config.perf" logger) va
+# ixtiyoriy in-process histogramma (PERF_HISTOGRAM; staff uchun /perf/metrics/).
+#
+# PERF_SAMPLE_RATE=0 bo'lsa middleware faqat bitta random() qiladi, timed() esa bitta ContextVar.get().
+# Fon ishchilaridagi (thread pool) timed() chaqiruvlari faqat histogrammaga yoziladi.
+
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('perf_request', default=None)
+
+# (route, metrika) -> oxirgi PERF_HISTOGRAM_SIZE ta qiymat (ms)
+_samples = defaultdict(lambda: deque(maxlen=settings.PERF_HISTOGRAM_SIZE))
+_samples_lock = threading.Lock()
+
+
+class RequestTimings:
+    __slots__ = ('started', 'sql_count', 'sql_ms', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.spans = {}  # nom -> [soni, ms]
+
+    def add_span(self, name, elapsed_ms):
+        span = self.spans.setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += elapsed_ms
+
+
+def record_sample(route, metric, value_ms):
+    if not settings.PERF_HISTOGRAM:
+        return
+    with _samples_lock:
+        _samples[(route, metric)].append(value_ms)
+
+
+@contextmanager
+def timed(name):
+    """Tashqi chaqiruv vaqtini joriy request'ga (bo'lsa) va histogrammaga yozadi."""
+    timings = _current.get()
+    if timings is None and not settings.PERF_HISTOGRAM:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if timings is not None:
+            timings.add_span(name, elapsed_ms)
+        record_sample('external', name, elapsed_ms)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql_count += 1
+        timings.sql_ms += (time.perf_counter() - started) * 1000
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def _finish(request, response, timings):
+    total_ms = (time.perf_counter() - timings.started) * 1000
+    route = _route(request)
+
+    parts = [f'total;dur={total_ms:.1f}', f'db;dur={timings.sql_ms:.1f};desc="{timings.sql_count} queries"']
+    parts += [f'{name};dur={ms:.1f}' for name, (count, ms) in timings.spans.items()]
+    if settings.PERF_SERVER_TIMING:
+        response['Server-Timing'] = ', '.join(parts)
+
+    spans = ''.join(f' {name}_ms={ms:.1f} {name}_calls={count}' for name, (count, ms) in timings.spans.items())
+    logger.info(
+        "method=%s route=%s status=%s total_ms=%.1f db_queries=%d db_ms=%.1f%s",
+        request.method, route, response.status_code, total_ms, timings.sql_count, timings.sql_ms, spans,
+        extra={'perf': {
+            'method': request.method,
+            'route': route,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_queries': timings.sql_count,
+            'db_ms': round(timings.sql_ms, 1),
+            'spans': {name: {'calls': count, 'ms': round(ms, 1)} for name, (count, ms) in timings.spans.items()},
+        }},
+    )
+
+    record_sample(route, 'total', total_ms)
+    record_sample(route, 'db', timings.sql_ms)
+    return response
+
+
+class PerfMiddleware:
+    """
+    Tanlangan (PERF_SAMPLE_RATE) so'rovlarni o'lchaydi. Streaming javoblarda vaqt — header'gacha.
+    Async view'larda SQL ishchi thread'larda bajariladi, shuning uchun faqat umumiy vaqt va span'lar.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        rate = settings.PERF_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, timings)
+
+
+# --- Histogramma ---
+
+def _percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def histogram():
+    with _samples_lock:
+        snapshot = {key: sorted(values) for key, values in _samples.items() if values}
+
+    data = defaultdict(dict)
+    for (route, metric), values in snapshot.items():
+        data[route][metric] = {
+            'count': len(values),
+            'p50': round(_percentile(values, 0.5), 1),
+            'p90': round(_percentile(values, 0.9), 1),
+            'p99': round(_percentile(values, 0.99), 1),
+            'max': round(values[-1], 1),
+        }
+    return dict(data)
+
+
+def reset_histogram():
+    with _samples_lock:
+        _samples.clear()
+
+
+@staff_member_required
+def perf_metrics(request):
+    if request.method == 'POST' and request.POST.get('reset'):
+        reset_histogram()
+    return JsonResponse({
+        'sample_rate': settings.PERF_SAMPLE_RATE,
+        'window': settings.PERF_HISTOGRAM_SIZE,
+        'routes': histogram(),
+    })
@@ -29,6 +29,90 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG') == 'True'
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+
+# Itinerary generatsiyasi (trips/generation.py)
+# ITINERARY_ASYNC=False -> request ichida (test/debug uchun)
+# ITINERARY_USE_THREADS=False -> faqat `manage.py process_itineraries` ishchisi bajaradi (Vercel)
+ITINERARY_ASYNC = os.getenv('ITINERARY_ASYNC', 'True') == 'True'
+ITINERARY_USE_THREADS = os.getenv('ITINERARY_USE_THREADS', 'True') == 'True'
+ITINERARY_WORKERS = int(os.getenv('ITINERARY_WORKERS', 4))
+ITINERARY_MAX_RETRIES = int(os.getenv('ITINERARY_MAX_RETRIES', 3))
+ITINERARY_BACKOFF_BASE = float(os.getenv('ITINERARY_BACKOFF_BASE', 2))
+ITINERARY_BACKOFF_MAX = float(os.getenv('ITINERARY_BACKOFF_MAX', 30))
+# Streaming: kunlar tayyor bo'lishi bilan ItineraryDay qatorlariga yoziladi va /trip/<pk>/stream/ (SSE) orqali
+# brauzerga boradi. Standart holatda faqat ASGI'da yoqiladi (config/asgi.py) — WSGI'da SSE javobi oxirigacha
+# buferlanib worker'ni band qiladi, shuning uchun sahifa status polling qiladi
+ITINERARY_STREAMING = os.getenv('ITINERARY_STREAMING', 'False') == 'True'
+ITINERARY_STREAM_TIMEOUT = 180
+
+# LLM gateway (trips/llm.py): bitta uzoq yashaydigan client, timeout, global semafora, bir xil so'rovlar dedup
+# LLM_BACKEND: 'groq' yoki 'fake' (tarmoqsiz, tayyor itinerary — `manage.py benchmark_llm_gateway` uchun)
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'groq')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+LLM_CONNECT_TIMEOUT = 5
+# Provayderga bir vaqtda nechta so'rov ketadi (thread pool ham, command ham)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', os.getenv('ITINERARY_MAX_CONCURRENCY', 2)))
+LLM_FAKE_LATENCY_MS = int(os.getenv('LLM_FAKE_LATENCY_MS', 0))
+# Token/latency hisobi (LLMUsage) buferdan shuncha soniyada bir yoziladi
+LLM_USAGE_FLUSH_INTERVAL = int(os.getenv('LLM_USAGE_FLUSH_INTERVAL', 30))
+
+# Itinerary keshi (trips/itinerary_cache.py)
+ITINERARY_CACHE_ENABLED = os.getenv('ITINERARY_CACHE_ENABLED', 'True') == 'True'
+ITINERARY_CACHE_TTL_DAYS = int(os.getenv('ITINERARY_CACHE_TTL_DAYS', 30))
+ITINERARY_CACHE_MAX_ENTRIES = int(os.getenv('ITINERARY_CACHE_MAX_ENTRIES', 5000))
+
+# Story ko'rishlari (stories/view_counter.py): bitta tashrifchi TTL ichida bir marta sanaladi,
+# hisoblagich bazaga fon thread'ida guruhlab yoziladi
+STORY_VIEW_DEDUPE_TTL = 24 * 60 * 60
+STORY_VIEW_FLUSH_INTERVAL = int(os.getenv('STORY_VIEW_FLUSH_INTERVAL', 30))
+STORY_VIEW_FLUSH_THRESHOLD = 500
+# Tashrifchi IP'si: 0 — REMOTE_ADDR; N — X-Forwarded-For'ning o'ngdan N-chi yozuvi (N ta ishonchli proxy orqasida).
+# Chapdagi yozuvlarni client o'zi yuboradi — ularga ishonilmaydi.
+STORY_VIEW_TRUSTED_PROXIES = int(os.getenv('STORY_VIEW_TRUSTED_PROXIES', 0))
+
+# Story rasmlari pipeline'i (stories/images.py): renditionlar fon rejimida yaratiladi
+STORY_IMAGE_ASYNC = os.getenv('STORY_IMAGE_ASYNC', 'True') == 'True'
+STORY_IMAGE_USE_THREADS = os.getenv('STORY_IMAGE_USE_THREADS', 'True') == 'True'
+STORY_IMAGE_WORKERS = int(os.getenv('STORY_IMAGE_WORKERS', 2))
+STORY_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+STORY_IMAGE_MAX_PIXELS = 40_000_000
+
+# Trip eksporti (trips/exports.py): PDF/ICS/JSON faqat fon ishchisida, tayyor fayl TRIP_EXPORT_ROOT da
+# TRIP_EXPORT_USE_THREADS=False -> faqat `manage.py process_trip_exports` ishchisi bajaradi (Vercel)
+TRIP_EXPORT_ROOT = Path(os.getenv('TRIP_EXPORT_ROOT', BASE_DIR / 'exports'))
+TRIP_EXPORT_USE_THREADS = os.getenv('TRIP_EXPORT_USE_THREADS', 'True') == 'True'
+TRIP_EXPORT_WORKERS = int(os.getenv('TRIP_EXPORT_WORKERS', 2))
+
+# Dashboard statistikasi keshi (trips/stats.py). Trip o'zgarganda signal orqali tozalanadi.
+DASHBOARD_STATS_CACHE_TTL = 60 * 60
+# Keshlar. Redis/Memcached bo'lmasa: 'default' — local-memory,
+# public share sahifalari (config/share_cache.py) uchun esa SHARE_PAGE_CACHE: 'locmem' yoki 'file'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Media URL memoizatsiyasi (config/media.py): feed'da yuzlab avatar/rasm URL'i qayta hisoblanmaydi.
+# Muddatli imzolangan URL beradigan storage bo'lsa TTL ni shu muddatdan kichik qiling (0 = o'chirilgan).
+MEDIA_URL_CACHE_SIZE = 10_000
+MEDIA_URL_CACHE_TTL = int(os.getenv('MEDIA_URL_CACHE_TTL', 60 * 60))
+SHARE_PAGE_CACHE = os.getenv('SHARE_PAGE_CACHE', 'locmem')
+if SHARE_PAGE_CACHE == 'file':
+    CACHES['share_pages'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARE_PAGE_CACHE_DIR', '/tmp/travelscout_share_pages'),
+    }
+else:
+    CACHES['share_pages'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'share-pages',
+    }
+SHARE_PAGE_CACHE_ALIAS = 'share_pages'
+SHARE_PAGE_CACHE_ENABLED = os.getenv('SHARE_PAGE_CACHE_ENABLED', 'True') == 'True'
+SHARE_PAGE_CACHE_TTL = 10 * 60  # like/izoh sonlari shu vaqtgacha eskirgan bo'lishi mumkin
+SHARE_PAGE_BROWSER_MAX_AGE = 60
+
 ALLOWED_HOSTS = ['.vercel.app', '127.0.0.1', 'localhost']
 
 
@@ -58,6 +142,8 @@ INSTALLED_APPS = [
 
 SITE_ID = 1
 MIDDLEWARE = [
+    # Birinchi: butun request vaqtini o'lchaydi (config/perf.py)
+    'config.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -71,6 +157,25 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# Request o'lchovlari (config/perf.py): 0 = o'chirilgan, 1 = har bir request, 0.05 = 5%
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', 0))
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'True') == 'True'
+# Route bo'yicha oxirgi N ta qiymatdan p50/p90/p99 (staff: /perf/metrics/). Har bir worker jarayoni alohida.
+PERF_HISTOGRAM = os.getenv('PERF_HISTOGRAM', 'False') == 'True'
+PERF_HISTOGRAM_SIZE = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Har bir o'lchangan request uchun bitta "key=value" qator (extra['perf'] — JSON formatter'lar uchun)
+        'config.perf': {'handlers': ['console'], 'level': os.getenv('PERF_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -172,8 +277,42 @@ SOCIALACCOUNT_PROVIDERS = {
     }
 }
 # Amadeus API Config
-AMADEUS_CLIENT_ID = config('AMADEUS_CLIENT_ID')
-AMADEUS_CLIENT_SECRET = config('AMADEUS_CLIENT_SECRET')
+# Client birinchi qidiruvda yaratiladi (flights/offers.py), shuning uchun kalitlarsiz ham app import bo'ladi
+AMADEUS_CLIENT_ID = config('AMADEUS_CLIENT_ID', default='')
+AMADEUS_CLIENT_SECRET = config('AMADEUS_CLIENT_SECRET', default='')
+AMADEUS_HOSTNAME = config('AMADEUS_HOSTNAME', default='test')  # Hozircha 'test' rejimdamiz
+
+# Flight provayderi (flights/providers.py): 'amadeus', 'local' (offline indeks), 'hybrid' yoki dotted path.
+# 'local' da indeks bo'sh bo'lsa flights/fixtures/recorded_flight_offers.json avtomatik yuklanadi
+FLIGHT_PROVIDER = os.getenv('FLIGHT_PROVIDER', 'amadeus')
+# True bo'lsa Amadeus javoblari lokal indeksga (RecordedFlightSearch) yozib boriladi
+FLIGHT_RECORD_OFFERS = os.getenv('FLIGHT_RECORD_OFFERS', 'False') == 'True'
+# 'hybrid' rejimida lokal yozuv shuncha soniyagacha yangi hisoblanadi
+FLIGHT_LOCAL_MAX_AGE = int(os.getenv('FLIGHT_LOCAL_MAX_AGE', 6 * 60 * 60))
+
+# Flight offer keshi: bir xil qidiruv TTL ichida Amadeus'ga qayta bormaydi (0 = o'chirilgan)
+FLIGHT_OFFER_CACHE_TTL = int(os.getenv('FLIGHT_OFFER_CACHE_TTL', 300))
+# Bitta qidiruvda Amadeus'dan olinadigan offer'lar soni (Amadeus maksimumi 250)
+FLIGHT_MAX_OFFERS = int(os.getenv('FLIGHT_MAX_OFFERS', 50))
+# Flexible/round-trip qidiruv (flights/search.py): parallel so'rovlar soni va maksimal ±N kun
+FLIGHT_SEARCH_WORKERS = int(os.getenv('FLIGHT_SEARCH_WORKERS', 8))
+FLIGHT_FLEX_MAX_DAYS = 3
+# Autocomplete va kod tekshiruvi uchun aeroportlar ro'yxati (flights/airports.py): iata,kind,name,city,country,passengers
+AIRPORTS_DATASET = os.getenv('AIRPORTS_DATASET', str(BASE_DIR / 'flights' / 'data' / 'airports.csv'))
+# Trip/Story joylarini normalizatsiya qilish uchun offline gazetteer (trips/places.py)
+PLACES_GAZETTEER = os.getenv('PLACES_GAZETTEER', str(BASE_DIR / 'trips' / 'data' / 'places.csv'))
+# Story qidiruvi (stories/search.py): faqat eng yangi shuncha moslik reytinglanadi — latency jadval hajmiga bog'liq emas
+STORY_SEARCH_CANDIDATES = int(os.getenv('STORY_SEARCH_CANDIDATES', 1000))
+# Kommentlar o'zgargan story'lar indeksi fon thread'ida shuncha soniyada (yoki navbat shuncha bo'lganda) yangilanadi
+STORY_SEARCH_REINDEX_INTERVAL = int(os.getenv('STORY_SEARCH_REINDEX_INTERVAL', 10))
+STORY_SEARCH_REINDEX_BATCH = 500
+# "For you" feed reytingi (stories/ranking.py, `manage.py rank_stories` davriy hisoblaydi)
+STORY_RANK_HALF_LIFE_HOURS = float(os.getenv('STORY_RANK_HALF_LIFE_HOURS', 24))
+# Har bir user uchun tayyor ro'yxat uzunligi va ular tanlanadigan umumiy top
+STORY_RANK_CANDIDATES = int(os.getenv('STORY_RANK_CANDIDATES', 300))
+STORY_RANK_POOL = int(os.getenv('STORY_RANK_POOL', 2000))
+# Shaxsiy ro'yxat faqat oxirgi N kunda kirgan userlar uchun quriladi
+STORY_RANK_ACTIVE_DAYS = int(os.getenv('STORY_RANK_ACTIVE_DAYS', 30))
 
 STATIC_ROOT = BASE_DIR / 'staticfiles' # Vercel shu yerga yig'adi
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -184,10 +323,18 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
 }
 
+# Media storage muhitga qarab: 'cloudinary' (prod), 'local' (MEDIA_ROOT), 'memory' (test/benchmark)
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'cloudinary')
+MEDIA_STORAGE_BACKENDS = {
+    'cloudinary': 'cloudinary_storage.storage.MediaCloudinaryStorage',
+    'local': 'django.core.files.storage.FileSystemStorage',
+    'memory': 'django.core.files.storage.InMemoryStorage',
+}
+
 STORAGES = {
-    # Media fayllar (Rasm, Video) -> Cloudinary
+    # Media fayllar (Rasm, Video) -> MEDIA_STORAGE (odatda Cloudinary)
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": MEDIA_STORAGE_BACKENDS[MEDIA_STORAGE],
     },
     # Static fayllar (CSS, JS) -> WhiteNoise
     "staticfiles": {
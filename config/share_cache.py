@@ -0,0 +1,103 @@
+# config/share_cache.py
+#
+# Ijtimoiy tarmoqlarga tarqatiladigan public sahifalar (/share/<uuid>/, /stories/<uuid>/) uchun
+# to'liq sahifa keshi. Faqat anonim GET/HEAD so'rovlar keshlanadi (login bo'lgan userga
+# shaxsiy holat — like/save, navbar — ko'rsatiladi). {% csrf_token %} chiqargan sahifa keshlanmaydi.
+#
+# Kalit = (tur, share_uuid, versiya). Versiya obyekt o'zgarganda/o'chganda yangilanadi (signals),
+# shuning uchun eski sahifa o'chirilmaydi — shunchaki unga boshqa murojaat bo'lmaydi va TTL bilan ketadi.
+# Versiya = o'zgarish vaqti (ms): ETag ham, Last-Modified ham shundan olinadi -> 304 javoblar.
+
+import functools
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def get_cache():
+    return caches[settings.SHARE_PAGE_CACHE_ALIAS]
+
+
+def version_key(kind, share_uuid):
+    return f"share:{kind}:{share_uuid}:version"
+
+
+def page_key(kind, share_uuid, version):
+    return f"share:{kind}:{share_uuid}:page:{version}"
+
+
+def get_version(kind, share_uuid):
+    cache = get_cache()
+    key = version_key(kind, share_uuid)
+    version = cache.get(key)
+    if version is None:
+        # Kesh bo'sh (yoki tozalangan): hozirgi vaqtdan boshlaymiz
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(kind, share_uuid):
+    """Obyekt o'zgardi: yangi versiya (commit bo'lgandan keyin, eski holat keshga tushib qolmasligi uchun)."""
+    def bump():
+        get_cache().set(version_key(kind, share_uuid), int(time.time() * 1000), timeout=None)
+    transaction.on_commit(bump)
+
+
+def _is_cacheable(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Flash xabarlar bo'lsa sahifa shu userga xos — keshlamaymiz
+    return not len(messages.get_messages(request))
+
+
+def _set_validators(response, version):
+    response['ETag'] = quote_etag(str(version))
+    response['Last-Modified'] = http_date(version / 1000)
+    patch_cache_control(response, public=True, max_age=settings.SHARE_PAGE_BROWSER_MAX_AGE)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def cache_share_page(kind, uuid_kwarg):
+    """
+    View dekoratori. Anonim so'rov uchun: If-None-Match/If-Modified-Since mos kelsa 304,
+    keshda bo'lsa bazaga tegmasdan qaytaradi, aks holda view'ni chaqirib natijani keshlaydi.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not settings.SHARE_PAGE_CACHE_ENABLED or not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            share_uuid = kwargs[uuid_kwarg]
+            version = get_version(kind, share_uuid)
+            etag = quote_etag(str(version))
+            last_modified = version // 1000
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return _set_validators(not_modified, version)
+
+            cache = get_cache()
+            key = page_key(kind, share_uuid, version)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return _set_validators(HttpResponse(content, content_type=content_type), version)
+
+            response = view_func(request, *args, **kwargs)
+            # CSRF token chiqargan sahifa (forma) shu tashrifchiga xos — boshqalarga berilmaydi
+            csrf_rendered = request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            if response.status_code == 200 and not response.streaming and not response.cookies and not csrf_rendered:
+                cache.set(key, (response.content, response['Content-Type']), timeout=settings.SHARE_PAGE_CACHE_TTL)
+                _set_validators(response, version)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import perf
+
+
+@override_settings(PERF_SAMPLE_RATE=1, PERF_SERVER_TIMING=True, PERF_HISTOGRAM=True)
+class PerfMiddlewareTests(TestCase):
+    """Server-Timing header, strukturali log va staff uchun histogramma."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('ops', is_staff=True)
+        cls.user = User.objects.create_user('traveller')
+
+    def setUp(self):
+        perf.reset_histogram()
+        self.addCleanup(perf.reset_histogram)
+
+    @staticmethod
+    def timing_names(response):
+        return [part.split(';')[0].strip() for part in response['Server-Timing'].split(',')]
+
+    def test_sampled_request_has_server_timing(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('config.perf', 'INFO') as logs:
+            response = self.client.get(reverse('perf_metrics'))
+            # Ikkinchi so'rov birinchisining histogramma qiymatlarini ko'radi
+            routes = self.client.get(reverse('perf_metrics')).json()['routes']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.timing_names(response)[:2], ['total', 'db'])
+        # Sessiya va foydalanuvchi — kamida ikki so'rov
+        perf_record = logs.records[0]
+        self.assertEqual(perf_record.perf['route'], 'perf_metrics')
+        self.assertGreaterEqual(perf_record.perf['db_queries'], 2)
+        self.assertEqual(routes['perf_metrics']['total']['count'], 1)
+
+    def test_timed_spans_are_reported(self):
+        timings = perf.RequestTimings()
+        token = perf._current.set(timings)
+        try:
+            with perf.timed('groq'):
+                pass
+            with perf.timed('groq'):
+                pass
+        finally:
+            perf._current.reset(token)
+        self.assertEqual(timings.spans['groq'][0], 2)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_request_is_untouched(self):
+        self.client.force_login(self.staff)
+        with self.assertNoLogs('config.perf'):
+            response = self.client.get(reverse('perf_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(response.json()['routes'], {})
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('config.perf', 'INFO'):
+            response = self.client.get(reverse('perf_metrics'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_metrics_are_staff_only(self):
+        for user in (None, self.user):
+            with self.subTest(user=user):
+                if user:
+                    self.client.force_login(user)
+                with self.assertLogs('config.perf', 'INFO'):
+                    response = self.client.get(reverse('perf_metrics'))
+                self.assertEqual(response.status_code, 302)
+                self.assertIn(reverse('admin:login'), response['Location'])
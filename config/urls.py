@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.perf import perf_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('admin/', admin.site.urls),
@@ -28,6 +30,8 @@ urlpatterns = [
     path('flights/', include('flights.urls')),
     path('support/', include('support.urls')),
     path('stories/', include('stories.urls')),
+    # Request o'lchovlari histogrammasi (faqat staff)
+    path('perf/metrics/', perf_metrics, name='perf_metrics'),
     # 2. O'zimizning app
     path('', include('trips.urls')),
 ]
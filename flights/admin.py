@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import RecordedFlightSearch
+
+
+@admin.register(RecordedFlightSearch)
+class RecordedFlightSearchAdmin(admin.ModelAdmin):
+    list_display = ('origin', 'destination', 'departure_date', 'travel_class', 'adults', 'source', 'recorded_at')
+    list_filter = ('source', 'travel_class')
+    search_fields = ('origin', 'destination')
+    ordering = ('-recorded_at',)
@@ -0,0 +1,155 @@
+# flights/airports.py
+#
+# Aeroport/shahar autocomplete: AIRPORTS_DATASET (CSV) bir marta o'qiladi va prefiks indeksiga aylanadi —
+# saralangan kalitlar ro'yxati (bisect) + parallel aeroport indekslari. Kalitlar: IATA kod, shahar va
+# aeroport nomi (to'liq va har bir so'z), diakritikasiz va kichik harfda ("sao" -> São Paulo).
+# Natijalar: aniq kod birinchi, keyin yo'lovchi oqimi (aeroport kattaligi) bo'yicha.
+# 1-2 harfli prefikslar uchun natija yuklashda oldindan hisoblanadi — eng ko'p mos keladiganlari shular.
+# Ro'yxat: yirik aeroportlar yo'lovchi oqimi va metro kodlari (LON, NYC) bilan, qolgan barcha IATA kodli
+# aeroportlar airportsdata (MIT) ro'yxatidan passengers=0 bilan. Ro'yxatda yo'q kod Amadeus'ga yuborilmaydi.
+
+import csv
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from trips.models import normalize_search_text as fold
+
+MAX_LIMIT = 20
+PRECOMPUTED_PREFIX = 2
+
+_WORD_RE = re.compile(r"\W+")
+
+Airport = namedtuple('Airport', 'code kind name city country passengers')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def serialize(airport):
+    return {
+        'code': airport.code,
+        'name': airport.name,
+        'city': airport.city,
+        'country': airport.country,
+        'isCity': airport.kind == 'city',
+    }
+
+
+class AirportIndex:
+    def __init__(self, airports):
+        # Katta aeroport — kichik indeks: ranking uchun indeksning o'zi yetadi
+        self.airports = sorted(airports, key=lambda airport: (-airport.passengers, airport.code))
+        self.by_code = {airport.code: i for i, airport in enumerate(self.airports)}
+        self.by_place = {}  # to'liq shahar/aeroport nomi -> indekslar
+
+        pairs = set()
+        for i, airport in enumerate(self.airports):
+            city, name = fold(airport.city), fold(airport.name)
+            self.by_place.setdefault(city, []).append(i)
+            if airport.kind != 'city':
+                self.by_place.setdefault(name, []).append(i)
+
+            tokens = {airport.code.lower(), city, name}
+            tokens.update(_WORD_RE.split(city))
+            tokens.update(_WORD_RE.split(name) if airport.kind != 'city' else ())
+            pairs.update((token, i) for token in tokens if token)
+
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ids = [i for _, i in pairs]
+
+        self.short = {}
+        for prefix in {key[:n] for key in self.keys for n in range(1, PRECOMPUTED_PREFIX + 1)}:
+            self.short[prefix] = self._scan(prefix, MAX_LIMIT)
+
+    def _scan(self, prefix, limit):
+        matches = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            matches.add(self.ids[position])
+            position += 1
+
+        exact = self.by_code.get(prefix.upper())
+        if exact is None:
+            return heapq.nsmallest(limit, matches)
+        return [exact] + heapq.nsmallest(limit - 1, matches - {exact})
+
+    def search(self, query, limit=8):
+        prefix = fold(query)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+        ids = self.short.get(prefix) if len(prefix) <= PRECOMPUTED_PREFIX else None
+        if ids is None:
+            ids = self._scan(prefix, limit)
+        return [self.airports[i] for i in ids[:limit]]
+
+    def resolve(self, value):
+        """
+        Foydalanuvchi kiritgan qiymat -> IATA kod. Ma'lum kod yoki bitta joyga mos keladigan shahar/aeroport
+        nomi bo'lsa kod, aks holda None (ro'yxatda yo'q kod ham — takliflar chiqadi).
+        Bir nechta aeroportli shaharda metro kodi (LON, NYC), u bo'lmasa yagona yirik aeroport tanlanadi.
+        """
+        text = (value or '').strip()
+        code = text.upper()
+        i = self.by_code.get(code)
+        if i is not None:
+            return self.airports[i].code
+
+        candidates = self.by_place.get(fold(text), [])
+        metro = [i for i in candidates if self.airports[i].kind == 'city']
+        if len(metro) == 1:
+            return self.airports[metro[0]].code
+        if len(candidates) == 1:
+            return self.airports[candidates[0]].code
+        # Shaharda bitta yirik aeroport va bir nechta kichik (passengers=0) aeroport bo'lsa — yirigi
+        major = [i for i in candidates if self.airports[i].passengers > 0]
+        if len(major) == 1:
+            return self.airports[major[0]].code
+        return None
+
+
+def load_airports(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            Airport(
+                code=row['iata'].strip().upper(),
+                kind=row['kind'].strip() or 'airport',
+                name=row['name'].strip(),
+                city=row['city'].strip(),
+                country=row['country'].strip(),
+                passengers=float(row['passengers'] or 0),
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = AirportIndex(load_airports(settings.AIRPORTS_DATASET))
+        return _index
+
+
+def search(query, limit=8):
+    return get_index().search(query, limit)
+
+
+def resolve(value):
+    return get_index().resolve(value)
+
+
+@receiver(setting_changed)
+def reset_index(setting, **kwargs):
+    global _index
+    if setting == 'AIRPORTS_DATASET':
+        with _index_lock:
+            _index = None
@@ -0,0 +1,43 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from flights import airports
+
+
+class Command(BaseCommand):
+    help = "Aeroport autocomplete indeksini o'lchaydi: yuklash vaqti va har bir klaviatura bosilishidagi qidiruv"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=20000, help="Tasodifiy prefikslar soni")
+        parser.add_argument('--limit', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = airports.AirportIndex(airports.load_airports(settings.AIRPORTS_DATASET))
+        load_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f"index: {len(index.airports)} airports, {len(index.keys)} keys, built in {load_ms:.1f} ms")
+
+        # Foydalanuvchi yozayotgandek: shahar/aeroport nomi yoki kodining 1..N harfli prefikslari
+        rng = random.Random(options['seed'])
+        words = [w for airport in index.airports for w in (airport.code, airport.city, airport.name)]
+        queries = []
+        for _ in range(options['queries']):
+            word = rng.choice(words)
+            queries.append(word[:rng.randint(1, len(word))])
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, options['limit'])
+            timings.append((time.perf_counter() - started) * 1_000_000)
+
+        timings.sort()
+        self.stdout.write(
+            f"search: {len(queries)} queries, median {statistics.median(timings):.1f} us, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.1f} us, max {timings[-1]:.1f} us"
+        )
@@ -0,0 +1,55 @@
+import json
+import statistics
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from flights.normalize import filter_flights, normalize_offers, parse_duration, sort_flights
+
+
+class Command(BaseCommand):
+    help = "Yozib olingan Amadeus javoblarida offer normalizatsiyasi tezligini o'lchaydi (micro-benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixture',
+            default=str(Path(apps.get_app_config('flights').path) / 'fixtures' / 'recorded_flight_offers.json'),
+            help="loaddata formatidagi RecordedFlightSearch fixture fayli",
+        )
+        parser.add_argument('--offers', type=int, default=250, help="Bitta javobdagi offer'lar soni")
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        records = [obj['fields'] for obj in json.loads(Path(options['fixture']).read_text())]
+        if not records:
+            self.stderr.write("Fixture bo'sh")
+            return
+
+        # Barcha marshrutlardagi offer'larni aralashtirib, kerakli hajmdagi bitta javob yasaymiz
+        all_offers = [offer for record in records for offer in record['offers']]
+        carriers = {}
+        for record in records:
+            carriers.update(record['dictionaries'].get('carriers', {}))
+        response = {
+            'data': list(islice(cycle(all_offers), options['offers'])),
+            'dictionaries': {'carriers': carriers},
+        }
+
+        timings = []
+        for _ in range(options['iterations']):
+            parse_duration.cache_clear()
+            started = time.perf_counter()
+            flights = normalize_offers(response, 'TAS', 'JFK', 'ECONOMY', '2026-12-10')
+            sort_flights(filter_flights(flights, max_stops=1), 'duration')
+            timings.append((time.perf_counter() - started) * 1000)
+
+        median = statistics.median(timings)
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{options['offers']} offer x {options['iterations']} marta: "
+            f"median {median:.2f} ms, p95 {p95:.2f} ms, "
+            f"{options['offers'] / (median / 1000):,.0f} offer/s"
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordedFlightSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=3)),
+                ('destination', models.CharField(max_length=3)),
+                ('departure_date', models.DateField()),
+                ('travel_class', models.CharField(default='ECONOMY', max_length=20)),
+                ('adults', models.PositiveSmallIntegerField(default=1)),
+                ('offers', models.JSONField(default=list)),
+                ('dictionaries', models.JSONField(default=dict)),
+                ('source', models.CharField(choices=[('fixture', 'Fixture'), ('amadeus', 'Amadeus')], default='amadeus', max_length=10)),
+                ('recorded_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination', 'departure_date', 'travel_class', 'adults'), name='recorded_flight_search_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
 
-# Create your models here.
+
+# Lokal flight offer indeksi (flights/providers.py): yozib olingan Amadeus javoblari yoki fixture'lar.
+# Offline/load-test rejimida qidiruvlar shu jadvaldan beriladi.
+class RecordedFlightSearch(models.Model):
+    SOURCE_FIXTURE = 'fixture'
+    SOURCE_AMADEUS = 'amadeus'
+    SOURCE_CHOICES = [
+        (SOURCE_FIXTURE, 'Fixture'),
+        (SOURCE_AMADEUS, 'Amadeus'),
+    ]
+
+    origin = models.CharField(max_length=3)
+    destination = models.CharField(max_length=3)
+    departure_date = models.DateField()
+    travel_class = models.CharField(max_length=20, default='ECONOMY')
+    adults = models.PositiveSmallIntegerField(default=1)
+
+    # Amadeus javobi qanday kelgan bo'lsa shunday: response.data va result['dictionaries']
+    offers = models.JSONField(default=list)
+    dictionaries = models.JSONField(default=dict)
+
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default=SOURCE_AMADEUS)
+    recorded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # (origin, destination, date, ...) bo'yicha qidiruv shu unique indeksdan foydalanadi
+            models.UniqueConstraint(
+                fields=['origin', 'destination', 'departure_date', 'travel_class', 'adults'],
+                name='recorded_flight_search_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.origin}-{self.destination} {self.departure_date} ({self.travel_class}, {self.adults})"
@@ -0,0 +1,147 @@
+# flights/normalize.py
+#
+# Amadeus flight offer'larini frontend formatiga bitta o'tishda o'giradi:
+# barcha segmentlar, layover'lar (daqiqada), ISO-8601 davomiylik -> daqiqa.
+# Sortlash/filtrlash ham serverda (yuzlab offer bo'lsa ham brauzerga faqat keraklisi boradi).
+
+import math
+import re
+from datetime import datetime
+from functools import lru_cache
+
+SORT_KEYS = {
+    'price': lambda flight: (flight['price'], flight['durationMinutes']),
+    'duration': lambda flight: (flight['durationMinutes'], flight['price']),
+    'stops': lambda flight: (flight['stops'], flight['price']),
+    'departure': lambda flight: (flight['date'], flight['departure']['time'], flight['price']),
+}
+
+_DURATION_RE = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:[\d.]+S)?)?$')
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(value):
+    """'PT5H30M' -> 330, 'P1DT2H' -> 1560. Tushunarsiz bo'lsa 0."""
+    match = _DURATION_RE.match(value or '')
+    if not match:
+        return 0
+    days, hours, minutes = (int(x) if x else 0 for x in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def parse_price(price):
+    """{'total': '713.92', ...} -> 713.92. Yo'q yoki tushunarsiz bo'lsa None."""
+    try:
+        total = float(price['total'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return total if math.isfinite(total) and total >= 0 else None
+
+
+def format_duration(minutes):
+    # 330 -> "5h 30m"
+    hours, minutes = divmod(minutes, 60)
+    if not hours:
+        return f"{minutes}m"
+    return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+
+
+def _minutes_between(start, end):
+    return int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() // 60)
+
+
+def normalize_itinerary(itinerary, carriers):
+    """Bitta yo'nalish: segmentlar, layover'lar va umumiy davomiylik."""
+    segments = []
+    layovers = []
+    previous = None
+
+    for raw in itinerary.get('segments') or ():
+        departure = raw['departure']
+        arrival = raw['arrival']
+        carrier_code = raw['carrierCode']
+
+        if previous is not None:
+            layovers.append({
+                'airport': previous['arrival']['iataCode'],
+                'minutes': _minutes_between(previous['arrival']['at'], departure['at']),
+            })
+
+        segments.append({
+            'airline': carriers.get(carrier_code, carrier_code),
+            'flightNumber': f"{carrier_code} {raw['number']}",
+            'from': departure['iataCode'],
+            'to': arrival['iataCode'],
+            'departureAt': departure['at'],
+            'arrivalAt': arrival['at'],
+            'durationMinutes': parse_duration(raw.get('duration')),
+        })
+        previous = raw
+
+    duration_minutes = parse_duration(itinerary.get('duration'))
+    if not duration_minutes and segments:
+        duration_minutes = _minutes_between(segments[0]['departureAt'], segments[-1]['arrivalAt'])
+
+    return segments, layovers, duration_minutes
+
+
+def normalize_offers(response, origin, destination, travel_class, day):
+    """Amadeus javobi ({'data', 'dictionaries'}) -> frontend dict'lari ro'yxati."""
+    # Natija bo'sh bo'lsa Amadeus dictionaries'ni umuman yubormaydi
+    carriers = response.get('dictionaries', {}).get('carriers', {})
+    class_label = travel_class.capitalize()
+    results = []
+
+    for offer in response['data']:
+        itineraries = offer.get('itineraries') or [{}]
+        segments, layovers, duration_minutes = normalize_itinerary(itineraries[0], carriers)
+        price = parse_price(offer.get('price'))
+        offer_id = offer.get('id')
+        # Segmentsiz, id'siz yoki narxi o'qilmaydigan offer'ni ko'rsatib ham, saralab ham bo'lmaydi — tashlab ketamiz
+        if not segments or price is None or offer_id in (None, ''):
+            continue
+        first = segments[0]
+        last = segments[-1]
+
+        results.append({
+            # Flexible qidiruvda offer id'lari sanalar orasida takrorlanadi
+            "id": f"{origin}-{destination}-{day}-{offer_id}",
+            "date": day,
+            "airline": first['airline'],
+            "flightNumber": first['flightNumber'],
+            "departure": {
+                "airport": first['from'],
+                "city": origin,
+                "time": first['departureAt'][11:16]
+            },
+            # Ulanishli reyslarda oxirgi segment: haqiqiy kelish aeroporti va vaqti
+            "arrival": {
+                "airport": last['to'],
+                "city": destination,
+                "time": last['arrivalAt'][11:16],
+                "date": last['arrivalAt'][:10]
+            },
+            "duration": format_duration(duration_minutes),
+            "durationMinutes": duration_minutes,
+            "price": price,
+            "currency": offer['price'].get('currency'),
+            "stops": len(segments) - 1,
+            "segments": segments,
+            "layovers": layovers,
+            "class": class_label,
+            "rating": 4.5
+        })
+    return results
+
+
+def filter_flights(flights, max_price=None, max_stops=None, max_duration=None):
+    return [
+        flight for flight in flights
+        if (max_price is None or flight['price'] <= max_price)
+        and (max_stops is None or flight['stops'] <= max_stops)
+        and (max_duration is None or flight['durationMinutes'] <= max_duration)
+    ]
+
+
+def sort_flights(flights, sort='price'):
+    return sorted(flights, key=SORT_KEYS.get(sort, SORT_KEYS['price']))
@@ -0,0 +1,117 @@
+# flights/offers.py
+#
+# Flight offer qidiruvi: javob keshi va so'rovlarni birlashtirish (provayder: providers.py).
+# Bir xil (origin, destination, date, passengers, class) uchun TTL ichida provayder qayta chaqirilmaydi,
+# bir vaqtda kelgan bir xil qidiruvlar esa bitta upstream chaqiruvni kutib turadi.
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+# key -> Future: hozir upstream'ga ketayotgan qidiruvlar
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+METRIC_NAMES = ('hits', 'misses', 'coalesced', 'upstream_calls', 'upstream_errors', 'upstream_ms')
+
+
+def offer_cache_key(origin, destination, date, passengers, travel_class):
+    payload = json.dumps([origin.upper(), destination.upper(), str(date), int(passengers), travel_class.upper()])
+    return "flights:offers:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+# --- Metrikalar (cache.incr — Redis/Memcached'da barcha worker'lar bo'yicha umumiy) ---
+
+def _metric_key(name):
+    return f"flights:metrics:{name}"
+
+
+def _incr(name, delta=1):
+    key = _metric_key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Kalit shu orada o'chib ketgan bo'lsa
+        cache.set(key, delta, timeout=None)
+
+
+def metrics():
+    values = cache.get_many([_metric_key(name) for name in METRIC_NAMES])
+    data = {name: values.get(_metric_key(name), 0) for name in METRIC_NAMES}
+    lookups = data['hits'] + data['misses']
+    data['hit_rate'] = round(data['hits'] / lookups, 3) if lookups else 0.0
+    data['avg_upstream_ms'] = round(data['upstream_ms'] / data['upstream_calls'], 1) if data['upstream_calls'] else 0.0
+    return data
+
+
+def reset_metrics():
+    cache.delete_many([_metric_key(name) for name in METRIC_NAMES])
+
+
+# --- Qidiruv ---
+
+def fetch_offers(origin, destination, date, passengers, travel_class):
+    """Bitta provayder chaqiruvi. Keshlash mumkin bo'lgan dict qaytaradi: {'data': [...], 'dictionaries': {...}}."""
+    provider = get_provider()
+    started = time.monotonic()
+    _incr('upstream_calls')
+    try:
+        result = provider.search(origin, destination, date, passengers, travel_class)
+    except Exception:
+        _incr('upstream_errors')
+        raise
+    finally:
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        _incr('upstream_ms', elapsed_ms)
+        logger.info("%s flight search %s-%s %s: %d ms", provider.name, origin, destination, date, elapsed_ms)
+
+    return result
+
+
+def search_offers(origin, destination, date, passengers, travel_class):
+    """Keshdan yoki (bitta umumiy) provayder chaqiruvidan offer'larni qaytaradi."""
+    key = offer_cache_key(origin, destination, date, passengers, travel_class)
+    ttl = settings.FLIGHT_OFFER_CACHE_TTL
+
+    if ttl:
+        cached = cache.get(key)
+        if cached is not None:
+            _incr('hits')
+            return cached
+    _incr('misses')
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        # Xuddi shu qidiruv hozir bajarilmoqda — natijasini kutamiz (xato bo'lsa u ham qaytadi)
+        _incr('coalesced')
+        return future.result()
+
+    try:
+        result = fetch_offers(origin, destination, date, passengers, travel_class)
+        if ttl:
+            cache.set(key, result, timeout=ttl)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,229 @@
+# flights/providers.py
+#
+# Flight offer provayderlari. Hammasi bir xil formatda javob beradi:
+#     {'data': [...Amadeus offer'lari...], 'dictionaries': {...}}
+#
+# FLIGHT_PROVIDER:
+#   'amadeus' — har doim Amadeus API
+#   'local'   — faqat lokal indeks (RecordedFlightSearch jadvali), tarmoqsiz: dev / load test / benchmark uchun.
+#               Jadval bo'sh bo'lsa birinchi qidiruvda fixtures/recorded_flight_offers.json yuklanadi
+#   'hybrid'  — avval lokal indeks, topilmasa Amadeus (javob indeksga yozib qo'yiladi)
+# yoki o'z provayder klassingizga dotted path.
+
+import threading
+from datetime import date as date_cls, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from config.perf import timed
+
+from .models import RecordedFlightSearch
+
+FIXTURE = Path(__file__).resolve().parent / 'fixtures' / 'recorded_flight_offers.json'
+
+
+class FlightProvider:
+    name = None
+
+    def search(self, origin, destination, date, passengers, travel_class):
+        raise NotImplementedError
+
+
+class AmadeusProvider(FlightProvider):
+    name = 'amadeus'
+
+    def __init__(self, record_offers=None):
+        self._client = None
+        self._client_lock = threading.Lock()
+        # True bo'lsa har bir javob lokal indeksga ham yoziladi
+        self.record_offers = settings.FLIGHT_RECORD_OFFERS if record_offers is None else record_offers
+
+    def get_client(self):
+        """Amadeus client'ni birinchi kerak bo'lganda yaratadi (token ichida saqlanadi, qayta ishlatiladi)."""
+        with self._client_lock:
+            if self._client is None:
+                if not settings.AMADEUS_CLIENT_ID or not settings.AMADEUS_CLIENT_SECRET:
+                    raise ImproperlyConfigured("AMADEUS_CLIENT_ID va AMADEUS_CLIENT_SECRET sozlanmagan")
+
+                from amadeus import Client
+
+                self._client = Client(
+                    client_id=settings.AMADEUS_CLIENT_ID,
+                    client_secret=settings.AMADEUS_CLIENT_SECRET,
+                    hostname=settings.AMADEUS_HOSTNAME,
+                )
+            return self._client
+
+    def search(self, origin, destination, date, passengers, travel_class):
+        client = self.get_client()
+        with timed('amadeus'):
+            response = client.shopping.flight_offers_search.get(
+                originLocationCode=origin,
+                destinationLocationCode=destination,
+                departureDate=date,
+                adults=passengers,
+                travelClass=travel_class,
+                max=settings.FLIGHT_MAX_OFFERS
+            )
+        result = {
+            'data': response.data,
+            'dictionaries': response.result.get('dictionaries', {}),
+        }
+        if self.record_offers:
+            record(origin, destination, date, passengers, travel_class, result)
+        return result
+
+
+def record(origin, destination, date, passengers, travel_class, result, source=RecordedFlightSearch.SOURCE_AMADEUS):
+    """Javobni lokal indeksga yozadi (shu marshrut keyin tarmoqsiz beriladi)."""
+    RecordedFlightSearch.objects.update_or_create(
+        origin=origin,
+        destination=destination,
+        departure_date=date,
+        travel_class=travel_class,
+        adults=passengers,
+        defaults={
+            'offers': result['data'],
+            'dictionaries': result['dictionaries'],
+            'source': source,
+        },
+    )
+
+
+def shift_offer_dates(offers, days):
+    """Boshqa sanaga yozilgan offer'larni so'ralgan sanaga suradi (segment vaqtlari)."""
+    if not days:
+        return offers
+    delta = timedelta(days=days)
+    shifted = []
+    for offer in offers:
+        offer = {
+            **offer,
+            'itineraries': [
+                {
+                    **itinerary,
+                    'segments': [
+                        {
+                            **segment,
+                            'departure': {**segment['departure'], 'at': _shift_at(segment['departure']['at'], delta)},
+                            'arrival': {**segment['arrival'], 'at': _shift_at(segment['arrival']['at'], delta)},
+                        }
+                        for segment in itinerary['segments']
+                    ],
+                }
+                for itinerary in offer['itineraries']
+            ],
+        }
+        shifted.append(offer)
+    return shifted
+
+
+def _shift_at(value, delta):
+    return (datetime.fromisoformat(value) + delta).isoformat(timespec='seconds')
+
+
+class LocalProvider(FlightProvider):
+    """
+    Lokal indeksdan beradi: avval aniq (marshrut, sana, klass, yo'lovchi) yozuvi,
+    bo'lmasa shu marshrutning eng yaqin sanadagi yozuvi (sanalari surilgan holda).
+    """
+    name = 'local'
+
+    def __init__(self):
+        self._seeded = False
+        self._seed_lock = threading.Lock()
+
+    def ensure_seeded(self):
+        """Bo'sh indeksga yozib olingan fixture'ni yuklaydi (offline dev: qo'lda loaddata shart emas)."""
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if not self._seeded:
+                if not RecordedFlightSearch.objects.exists():
+                    call_command('loaddata', FIXTURE, verbosity=0)
+                self._seeded = True
+
+    def lookup(self, origin, destination, date, passengers, travel_class, nearest=True, max_age=None):
+        route = RecordedFlightSearch.objects.filter(
+            origin=origin, destination=destination, travel_class=travel_class
+        ).only('departure_date', 'adults', 'offers', 'dictionaries')
+        if max_age is not None:
+            route = route.filter(recorded_at__gte=timezone.now() - max_age)
+
+        exact = route.filter(departure_date=date, adults=passengers).first()
+        if exact is not None:
+            return {'data': exact.offers, 'dictionaries': exact.dictionaries}
+        if not nearest:
+            return None
+
+        day = date_cls.fromisoformat(str(date))
+        closest = (
+            route.filter(departure_date__gte=day).order_by('departure_date').first()
+            or route.filter(departure_date__lt=day).order_by('-departure_date').first()
+        )
+        if closest is None:
+            return None
+        return {
+            'data': shift_offer_dates(closest.offers, (day - closest.departure_date).days),
+            'dictionaries': closest.dictionaries,
+        }
+
+    def search(self, origin, destination, date, passengers, travel_class):
+        self.ensure_seeded()
+        return self.lookup(origin, destination, date, passengers, travel_class) or {'data': [], 'dictionaries': {}}
+
+
+class HybridProvider(LocalProvider):
+    """Takroriy marshrutlar lokal indeksdan, yangilari Amadeus'dan (va indeksga yoziladi)."""
+    name = 'hybrid'
+
+    def __init__(self):
+        # Fixture yuklanmaydi: haqiqiy foydalanuvchiga yozib olingan namunaviy narxlar ko'rsatilmasin
+        super().__init__()
+        self.upstream = AmadeusProvider(record_offers=True)
+
+    def search(self, origin, destination, date, passengers, travel_class):
+        # Faqat aniq sana va yangi yozuv: haqiqiy foydalanuvchiga boshqa kunning narxi ko'rsatilmaydi
+        local = self.lookup(
+            origin, destination, date, passengers, travel_class,
+            nearest=False, max_age=timedelta(seconds=settings.FLIGHT_LOCAL_MAX_AGE),
+        )
+        if local is not None and local['data']:
+            return local
+        return self.upstream.search(origin, destination, date, passengers, travel_class)
+
+
+PROVIDERS = {
+    AmadeusProvider.name: AmadeusProvider,
+    LocalProvider.name: LocalProvider,
+    HybridProvider.name: HybridProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            name = settings.FLIGHT_PROVIDER
+            provider_class = PROVIDERS.get(name) or import_string(name)
+            _provider = provider_class()
+        return _provider
+
+
+@receiver(setting_changed)
+def reset_provider(setting, **kwargs):
+    # override_settings(FLIGHT_PROVIDER=...) testlarda darhol ishlashi uchun
+    global _provider
+    if setting in ('FLIGHT_PROVIDER', 'FLIGHT_RECORD_OFFERS'):
+        with _provider_lock:
+            _provider = None
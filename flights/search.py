@@ -0,0 +1,72 @@
+# flights/search.py
+#
+# Flexible-dates (±N kun) va round-trip qidiruv: har bir (yo'nalish, sana) uchun Amadeus so'rovi
+# umumiy thread pool'da parallel bajariladi, shuning uchun butun qidiruv eng sekin bitta chaqiruv
+# vaqtida tugaydi. Har bir so'rov offers.search_offers orqali o'tadi (kesh + birlashtirish).
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_cls, timedelta
+
+from django.conf import settings
+from django.db import connection
+
+from . import offers
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Pool hajmi = Amadeus'ga bir vaqtda ketadigan so'rovlar chegarasi (barcha foydalanuvchilar uchun)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FLIGHT_SEARCH_WORKERS,
+                thread_name_prefix='flight-search',
+            )
+        return _executor
+
+
+def flex_dates(day, flex_days):
+    """'2026-05-10', 1 -> ['2026-05-09', '2026-05-10', '2026-05-11'] (o'tgan kunlarsiz)"""
+    center = date_cls.fromisoformat(day)
+    today = date_cls.today()
+    dates = [center + timedelta(days=delta) for delta in range(-flex_days, flex_days + 1)]
+    return [d.isoformat() for d in dates if d >= today or d == center]
+
+
+def _search_one(origin, destination, day, passengers, travel_class):
+    try:
+        return offers.search_offers(origin, destination, day, passengers, travel_class)
+    finally:
+        # Thread o'z DB ulanishini ochgan bo'lishi mumkin (masalan DB cache backend)
+        connection.close()
+
+
+def fan_out(queries):
+    """
+    queries: [(origin, destination, date, passengers, travel_class), ...]
+    Natija: {query: response | Exception} — bitta sana xato bersa, qolganlari yo'qolmaydi.
+    """
+    executor = get_executor()
+    futures = {query: executor.submit(_search_one, *query) for query in queries}
+
+    results = {}
+    for query, future in futures.items():
+        try:
+            results[query] = future.result()
+        except Exception as e:
+            results[query] = e
+    return results
+
+
+def cheapest_per_day(flights):
+    """Har bir sana uchun eng arzon narx (kalendar uchun), sanalar bo'yicha tartiblangan."""
+    calendar = {}
+    for flight in flights:
+        best = calendar.get(flight['date'])
+        if best is None or flight['price'] < best['price']:
+            calendar[flight['date']] = {'date': flight['date'], 'price': flight['price'], 'currency': flight['currency']}
+    return [calendar[day] for day in sorted(calendar)]
@@ -1,3 +1,368 @@
-from django.test import TestCase
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import airports, offers, providers
+from .models import RecordedFlightSearch
+from .normalize import (
+    filter_flights, format_duration, normalize_offers, parse_duration, parse_price, sort_flights,
+)
+from .providers import FlightProvider, get_provider, reset_provider
+
+CARRIERS = {'HY': 'UZBEKISTAN AIRWAYS', 'TK': 'TURKISH AIRLINES'}
+
+
+def segment(carrier, number, origin, destination, departure_at, arrival_at, duration=None):
+    raw = {
+        'departure': {'iataCode': origin, 'at': departure_at},
+        'arrival': {'iataCode': destination, 'at': arrival_at},
+        'carrierCode': carrier,
+        'number': number,
+    }
+    if duration:
+        raw['duration'] = duration
+    return raw
+
+
+def offer(offer_id, segments, total='713.92', duration=None):
+    itinerary = {'segments': segments}
+    if duration:
+        itinerary['duration'] = duration
+    return {'id': offer_id, 'itineraries': [itinerary], 'price': {'currency': 'EUR', 'total': total}}
+
+
+def normalize(*offers):
+    response = {'data': list(offers), 'dictionaries': {'carriers': CARRIERS}}
+    return normalize_offers(response, 'TAS', 'JFK', 'ECONOMY', '2026-12-10')
+
+
+class ParsingTests(SimpleTestCase):
+    """ISO-8601 davomiylik va narx satrlari."""
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('PT5H30M'), 330)
+        self.assertEqual(parse_duration('P1DT2H'), 1560)
+        self.assertEqual(parse_duration('PT45M'), 45)
+        self.assertEqual(parse_duration('PT1H0M30S'), 60)
+        self.assertEqual(parse_duration('5 hours'), 0)
+        self.assertEqual(parse_duration(None), 0)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(330), '5h 30m')
+        self.assertEqual(format_duration(120), '2h')
+        self.assertEqual(format_duration(45), '45m')
+
+    def test_parse_price(self):
+        self.assertEqual(parse_price({'total': '713.92', 'currency': 'EUR'}), 713.92)
+        self.assertEqual(parse_price({'total': 120}), 120.0)
+        for price in (None, {}, {'total': None}, {'total': ''}, {'total': '1,200.00'}, {'total': 'nan'},
+                      {'total': '-5'}):
+            with self.subTest(price=price):
+                self.assertIsNone(parse_price(price))
+
+
+class NormalizeOffersTests(SimpleTestCase):
+    """Amadeus offer -> frontend dict: ulanishlar, layover'lar va buzuq offer'lar."""
+
+    @staticmethod
+    def ids(flights):
+        return [flight['id'][-1] for flight in flights]
+
+    def test_direct_offer_shape(self):
+        flight, = normalize(offer('1', [
+            segment('HY', '101', 'TAS', 'JFK', '2026-12-10T21:00:00', '2026-12-11T06:20:00', 'PT13H20M'),
+        ], duration='PT13H20M'))
+
+        self.assertEqual(flight, {
+            'id': 'TAS-JFK-2026-12-10-1',
+            'date': '2026-12-10',
+            'airline': 'UZBEKISTAN AIRWAYS',
+            'flightNumber': 'HY 101',
+            'departure': {'airport': 'TAS', 'city': 'TAS', 'time': '21:00'},
+            'arrival': {'airport': 'JFK', 'city': 'JFK', 'time': '06:20', 'date': '2026-12-11'},
+            'duration': '13h 20m',
+            'durationMinutes': 800,
+            'price': 713.92,
+            'currency': 'EUR',
+            'stops': 0,
+            'segments': [{
+                'airline': 'UZBEKISTAN AIRWAYS',
+                'flightNumber': 'HY 101',
+                'from': 'TAS',
+                'to': 'JFK',
+                'departureAt': '2026-12-10T21:00:00',
+                'arrivalAt': '2026-12-11T06:20:00',
+                'durationMinutes': 800,
+            }],
+            'layovers': [],
+            'class': 'Economy',
+            'rating': 4.5,
+        })
+
+    def test_connection_uses_last_segment_and_layovers(self):
+        flight, = normalize(offer('2', [
+            segment('TK', '371', 'TAS', 'IST', '2026-12-10T04:00:00', '2026-12-10T08:38:00', 'PT4H38M'),
+            segment('XX', '1', 'IST', 'JFK', '2026-12-10T10:08:00', '2026-12-10T13:30:00'),
+        ]))
+
+        self.assertEqual(flight['stops'], 1)
+        self.assertEqual(flight['layovers'], [{'airport': 'IST', 'minutes': 90}])
+        self.assertEqual(flight['arrival'], {'airport': 'JFK', 'city': 'JFK', 'time': '13:30', 'date': '2026-12-10'})
+        # Lug'atda yo'q aviakompaniya — kodi; segment davomiyligi yo'q — 0
+        self.assertEqual(flight['segments'][1]['airline'], 'XX')
+        self.assertEqual(flight['segments'][1]['durationMinutes'], 0)
+        # Itinerary davomiyligi yo'q — birinchi uchishdan oxirgi qo'nishgacha
+        self.assertEqual(flight['durationMinutes'], 570)
+        self.assertEqual(flight['duration'], '9h 30m')
+
+    def test_malformed_offers_are_skipped(self):
+        good = offer('1', [segment('HY', '101', 'TAS', 'JFK', '2026-12-10T21:00:00', '2026-12-11T06:20:00')])
+        no_segments = offer('2', [])
+        no_itineraries = dict(offer('3', []), itineraries=[])
+        bad_price = offer('4', good['itineraries'][0]['segments'], total='N/A')
+        no_price = {key: value for key, value in good.items() if key != 'price'}
+        no_id = {key: value for key, value in good.items() if key != 'id'}
+
+        flights = normalize(no_segments, good, no_itineraries, bad_price, no_price, no_id, dict(good, id=''))
+        self.assertEqual([flight['id'] for flight in flights], ['TAS-JFK-2026-12-10-1'])
+
+    def test_empty_response_without_dictionaries(self):
+        self.assertEqual(normalize_offers({'data': []}, 'TAS', 'JFK', 'ECONOMY', '2026-12-10'), [])
+
+    def test_filter_and_sort(self):
+        flights = normalize(
+            offer('1', [
+                segment('TK', '371', 'TAS', 'IST', '2026-12-10T04:00:00', '2026-12-10T08:38:00'),
+                segment('TK', '1', 'IST', 'JFK', '2026-12-10T10:08:00', '2026-12-10T13:30:00'),
+            ], total='450.00'),
+            offer('2', [segment('HY', '101', 'TAS', 'JFK', '2026-12-10T21:00:00', '2026-12-11T06:20:00')],
+                  total='900.00'),
+        )
+        self.assertEqual(self.ids(sort_flights(flights)), ['1', '2'])
+        self.assertEqual(self.ids(sort_flights(flights, 'stops')), ['2', '1'])
+        self.assertEqual(self.ids(sort_flights(flights, 'unknown')), ['1', '2'])
+        self.assertEqual(self.ids(filter_flights(flights, max_stops=0)), ['2'])
+        self.assertEqual(self.ids(filter_flights(flights, max_price=500)), ['1'])
+
+
+class AirportIndexTests(SimpleTestCase):
+    """Autocomplete va kod tekshiruvi (AIRPORTS_DATASET)."""
+
+    def codes(self, query, limit=8):
+        return [airport.code for airport in airports.search(query, limit)]
+
+    def test_prefix_ranking(self):
+        # Aniq kod birinchi, keyin yo'lovchi oqimi bo'yicha
+        self.assertEqual(self.codes('lon', 6), ['LON', 'LHR', 'LGW', 'STN', 'LTN', 'LCY'])
+        self.assertEqual(self.codes('TAS', 1), ['TAS'])
+        self.assertEqual(self.codes('tash')[0], 'TAS')
+        self.assertEqual(self.codes('heathrow'), ['LHR'])
+        self.assertEqual(self.codes('   '), [])
+
+    def test_metro_code_preferred(self):
+        self.assertEqual(airports.resolve('London'), 'LON')
+        self.assertEqual(airports.resolve('  new YORK '), 'NYC')
+        # Metro kodi yo'q shaharda yagona yirik aeroport (qolganlari passengers=0)
+        self.assertEqual(airports.resolve('Tashkent'), 'TAS')
+
+    def test_accent_folding(self):
+        self.assertEqual(self.codes('sao', 3), ['SAO', 'GRU', 'CGH'])
+        self.assertEqual(airports.resolve('São Paulo'), 'SAO')
+        self.assertEqual(airports.resolve('sao paulo'), 'SAO')
+
+    def test_codes(self):
+        self.assertEqual(airports.resolve('jfk'), 'JFK')
+        # To'liq IATA ro'yxatidagi kichik aeroport
+        self.assertEqual(airports.resolve('KUT'), 'KUT')
+
+    def test_unknown_codes_rejected(self):
+        for value in ('JFX', 'QQQ', 'Tashkentt', '', None):
+            with self.subTest(value=value):
+                self.assertIsNone(airports.resolve(value))
+
+
+class FlightSearchApiTests(TestCase):
+    """Noto'g'ri parametrlar provayderga bormasdan 400 qaytaradi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('flyer')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, **fields):
+        data = {'from': 'TAS', 'to': 'JFK', 'departDate': '2026-12-10', **fields}
+        with mock.patch('flights.offers.search_offers') as search_offers:
+            response = self.client.post(reverse('flight_search_api'), json.dumps(data), content_type='application/json')
+        search_offers.assert_not_called()
+        return response
+
+    def test_invalid_dates(self):
+        cases = [
+            ({'departDate': '2026-13-40'}, 'departDate'),
+            ({'departDate': 'tomorrow'}, 'departDate'),
+            ({'departDate': 20261210}, 'departDate'),
+            ({'returnDate': '2026-12-1x'}, 'returnDate'),
+            ({'returnDate': '2026-12-09'}, 'returnDate'),
+        ]
+        for fields, field in cases:
+            with self.subTest(fields=fields):
+                response = self.post(**fields)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['field'], field)
+
+    def test_unknown_airport_code(self):
+        response = self.post(to='JFX')
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['field'], 'to')
+        self.assertEqual(body['suggestions'][0]['code'], 'JFK')
+
+
+@override_settings(FLIGHT_PROVIDER='local')
+class LocalProviderTests(TestCase):
+    """Offline rejim: bo'sh indeks fixture'dan to'ldiriladi."""
+
+    def setUp(self):
+        # Har test yangi provayder: _seeded bayrog'i oldingi testdan qolmasin
+        reset_provider('FLIGHT_PROVIDER')
+
+    def search(self, date='2026-12-10'):
+        return get_provider().search('TAS', 'IST', date, 1, 'ECONOMY')
+
+    def test_empty_index_loads_fixture(self):
+        self.assertFalse(RecordedFlightSearch.objects.exists())
+        response = self.search()
+        self.assertTrue(response['data'])
+        self.assertEqual(RecordedFlightSearch.objects.filter(source=RecordedFlightSearch.SOURCE_FIXTURE).count(), 7)
+
+        # Boshqa sana — eng yaqin yozuv, segment vaqtlari surilgan
+        shifted = self.search('2026-12-12')
+        self.assertTrue(shifted['data'][0]['itineraries'][0]['segments'][0]['departure']['at'].startswith('2026-12-12'))
+
+        # Keyingi qidiruvlar fixture'ni qayta tekshirmaydi
+        with self.assertNumQueries(1):
+            self.search()
+
+    def test_existing_index_is_left_alone(self):
+        RecordedFlightSearch.objects.create(origin='TAS', destination='IST', departure_date='2026-12-10', offers=[])
+        self.assertEqual(self.search(), {'data': [], 'dictionaries': {}})
+        self.assertEqual(RecordedFlightSearch.objects.count(), 1)
+
+
+class GatedProvider(FlightProvider):
+    """Testlar uchun: search() gate ochilguncha kutadi."""
+    name = 'gated'
+    RESPONSE = {'data': [{'id': '1'}], 'dictionaries': {}}
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.error = None
+
+    def search(self, origin, destination, date, passengers, travel_class):
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.RESPONSE
+
+
+class WaiterCountingFuture(Future):
+    """result() ni kutayotganlar soni — lider gate'ni hamma follower'lar ulangandan keyin ochadi."""
+    waiters = 0
+    lock = threading.Lock()
+
+    def result(self, timeout=None):
+        with self.lock:
+            WaiterCountingFuture.waiters += 1
+        return super().result(timeout)
+
+
+@override_settings(FLIGHT_PROVIDER='gated', FLIGHT_OFFER_CACHE_TTL=300)
+class OfferSearchTests(SimpleTestCase):
+    """Offer keshi, bir xil qidiruvlarni birlashtirish va metrikalar."""
+    SEARCH = ('TAS', 'IST', '2026-12-10', 1, 'ECONOMY')
+
+    def setUp(self):
+        provider_classes = mock.patch.dict(providers.PROVIDERS, {'gated': GatedProvider})
+        provider_classes.start()
+        self.addCleanup(provider_classes.stop)
+        reset_provider('FLIGHT_PROVIDER')
+        self.provider = get_provider()
+        cache.clear()
+        offers.reset_metrics()
+        WaiterCountingFuture.waiters = 0
+
+    def tearDown(self):
+        self.provider.gate.set()
+        self.assertEqual(offers._inflight, {})
+
+    def run_concurrently(self, count):
+        """count ta bir xil qidiruv: lider provayderda turganda qolganlari ulanadi, keyin gate ochiladi."""
+        def call():
+            try:
+                return offers.search_offers(*self.SEARCH)
+            except Exception as e:
+                return e
+
+        with mock.patch('flights.offers.Future', WaiterCountingFuture), ThreadPoolExecutor(count) as executor:
+            leader = executor.submit(call)
+            self.assertTrue(self.provider.started.wait(5))
+            followers = [executor.submit(call) for _ in range(count - 1)]
+            while WaiterCountingFuture.waiters < count - 1:
+                threading.Event().wait(0.001)
+            self.provider.gate.set()
+            return [leader.result(5)] + [future.result(5) for future in followers]
+
+    def test_cache_key(self):
+        key = offers.offer_cache_key(*self.SEARCH)
+        self.assertEqual(key, offers.offer_cache_key('tas', 'ist', '2026-12-10', '1', 'economy'))
+        self.assertNotEqual(key, offers.offer_cache_key('TAS', 'IST', '2026-12-11', 1, 'ECONOMY'))
+
+    def test_repeat_search_served_from_cache(self):
+        self.provider.gate.set()
+        self.assertEqual(offers.search_offers(*self.SEARCH), GatedProvider.RESPONSE)
+        self.assertEqual(offers.search_offers(*self.SEARCH), GatedProvider.RESPONSE)
+        self.assertEqual(self.provider.calls, 1)
+
+        data = offers.metrics()
+        self.assertEqual((data['hits'], data['misses'], data['upstream_calls']), (1, 1, 1))
+        self.assertEqual(data['hit_rate'], 0.5)
+
+    @override_settings(FLIGHT_OFFER_CACHE_TTL=0)
+    def test_cache_disabled(self):
+        self.provider.gate.set()
+        offers.search_offers(*self.SEARCH)
+        offers.search_offers(*self.SEARCH)
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_concurrent_searches_make_one_call(self):
+        results = self.run_concurrently(6)
+        self.assertEqual(self.provider.calls, 1)
+        self.assertTrue(all(result == GatedProvider.RESPONSE for result in results))
+        data = offers.metrics()
+        self.assertEqual((data['misses'], data['coalesced'], data['upstream_calls']), (6, 5, 1))
+
+    def test_error_reaches_every_waiter_and_is_not_cached(self):
+        self.provider.error = RuntimeError('provider down')
+        results = self.run_concurrently(4)
+        self.assertEqual(self.provider.calls, 1)
+        self.assertTrue(all(result is self.provider.error for result in results))
+        self.assertEqual(offers._inflight, {})
+        self.assertIsNone(cache.get(offers.offer_cache_key(*self.SEARCH)))
+        self.assertEqual(offers.metrics()['upstream_errors'], 1)
+
+        # Keyingi qidiruv provayderga qayta boradi
+        self.provider.error = None
+        self.assertEqual(offers.search_offers(*self.SEARCH), GatedProvider.RESPONSE)
+        self.assertEqual(self.provider.calls, 2)
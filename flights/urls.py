@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.flight_search_page, name='flight_search'),
     path('api/search/', views.flight_search_api, name='flight_search_api'),
+    path('api/airports/', views.airport_autocomplete, name='airport_autocomplete'),
+    path('api/metrics/', views.flight_search_metrics, name='flight_search_metrics'),
 ]
\ No newline at end of file
@@ -1,16 +1,19 @@
 import json
+import logging
+from datetime import date as date_cls
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from amadeus import Client, ResponseError
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+from amadeus import ResponseError
 
-# 1. Amadeusga ulanish
-amadeus = Client(
-    client_id=settings.AMADEUS_CLIENT_ID,
-    client_secret=settings.AMADEUS_CLIENT_SECRET,
-    hostname='test'  # Hozircha 'test' rejimdamiz
-)
+# 1. Amadeusga ulanish: client birinchi qidiruvda yaratiladi, javoblar keshlanadi (offers.py)
+from . import airports, normalize, offers, search
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
@@ -19,6 +22,52 @@ def flight_search_page(request):
     return render(request, 'flights/flight_search.html')
 
 
+@require_GET
+def airport_autocomplete(request):
+    """Har bir klaviatura bosilishida: lokal indeksdan aeroport/shaharlar (bazaga ham, Amadeusga ham bormaydi)"""
+    try:
+        limit = int(request.GET.get('limit') or 8)
+    except ValueError:
+        limit = 8
+    response = JsonResponse({
+        'results': [airports.serialize(airport) for airport in airports.search(request.GET.get('q', ''), limit)],
+    })
+    # Ro'yxat deploy'gacha o'zgarmaydi — brauzer va CDN keshlay oladi
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
+
+
+def _unknown_airport(field, value):
+    # Xato yozilgan bo'lsa ("Tashkentt", "JFX") — prefiksni qisqartirib, eng yaqin takliflarni topamiz
+    suggestions = []
+    for length in range(min(len(value), 40), 1, -1):
+        suggestions = [airports.serialize(airport) for airport in airports.search(value[:length], 5)]
+        if suggestions:
+            break
+    error = f'"{value}" does not match a single airport or city.'
+    if suggestions:
+        error += " Did you mean " + ", ".join(f"{s['code']} ({s['city']})" for s in suggestions) + "?"
+    return JsonResponse({
+        'error': error,
+        'field': field,
+        'suggestions': suggestions,
+    }, status=400)
+
+
+def _parse_date(value):
+    # '2026-12-10' -> '2026-12-10'; noto'g'ri bo'lsa None (Amadeus'ga faqat kanonik ISO sana boradi)
+    try:
+        return date_cls.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _optional_number(value, cast):
+    if value in (None, ''):
+        return None
+    return cast(value)
+
+
 @login_required
 def flight_search_api(request):
     """Frontenddan kelgan so'rovni Amadeusga yuboradi va natijani JSON qiladi"""
@@ -29,10 +78,13 @@ def flight_search_api(request):
         data = json.loads(request.body)
 
         # Ma'lumotlarni o'qish
-        origin = data.get('from', '').upper()
-        destination = data.get('to', '').upper()
+        origin = data.get('from', '').strip()
+        destination = data.get('to', '').strip()
         date = data.get('departDate')
+        return_date = data.get('returnDate') or None
         passengers = int(data.get('passengers', 1))
+        # ±N kun (0 = faqat tanlangan sana)
+        flex_days = max(0, min(int(data.get('flexDays') or 0), settings.FLIGHT_FLEX_MAX_DAYS))
 
         # Klassni to'g'irlash
         travel_class_map = {
@@ -46,66 +98,86 @@ def flight_search_api(request):
         if not origin or not destination or not date:
             return JsonResponse({'error': 'Please fill all required fields'}, status=400)
 
-        # 2. HAQIQIY AMADEUS API CHAQIRUVI
-        response = amadeus.shopping.flight_offers_search.get(
-            originLocationCode=origin,
-            destinationLocationCode=destination,
-            departureDate=date,
-            adults=passengers,
-            travelClass=travel_class,
-            max=10
-        )
-
-        # 3. KELGAN JAVOBNI PARSING QILISH
-        results = []
-        offers = response.data
-        dictionaries = response.result.get('dictionaries', {})
-
-        for offer in offers:
-            itinerary = offer['itineraries'][0]
-            segment = itinerary['segments'][0]
-            carrier_code = segment['carrierCode']
-            airline_name = dictionaries.get('carriers', {}).get(carrier_code, carrier_code)
-
-            # Vaqtni olish
-            dep_time_raw = segment['departure']['at']  # "2023-12-01T10:00:00"
-            arr_time_raw = segment['arrival']['at']
-
-            # Duration (PT5H30M -> 5h 30m ga o'girish qiyin bo'lsa, shunchaki raw olamiz)
-            duration_raw = itinerary['duration'].replace('PT', '').lower()
-
-            flight_data = {
-                "id": offer['id'],
-                "airline": airline_name,
-                "flightNumber": f"{carrier_code} {segment['number']}",
-                "departure": {
-                    "airport": segment['departure']['iataCode'],
-                    "city": origin,
-                    "time": dep_time_raw.split('T')[1][:5]
-                },
-                "arrival": {
-                    "airport": segment['arrival']['iataCode'],
-                    "city": destination,
-                    "time": arr_time_raw.split('T')[1][:5]
-                },
-                "duration": duration_raw,
-                "price": float(offer['price']['total']),
-                "currency": offer['price']['currency'],
-                "stops": len(itinerary['segments']) - 1,
-                "class": travel_class.capitalize(),
-                "rating": 4.5
-            }
-            results.append(flight_data)
-
-        return JsonResponse({'status': 'success', 'results': results})
-
-    except ResponseError as error:
-        print(f"Amadeus Error: {error}")
+        date = _parse_date(date)
+        if date is None:
+            return JsonResponse({'error': 'Invalid departure date', 'field': 'departDate'}, status=400)
+        if return_date is not None:
+            return_date = _parse_date(return_date)
+            if return_date is None:
+                return JsonResponse({'error': 'Invalid return date', 'field': 'returnDate'}, status=400)
+            if return_date < date:
+                return JsonResponse(
+                    {'error': 'Return date must not be before departure date', 'field': 'returnDate'}, status=400,
+                )
+
+        # Kodlar Amadeusga bormasdan tekshiriladi: shahar nomi ham qabul qilinadi ("Tashkent" -> TAS)
+        origin_code = airports.resolve(origin)
+        if origin_code is None:
+            return _unknown_airport('from', origin)
+        destination_code = airports.resolve(destination)
+        if destination_code is None:
+            return _unknown_airport('to', destination)
+        if origin_code == destination_code:
+            return JsonResponse({'error': 'Origin and destination must be different', 'field': 'to'}, status=400)
+        origin, destination = origin_code, destination_code
+
+        # 2. AMADEUS API CHAQIRUVLARI: har bir (yo'nalish, sana) parallel (search.py)
+        legs = {'outbound': (origin, destination, search.flex_dates(date, flex_days))}
+        if return_date:
+            legs['return'] = (destination, origin, search.flex_dates(return_date, flex_days))
+
+        queries = [
+            (leg_origin, leg_destination, day, passengers, travel_class)
+            for leg_origin, leg_destination, days in legs.values()
+            for day in days
+        ]
+        responses = search.fan_out(queries)
+
+        failures = [r for r in responses.values() if isinstance(r, Exception)]
+        if len(failures) == len(responses):
+            raise failures[0]
+
+        # Server tomonda filtr/sort (normalize.py)
+        sort = data.get('sort', 'price')
+        filters = {
+            'max_price': _optional_number(data.get('maxPrice'), float),
+            'max_stops': _optional_number(data.get('maxStops'), int),
+            'max_duration': _optional_number(data.get('maxDuration'), int),  # daqiqa
+        }
+
+        # 3. KELGAN JAVOBNI PARSING QILISH: barcha segmentlar bilan, keyin filtr va sort
+        flights = {}
+        for leg, (leg_origin, leg_destination, days) in legs.items():
+            leg_flights = []
+            for day in days:
+                response = responses[(leg_origin, leg_destination, day, passengers, travel_class)]
+                if isinstance(response, Exception):
+                    logger.error("Amadeus error (%s-%s %s)", leg_origin, leg_destination, day, exc_info=response)
+                    continue
+                leg_flights.extend(normalize.normalize_offers(response, leg_origin, leg_destination, travel_class, day))
+            flights[leg] = normalize.sort_flights(normalize.filter_flights(leg_flights, **filters), sort)
+
+        return JsonResponse({
+            'status': 'success',
+            'results': flights['outbound'],
+            'returnResults': flights.get('return', []),
+            'calendar': {leg: search.cheapest_per_day(leg_flights) for leg, leg_flights in flights.items()},
+            'route': {'from': origin, 'to': destination},
+        })
+
+    except ResponseError:
+        logger.exception("Amadeus error")
         # Xatoni chiroyliroq qaytaramiz
         return JsonResponse({
-            'error': 'No flights found. Make sure to use IATA codes (e.g. TAS, JFK, IST).'
+            'error': 'No flights found for this route and date.'
         }, status=400)
 
     except Exception as e:
-        print(f"Server Error: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        logger.exception("Flight search error")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@staff_member_required
+def flight_search_metrics(request):
+    """Kesh hit/miss va Amadeus latency metrikalari (faqat staff uchun)"""
+    return JsonResponse(offers.metrics())
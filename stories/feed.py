@@ -0,0 +1,153 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Exists, OuterRef, Prefetch, Q
+
+from config.media import media_url
+
+from .models import Story, StoryImage, Comment
+
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 50
+
+# Feed'da har bir story bilan faqat oxirgi N ta komment; qolgani comments API orqali sahifalab
+FEED_INLINE_COMMENTS = 3
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursor = "created_at|id" (base64). Shunda sahifalar OFFSET'siz, indeks bo'yicha olinadi.
+# Story va Comment uchun bir xil.
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, story_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(story_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def comments_queryset():
+    # Eng yangisi birinchi: (story, -created_at, -id) indeksi bo'yicha
+    return Comment.objects.select_related('author__profile').order_by('-created_at', '-id')
+
+
+def feed_queryset(user, feed_filter='all', place_id=None):
+    """Bitta sahifa uchun barcha kerakli ma'lumot: 1 ta asosiy so'rov + 2 ta prefetch."""
+    # Har bir story uchun oxirgi N ta komment (sliced prefetch — bitta so'rov, window function bilan)
+    comments_qs = comments_queryset()[:FEED_INLINE_COMMENTS]
+
+    # Yaroqsiz (decode bo'lmagan) rasmlar ko'rsatilmaydi
+    images_qs = StoryImage.objects.exclude(status=StoryImage.STATUS_FAILED).order_by('id')
+
+    queryset = Story.objects.select_related('author__profile', 'place').prefetch_related(
+        Prefetch('images', queryset=images_qs),
+        Prefetch('comments', queryset=comments_qs, to_attr='latest_comments'),
+    ).annotate(
+        is_liked=Exists(Story.likes.through.objects.filter(story_id=OuterRef('pk'), user_id=user.id)),
+        is_saved=Exists(Story.saved_by.through.objects.filter(story_id=OuterRef('pk'), user_id=user.id)),
+    )
+
+    if feed_filter == 'saved':
+        queryset = queryset.filter(saved_by=user)
+    elif feed_filter == 'my':
+        queryset = queryset.filter(author=user)
+
+    # Joy bo'yicha: matn emas, place_id (indeksli FK)
+    if place_id is not None:
+        queryset = queryset.filter(place_id=place_id)
+
+    return queryset.order_by('-created_at', '-id')
+
+
+def get_feed_page(user, cursor=None, limit=FEED_PAGE_SIZE, feed_filter='all', place_id=None):
+    queryset = feed_queryset(user, feed_filter, place_id)
+
+    if cursor:
+        created_at, story_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=story_id)
+        )
+
+    # Bitta ortiqcha yozuv olamiz: keyingi sahifa bormi-yo'qmi shundan bilamiz
+    stories = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(stories[limit - 1]) if len(stories) > limit else None
+    return stories[:limit], next_cursor
+
+
+def get_comments_page(story_id, cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """Storyning kommentlari, yangisidan eskisiga. next_cursor — keyingi (eskiroq) sahifa uchun."""
+    queryset = comments_queryset().filter(story_id=story_id)
+
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=comment_id)
+        )
+
+    comments = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(comments[limit - 1]) if len(comments) > limit else None
+    return comments[:limit], next_cursor
+
+
+def avatar_url(user):
+    if hasattr(user, 'profile') and user.profile.profile_picture:
+        return media_url(user.profile.profile_picture)
+    return None
+
+
+def serialize_image(img):
+    # Feed'da 1080px WebP; to'liq o'lcham faqat bosilganda ochiladi
+    return {
+        'src': img.feed_url,
+        'thumb': img.thumbnail_url,
+        'full': media_url(img.image),
+        'width': img.width,
+        'height': img.height,
+        'blurhash': img.blurhash,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'authorAvatar': avatar_url(comment.author),
+        'text': comment.text,
+        'timestamp': comment.get_date(),
+    }
+
+
+def serialize_story(story):
+    latest = story.latest_comments
+    return {
+        'id': story.id,
+        'share_uuid': str(story.share_uuid),
+        'author': story.author.username,
+        'authorId': story.author.id,
+        'authorAvatar': avatar_url(story.author),
+        'location': story.location,
+        'place': {'id': story.place_id, 'name': story.place.name, 'country': story.place.country} if story.place_id else None,
+        'date': story.get_date(),
+        'title': story.title,
+        'content': story.content,
+        'images': [serialize_image(img) for img in story.images.all()],
+        'likes': story.likes_count,
+        'saves': story.saves_count,
+        'commentsCount': story.comments_count,
+        'views': story.views_count,
+        'comments': [serialize_comment(c) for c in reversed(latest)],  # eskisidan yangisiga
+        # Eskiroq kommentlar bo'lsa — comments API uchun cursor
+        'commentsCursor': encode_cursor(latest[-1]) if story.comments_count > len(latest) else None,
+        'isLiked': story.is_liked,
+        'isSaved': story.is_saved,
+    }
@@ -0,0 +1,260 @@
+# stories/images.py
+#
+# Story rasmlari pipeline'i. Request ichida faqat yengil tekshiruv va asl faylni saqlash (bulk_create),
+# qolgani fon rejimida: Pillow bilan decode, EXIF orientatsiyasi, metadatani olib tashlash,
+# thumbnail/feed (WebP) va full (JPEG) renditionlar, width/height va blurhash.
+# Ishchi: thread pool (STORY_IMAGE_ASYNC) yoki `manage.py process_story_images`.
+
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config.perf import timed
+
+from .models import StoryImage
+
+logger = logging.getLogger(__name__)
+
+# name: (maksimal tomon, format, sifat)
+RENDITIONS = {
+    'thumbnail': (320, 'WEBP', 75),
+    'feed_image': (1080, 'WEBP', 80),
+    'image': (2048, 'JPEG', 85),
+}
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def validate_upload(upload):
+    """Request ichidagi arzon tekshiruv (decode qilinmaydi): hajm va content type."""
+    if upload.size > settings.STORY_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(f"{upload.name}: file is too large")
+    if not (upload.content_type or '').startswith('image/'):
+        raise ValidationError(f"{upload.name}: not an image")
+
+
+def create_story_images(story, uploads):
+    """Asl fayllarni bitta bulk_create bilan saqlaydi va qayta ishlashni navbatga qo'yadi."""
+    for upload in uploads:
+        validate_upload(upload)
+
+    # Fayllar storage'ga (Cloudinary) shu yerda yuklanadi
+    with timed(settings.MEDIA_STORAGE):
+        rows = StoryImage.objects.bulk_create([StoryImage(story=story, image=upload) for upload in uploads])
+    enqueue_processing([row.pk for row in rows])
+    return rows
+
+
+# --- Blurhash (https://blurha.sh) ---
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+_SRGB_TO_LINEAR = [((c / 255) / 12.92) if c / 255 <= 0.04045 else (((c / 255) + 0.055) / 1.055) ** 2.4 for c in range(256)]
+
+
+def _encode83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image, x_components=4, y_components=3):
+    """Rasmning ~30 belgili xira placeholder'i (32px nusxadan hisoblanadi)."""
+    small = image.convert('RGB')
+    small.thumbnail((32, 32))
+    width, height = small.size
+    pixels = [tuple(_SRGB_TO_LINEAR[c] for c in pixel) for pixel in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    def quantise(value):
+        return max(0, min(18, int(_sign_pow(value / max_value, 0.5) * 9 + 9.5)))
+
+    for r, g, b in ac:
+        result += _encode83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+    return result
+
+
+# --- Qayta ishlash ---
+
+def decode_image(fileobj):
+    """Pillow bilan tekshirib ochadi. EXIF orientatsiyasi qo'llanadi (metadata keyin saqlanmaydi)."""
+    try:
+        with Image.open(fileobj) as probe:
+            if probe.width * probe.height > settings.STORY_IMAGE_MAX_PIXELS:
+                raise ValidationError("Image dimensions are too large")
+            probe.verify()
+        fileobj.seek(0)
+        image = Image.open(fileobj)
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValidationError(f"Invalid image: {e}")
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def render(image, max_side, fmt, quality):
+    """Bitta rendition. Yangi fayl EXIF/ICC/XMP'siz yoziladi."""
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    if fmt == 'JPEG' and copy.mode == 'RGBA':
+        # JPEG'da shaffoflik yo'q — oq fonga qo'yamiz
+        background = Image.new('RGB', copy.size, (255, 255, 255))
+        background.paste(copy, mask=copy.getchannel('A'))
+        copy = background
+
+    buffer = BytesIO()
+    copy.save(buffer, format=fmt, quality=quality, optimize=True)
+    return copy.size, ContentFile(buffer.getvalue())
+
+
+def claim_image(image_id):
+    """Rasmni 'processing' ga o'tkazadi. Boshqa ishchi olib bo'lgan bo'lsa None qaytaradi."""
+    claimed = StoryImage.objects.filter(
+        pk=image_id, status=StoryImage.STATUS_PENDING
+    ).update(status=StoryImage.STATUS_PROCESSING, started_at=timezone.now())
+    if not claimed:
+        return None
+    return StoryImage.objects.get(pk=image_id)
+
+
+def process_story_image(image_id):
+    row = claim_image(image_id)
+    if row is None:
+        return
+
+    original_name = row.image.name
+    try:
+        with row.image.open('rb') as fileobj:
+            image = decode_image(fileobj)
+    except (ValidationError, FileNotFoundError) as e:
+        logger.warning("Story image %s rejected: %s", image_id, e)
+        row.status = StoryImage.STATUS_FAILED
+        row.save(update_fields=['status'])
+        return
+
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    written = []
+    try:
+        for field_name, (max_side, fmt, quality) in RENDITIONS.items():
+            size, content = render(image, max_side, fmt, quality)
+            with timed(settings.MEDIA_STORAGE):
+                getattr(row, field_name).save(f"{stem}.{EXTENSIONS[fmt]}", content, save=False)
+            written.append(getattr(row, field_name).name)
+            if field_name == 'image':
+                row.width, row.height = size
+
+        row.blurhash = blurhash(image)
+        row.status = StoryImage.STATUS_READY
+        row.save(update_fields=['image', 'thumbnail', 'feed_image', 'width', 'height', 'blurhash', 'status'])
+    except Exception:
+        # Yarim yozilgan renditionlar o'chiriladi, qator asl fayl bilan qayta navbatga qaytadi
+        storage = row.image.storage
+        for name in written:
+            try:
+                storage.delete(name)
+            except Exception:
+                logger.exception("Story image %s: could not delete partial rendition %s", image_id, name)
+        StoryImage.objects.filter(pk=image_id).update(status=StoryImage.STATUS_PENDING)
+        raise
+
+    # Asl (katta, metadata bilan) fayl endi kerak emas
+    if original_name != row.image.name:
+        with timed(settings.MEDIA_STORAGE):
+            row.image.storage.delete(original_name)
+
+
+def requeue_stale(timeout_seconds):
+    """Ishchi o'lib qolgan bo'lsa, uzoq 'processing' turgan rasmlarni qayta 'pending' qiladi."""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return StoryImage.objects.filter(
+        status=StoryImage.STATUS_PROCESSING,
+        started_at__lt=cutoff,
+    ).update(status=StoryImage.STATUS_PENDING)
+
+
+def run_in_worker(image_id):
+    try:
+        process_story_image(image_id)
+    except Exception:
+        logger.exception("Story image worker error (image %s)", image_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.STORY_IMAGE_WORKERS,
+                thread_name_prefix='story-images',
+            )
+        return _executor
+
+
+def enqueue_processing(image_ids):
+    """Rasm qatorlari commit bo'lgandan keyin qayta ishlashni boshlaydi."""
+    if not image_ids:
+        return
+    if not settings.STORY_IMAGE_ASYNC:
+        transaction.on_commit(lambda: [process_story_image(pk) for pk in image_ids])
+        return
+
+    # STORY_IMAGE_ASYNC=True, lekin thread'siz muhitda (Vercel) `manage.py process_story_images` ishlaydi
+    if settings.STORY_IMAGE_USE_THREADS:
+        transaction.on_commit(lambda: [get_executor().submit(run_in_worker, pk) for pk in image_ids])
@@ -0,0 +1,113 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from config.media import clear_media_urls
+from stories.feed import feed_queryset, serialize_story
+from stories.models import Comment, Story, StoryImage
+from trips.models import Profile
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Feed serializatsiyasini (avatar va rasm URL'lari bilan) har bir media storage backend'ida o'lchaydi: "
+        "memoizatsiyasiz, sovuq va issiq kesh. Test ma'lumotlari tranzaksiya ichida yaratiladi va o'chiriladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=50, help="Bitta sahifadagi story'lar soni")
+        parser.add_argument('--images', type=int, default=4, help="Har bir story'dagi rasmlar")
+        parser.add_argument('--comments', type=int, default=20, help="Har bir story'dagi kommentlar")
+        parser.add_argument('--users', type=int, default=25, help="Muallif/kommentatorlar soni (avatar bilan)")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--backend', action='append', choices=sorted(settings.MEDIA_STORAGE_BACKENDS),
+            help="Faqat shu backend(lar). Default: local, memory (+ cloudinary, CLOUD_NAME sozlangan bo'lsa)",
+        )
+
+    def handle(self, *args, **options):
+        backends = options['backend'] or ['local', 'memory']
+        if not options['backend'] and settings.CLOUDINARY_STORAGE.get('CLOUD_NAME'):
+            backends.append('cloudinary')
+
+        try:
+            with transaction.atomic():
+                stories = self.seed(options)
+                for backend in backends:
+                    self.run_backend(backend, stories, options['iterations'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        if options['users'] < 1:
+            raise CommandError("--users kamida 1 bo'lishi kerak")
+
+        # bulk_create signal yubormaydi — Profile'larni ham o'zimiz yaratamiz
+        users = User.objects.bulk_create([
+            User(username=f"feed-bench-{i}") for i in range(options['users'])
+        ])
+        Profile.objects.bulk_create([
+            Profile(user=user, profile_picture=f"profile_pics/feed-bench-{user.pk}.jpg") for user in users
+        ])
+
+        stories = Story.objects.bulk_create([
+            Story(author=users[i % len(users)], title=f"Story {i}", location="Samarkand", content="Lorem ipsum " * 20)
+            for i in range(options['stories'])
+        ])
+        StoryImage.objects.bulk_create([
+            StoryImage(
+                story=story,
+                image=f"story_images/bench-{story.pk}-{n}.jpg",
+                thumbnail=f"story_images/thumbs/bench-{story.pk}-{n}.webp",
+                feed_image=f"story_images/feed/bench-{story.pk}-{n}.webp",
+                status=StoryImage.STATUS_READY,
+                width=2048, height=1365,
+            )
+            for story in stories for n in range(options['images'])
+        ])
+        Comment.objects.bulk_create([
+            Comment(story=story, author=users[(story.pk + n) % len(users)], text="Ajoyib!")
+            for story in stories for n in range(options['comments'])
+        ])
+
+        # Feed bilan bir xil so'rovlar; DB vaqti o'lchovga kirmaydi
+        return list(feed_queryset(users[0]).filter(pk__in=[story.pk for story in stories]))
+
+    def run_backend(self, backend, stories, iterations):
+        storages = {**settings.STORAGES, 'default': {'BACKEND': settings.MEDIA_STORAGE_BACKENDS[backend]}}
+        with override_settings(STORAGES=storages):
+            results = [
+                ('no memo', self.measure(stories, iterations, ttl=0, warm=False)),
+                ('memo (cold)', self.measure(stories, iterations, ttl=settings.MEDIA_URL_CACHE_TTL or 3600, warm=False)),
+                ('memo (warm)', self.measure(stories, iterations, ttl=settings.MEDIA_URL_CACHE_TTL or 3600, warm=True)),
+            ]
+
+        for label, timings in results:
+            median = statistics.median(timings)
+            p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{backend:<10} {label:<12} {len(stories)} story: median {median:.2f} ms, p95 {p95:.2f} ms"
+            )
+
+    def measure(self, stories, iterations, ttl, warm):
+        timings = []
+        with override_settings(MEDIA_URL_CACHE_TTL=ttl):
+            if warm:
+                [serialize_story(story) for story in stories]
+            for _ in range(iterations):
+                if not warm:
+                    clear_media_urls()
+                started = time.perf_counter()
+                [serialize_story(story) for story in stories]
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
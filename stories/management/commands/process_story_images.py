@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from stories.images import process_story_image, requeue_stale
+from stories.models import StoryImage
+
+
+class Command(BaseCommand):
+    help = "'pending' holatdagi story rasmlari uchun renditionlar yaratadi (thread'siz muhitlar va eski rasmlar uchun)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Ko'pi bilan shuncha rasm")
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help="Shuncha soniyadan beri 'processing' turgan rasmlar qayta navbatga qo'yiladi",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f"Qayta navbatga qo'yildi: {requeued}")
+
+        image_ids = StoryImage.objects.filter(status=StoryImage.STATUS_PENDING).order_by('pk').values_list('pk', flat=True)
+        if options['limit']:
+            image_ids = image_ids[:options['limit']]
+
+        processed = 0
+        for image_id in list(image_ids):
+            try:
+                process_story_image(image_id)
+            except Exception as e:
+                # Qator 'pending' ga qaytgan — keyingi ishga tushirishda qayta uriniladi
+                self.stderr.write(f"Rasm {image_id}: {e}")
+                continue
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Ishlandi: {processed} ta rasm"))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stories.ranking import build_feed_candidates, update_story_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "\"For you\" feed reytingini hisoblaydi: o'zgargan story'lar uchun StoryScore, "
+        "keyin faol userlar uchun FeedCandidate ro'yxatlari (davriy ishchi)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Bir marta hisoblab chiqib ketadi")
+        parser.add_argument('--interval', type=float, default=300.0, help="Hisoblashlar orasidagi pauza (soniya)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="StoryScore partiyasi")
+        parser.add_argument('--user-batch-size', type=int, default=200, help="FeedCandidate partiyasi (userlar)")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            scored = update_story_scores(batch_size=options['batch_size'])
+            scored_at = time.monotonic()
+            users = build_feed_candidates(batch_size=options['user_batch_size'])
+            self.stdout.write(
+                f"StoryScore: {scored} ta ({scored_at - started:.1f}s), "
+                f"FeedCandidate: {users} ta user ({time.monotonic() - scored_at:.1f}s)"
+            )
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from stories.models import Story
+from stories.search import index_stories
+
+
+class Command(BaseCommand):
+    help = (
+        "Story qidiruv indeksini (Postgres tsvector / SQLite FTS5) qayta quradi. Odatda signallar yetarli — "
+        "bu buyruq indeks qo'lda o'zgartirilganda yoki bulk_create/update() bilan yozilgan story'lar uchun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                Story.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                index_stories(ids)
+            last_pk = ids[-1]
+            indexed += len(ids)
+            self.stdout.write(f"  pk <= {last_pk}: {indexed} ta indekslandi")
+
+        self.stdout.write(f"Tayyor: {indexed} ta story")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from stories.models import Story, Comment
+from stories.signals import count_subquery, recount_stories
+
+
+class Command(BaseCommand):
+    help = "Story hisoblagichlarini (likes/saves/comments) qayta hisoblab, driftni tuzatadi"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Hech narsa yozmaydi, faqat nechta hikoyada drift borligini ko'rsatadi",
+        )
+
+    def handle(self, *args, **options):
+        drifted = Story.objects.annotate(
+            real_likes=count_subquery(Story.likes.through),
+            real_saves=count_subquery(Story.saved_by.through),
+            real_comments=count_subquery(Comment, fk_name='story'),
+        ).exclude(
+            Q(likes_count=F('real_likes'))
+            & Q(saves_count=F('real_saves'))
+            & Q(comments_count=F('real_comments'))
+        ).values_list('pk', flat=True)
+
+        drifted_ids = list(drifted)
+        self.stdout.write(f"Drift topildi: {len(drifted_ids)} ta hikoya")
+
+        if options['dry_run'] or not drifted_ids:
+            return
+
+        with transaction.atomic():
+            updated = recount_stories(Story.objects.filter(pk__in=drifted_ids))
+
+        self.stdout.write(self.style.SUCCESS(f"Yangilandi: {updated} ta hikoya"))
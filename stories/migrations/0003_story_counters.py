@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 12:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Story = apps.get_model('stories', 'Story')
+    Comment = apps.get_model('stories', 'Comment')
+
+    def count_of(model):
+        counts = model.objects.filter(story_id=OuterRef('pk')).order_by() \
+            .values('story_id').annotate(total=Count('*')).values('total')
+        return Coalesce(Subquery(counts), 0)
+
+    Story.objects.update(
+        likes_count=count_of(Story.likes.through),
+        saves_count=count_of(Story.saved_by.through),
+        comments_count=count_of(Comment),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0002_story_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='saves_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0003_story_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storyimage',
+            name='blurhash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='storyimage',
+            name='feed_image',
+            field=models.ImageField(blank=True, null=True, upload_to='story_images/feed/'),
+        ),
+        migrations.AddField(
+            model_name='storyimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storyimage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='storyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='story_images/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='storyimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0005_comment_story_created_idx'),
+        ('trips', '0007_place'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='place',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stories', to='trips.place'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['place', '-created_at', '-id'], name='story_place_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 13:40
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+def normalize_search_text(value):
+    # trips.models.normalize_search_text nusxasi (migratsiya model kodiga bog'lanmasligi uchun)
+    text = unicodedata.normalize('NFKD', value or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+# Postgres: tsvector jadvali + GIN indeks; SQLite: FTS5 virtual jadval (stories/search.py)
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS stories_story_search ('
+            ' story_id bigint PRIMARY KEY REFERENCES stories_story (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+            ' document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS story_search_document_idx ON stories_story_search USING gin (document)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS stories_story_fts USING fts5(title, location, content, comments)'
+        )
+    else:
+        return
+    fill_search_index(apps, schema_editor)
+
+
+def fill_search_index(apps, schema_editor):
+    Story = apps.get_model('stories', 'Story')
+    Comment = apps.get_model('stories', 'Comment')
+    postgres = schema_editor.connection.vendor == 'postgresql'
+
+    last_pk = 0
+    while True:
+        stories = list(Story.objects.select_related('place').filter(pk__gt=last_pk).order_by('pk')[:500])
+        if not stories:
+            break
+        last_pk = stories[-1].pk
+        comments = {}
+        for story_id, text in Comment.objects.filter(story_id__in=[story.pk for story in stories]) \
+                .order_by('pk').values_list('story_id', 'text'):
+            comments.setdefault(story_id, []).append(text)
+
+        for story in stories:
+            location = f"{story.location} {story.place.name}" if story.place_id else story.location
+            values = [
+                story.pk,
+                normalize_search_text(story.title),
+                normalize_search_text(location),
+                normalize_search_text(story.content),
+                normalize_search_text(' '.join(comments.get(story.pk, []))),
+            ]
+            if postgres:
+                schema_editor.execute(
+                    'INSERT INTO stories_story_search (story_id, document) VALUES (%s, '
+                    "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'D')) "
+                    'ON CONFLICT (story_id) DO NOTHING',
+                    values,
+                )
+            else:
+                schema_editor.execute(
+                    'INSERT INTO stories_story_fts (rowid, title, location, content, comments) VALUES (%s, %s, %s, %s, %s)',
+                    values,
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS stories_story_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS stories_story_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0006_story_place'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
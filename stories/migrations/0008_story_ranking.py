@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0007_story_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryScore',
+            fields=[
+                ('story', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='stories.story')),
+                ('score', models.FloatField()),
+                ('velocity', models.FloatField(default=0)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('saves', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', '-story'], name='story_score_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_candidates', to='stories.story')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_candidates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score', '-story'], name='feed_candidate_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'story'), name='feed_candidate_unique')],
+            },
+        ),
+    ]
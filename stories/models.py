@@ -4,11 +4,17 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils.timesince import timesince
 
+from config.media import media_url
+from trips.models import Place
+from trips.places import place_for
+
 
 class Story(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stories')
     title = models.CharField(max_length=200)
     location = models.CharField(max_length=200)
+    # Gazetteer bo'yicha aniqlangan joy (trips/places.py), saqlashda yangilanadi
+    place = models.ForeignKey(Place, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='stories')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     share_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -19,12 +25,59 @@ class Story(models.Model):
     # Ko'rishlar soni
     views_count = models.IntegerField(default=0)
 
+    # Denormalizatsiya qilingan hisoblagichlar (F() bilan yangilanadi, signals.py ga qarang)
+    likes_count = models.PositiveIntegerField(default=0)
+    saves_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['-created_at']  # Eng yangisi tepada turadi
+        indexes = [
+            # Feed cursor pagination (created_at, id) uchun
+            models.Index(fields=['-created_at', '-id'], name='story_feed_idx'),
+            # Joy bo'yicha feed (?place=<id>)
+            models.Index(fields=['place', '-created_at', '-id'], name='story_place_feed_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    # Bazadagi qiymatlari eslab qolinadigan maydonlar: save() joyni, qidiruv indeksi (signals.py)
+    # esa story'ni faqat shulardan biri o'zgarganda qayta hisoblaydi (hisoblagichlar uchun emas)
+    TRACKED_FIELDS = ('title', 'content', 'location', 'place_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded()
+        return instance
+
+    def _remember_loaded(self, update_fields=None):
+        # Deferred maydonlar __dict__ da yo'q — ular uchun bazaga bormaymiz.
+        # update_fields bilan saqlanganda faqat yozilgan maydonlar yangilanadi
+        values = {
+            name: self.__dict__.get(name) for name in self.TRACKED_FIELDS
+            if update_fields is None or name in update_fields or name.removesuffix('_id') in update_fields
+        }
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **values}
+
+    def changed_fields(self):
+        """Oxirgi yuklash/saqlashdan beri o'zgargan TRACKED_FIELDS (yangi obyektda — hammasi)."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(self.TRACKED_FIELDS)
+        return {name for name in self.TRACKED_FIELDS if self.__dict__.get(name) != loaded.get(name)}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'location' in update_fields:
+            if 'location' in self.changed_fields():
+                self.place = place_for(self.location)
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'place'}
+        super().save(*args, **kwargs)
+        self._remember_loaded(kwargs.get('update_fields'))
+
     # Vaqtni chiroyli ko'rsatish uchun (masalan: "2 hours ago")
     def get_date(self):
         return timesince(self.created_at) + " ago"
@@ -32,8 +85,39 @@ class Story(models.Model):
 
 # Rasm (Bitta hikoyada ko'p rasm bo'lishi mumkin)
 class StoryImage(models.Model):
+    # Yuklangan fayl fon rejimida qayta ishlanadi (stories/images.py)
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='images')
+    # Qayta ishlangandan keyin: 'full' rendition (JPEG, metadatasiz). Undan oldin — asl fayl.
     image = models.ImageField(upload_to='story_images/')
+    thumbnail = models.ImageField(upload_to='story_images/thumbs/', blank=True, null=True)  # WebP, 320px
+    feed_image = models.ImageField(upload_to='story_images/feed/', blank=True, null=True)  # WebP, 1080px
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Ishchi qatorni 'processing' ga o'tkazgan vaqt — osilib qolganlar qayta navbatga qo'yiladi
+    started_at = models.DateTimeField(blank=True, null=True)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    blurhash = models.CharField(max_length=64, blank=True, default="")
+
+    @property
+    def feed_url(self):
+        # Rendition hali tayyor bo'lmasa asl rasm
+        return media_url(self.feed_image) if self.feed_image else media_url(self.image)
+
+    @property
+    def thumbnail_url(self):
+        return media_url(self.thumbnail) if self.thumbnail else self.feed_url
 
 
 # Kommentlar
@@ -43,5 +127,46 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Komment sahifalari (story bo'yicha, created_at + id cursor)
+            models.Index(fields=['story', '-created_at', '-id'], name='comment_story_created_idx'),
+        ]
+
     def get_date(self):
-        return timesince(self.created_at) + " ago"
\ No newline at end of file
+        return timesince(self.created_at) + " ago"
+
+# Feed reytingi (stories/ranking.py): `manage.py rank_stories` davriy hisoblaydi, feed faqat o'qiydi
+class StoryScore(models.Model):
+    story = models.OneToOneField(Story, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    # log(engagement + velocity) + created_at / yarim yemirilish: vaqtga bog'liq emas, faqat faollikda o'zgaradi
+    score = models.FloatField()
+    # Tezlik: og'irlikli interaksiyalar/soat (EMA) va oxirgi hisoblashdagi hisoblagichlar
+    velocity = models.FloatField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    saves = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    views = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Umumiy reyting feed'i (shaxsiy ro'yxati yo'q userlar uchun)
+            models.Index(fields=['-score', '-story'], name='story_score_rank_idx'),
+        ]
+
+
+# Har bir faol user uchun tayyor nomzodlar ro'yxati: StoryScore + user'ning joylariga yaqinlik
+class FeedCandidate(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_candidates')
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='feed_candidates')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'story'], name='feed_candidate_unique'),
+        ]
+        indexes = [
+            # "For you" sahifasi: (user, -score, -story) bo'yicha bitta range scan
+            models.Index(fields=['user', '-score', '-story'], name='feed_candidate_rank_idx'),
+        ]
@@ -0,0 +1,325 @@
+# stories/ranking.py
+#
+# "For you" feed reytingi. Hisoblash davriy ishchida (`manage.py rank_stories`), feed tayyor qatorlarni o'qiydi:
+#   StoryScore    — har bir story uchun umumiy ball: yangilik + engagement (likes/saves/comments/views) + tezlik
+#   FeedCandidate — trip/layk/saqlash orqali joylari yoki trip qiziqishlari ma'lum faol user uchun
+#                   eng yaxshi STORY_RANK_CANDIDATES ta story (qiziqish — story sarlavhasi/matnidagi so'z)
+# Ball log ko'rinishida: ln(1 + engagement + tezlik) + created_at * ln2 / yarim_yemirilish.
+# Bu engagement * 2^(-yosh / yarim_yemirilish) bilan bir xil tartib beradi, lekin "hozir"ga bog'liq emas —
+# shuning uchun har safar faqat hisoblagichlari o'zgargan yoki tezligi hali so'nmagan story'lar qayta hisoblanadi.
+# Sahifa: (user, -score, -story) indeksi bo'yicha keyset. Ro'yxati yo'q user — umumiy StoryScore,
+# u ham bo'sh bo'lsa (ishchi hali ishlamagan) — oddiy xronologik feed.
+
+import base64
+import heapq
+import math
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from trips.models import Trip, normalize_search_text
+
+from .feed import FEED_PAGE_SIZE, InvalidCursor, feed_queryset, get_feed_page
+from .models import FeedCandidate, Story, StoryScore
+
+# Interaksiya og'irliklari: saqlash laykdan qimmatroq, ko'rish arzon
+LIKE_WEIGHT = 1.0
+SAVE_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.5
+VIEW_WEIGHT = 0.05
+
+# Tezlik (og'irlikli interaksiyalar/soat) EMA bilan silliqlanadi; 1 interaksiya/soat ~ 4 ta yig'ilgan interaksiya
+VELOCITY_WEIGHT = 4.0
+VELOCITY_WINDOW_HOURS = 6
+VELOCITY_EPSILON = 0.01
+
+# Yaqinlik: user'ning trip joylari va layk bosgan/saqlagan story'lari joylari
+TRIP_AFFINITY = 1.0
+ENGAGED_AFFINITY = 0.5
+AFFINITY_WEIGHT = 2.0
+# Trip qiziqishi ("Food, Street art") story sarlavhasi yoki matnida uchrasa — har biri uchun
+INTEREST_AFFINITY = 0.5
+# Har bir yaqin joydan olinadigan nomzodlar (umumiy top'ga kirmagan bo'lsa ham)
+PLACE_CANDIDATES = 50
+
+SOURCE_USER = 'u'
+SOURCE_GLOBAL = 'g'
+SOURCE_RECENT = 'c'
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _decay_rate():
+    return math.log(2) / (settings.STORY_RANK_HALF_LIFE_HOURS * 3600)
+
+
+def engagement(likes, saves, comments, views):
+    return LIKE_WEIGHT * likes + SAVE_WEIGHT * saves + COMMENT_WEIGHT * comments + VIEW_WEIGHT * views
+
+
+def story_score(created_at, engagement_total, velocity):
+    return math.log1p(engagement_total + VELOCITY_WEIGHT * velocity) + created_at.timestamp() * _decay_rate()
+
+
+def affinity_boost(affinity):
+    return math.log1p(AFFINITY_WEIGHT * affinity)
+
+
+def text_words(text):
+    # "Street Food in São Paulo" -> ('street', 'food', 'in', 'sao', 'paulo')
+    return tuple(_WORD_RE.findall(normalize_search_text(text)))
+
+
+# --- Davriy hisoblash ---
+
+def update_story_scores(batch_size=1000, now=None):
+    """Bahosi yo'q, hisoblagichlari o'zgargan yoki tezligi so'nmagan story'lar uchun StoryScore. Yangilanganlar soni."""
+    now = now or timezone.now()
+    queryset = Story.objects.filter(
+        Q(ranking__isnull=True)
+        | Q(ranking__velocity__gt=0)
+        | ~Q(likes_count=F('ranking__likes'))
+        | ~Q(saves_count=F('ranking__saves'))
+        | ~Q(comments_count=F('ranking__comments'))
+        | ~Q(views_count=F('ranking__views'))
+    ).order_by('pk').values_list(
+        'pk', 'created_at', 'likes_count', 'saves_count', 'comments_count', 'views_count',
+        'ranking__updated_at', 'ranking__velocity', 'ranking__likes', 'ranking__saves', 'ranking__comments',
+        'ranking__views',
+    )
+
+    updated = 0
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        scores = []
+        for story_id, created_at, likes, saves, comments, views, updated_at, velocity, *previous in rows:
+            total = engagement(likes, saves, comments, views)
+            if updated_at is None:
+                # Birinchi marta: o'rtacha tezlik, yoshi bo'yicha so'ndirilgan (eski story'lar darhol 0 — qayta hisoblanmaydi)
+                age = max((now - created_at).total_seconds() / 3600, 1)
+                velocity = total / age * math.exp(-age / VELOCITY_WINDOW_HOURS)
+            else:
+                hours = max((now - updated_at).total_seconds() / 3600, 1 / 60)
+                rate = max(total - engagement(*previous), 0) / hours
+                alpha = 1 - math.exp(-hours / VELOCITY_WINDOW_HOURS)
+                velocity += alpha * (rate - velocity)
+            if velocity < VELOCITY_EPSILON:
+                velocity = 0
+
+            scores.append(StoryScore(
+                story_id=story_id,
+                score=story_score(created_at, total, velocity),
+                velocity=velocity,
+                likes=likes,
+                saves=saves,
+                comments=comments,
+                views=views,
+                updated_at=now,
+            ))
+
+        StoryScore.objects.bulk_create(
+            scores,
+            update_conflicts=True,
+            unique_fields=['story'],
+            update_fields=['score', 'velocity', 'likes', 'saves', 'comments', 'views', 'updated_at'],
+        )
+        updated += len(scores)
+
+    return updated
+
+
+def user_affinities(user_ids):
+    """user_id -> {place_id: yaqinlik}: trip joylari va layk/saqlangan story joylari (3 ta so'rov)."""
+    affinities = {user_id: {} for user_id in user_ids}
+    sources = [
+        (Trip.objects.filter(user_id__in=user_ids, place__isnull=False)
+         .values_list('user_id', 'place_id'), TRIP_AFFINITY),
+        (Story.likes.through.objects.filter(user_id__in=user_ids, story__place__isnull=False)
+         .values_list('user_id', 'story__place_id'), ENGAGED_AFFINITY),
+        (Story.saved_by.through.objects.filter(user_id__in=user_ids, story__place__isnull=False)
+         .values_list('user_id', 'story__place_id'), ENGAGED_AFFINITY),
+    ]
+    for rows, weight in sources:
+        for user_id, place_id in rows.distinct():
+            places = affinities[user_id]
+            places[place_id] = places.get(place_id, 0) + weight
+    return affinities
+
+
+def user_interests(user_ids):
+    """user_id -> {qiziqish so'zlari}: trip'lardagi interests, takrorlarsiz (1 ta so'rov)."""
+    interests = {user_id: set() for user_id in user_ids}
+    rows = Trip.objects.filter(user_id__in=user_ids).exclude(interests='').values_list('user_id', 'interests')
+    for user_id, text in rows.distinct():
+        interests[user_id].update(words for words in map(text_words, text.split(',')) if words)
+    return interests
+
+
+class CandidatePool:
+    """Bitta ishga tushirish uchun: umumiy top va joylar bo'yicha top (joy birinchi kerak bo'lganda o'qiladi).
+
+    words — har bir nomzod story'ning sarlavha+matn so'zlari (qiziqishlar shu bilan solishtiriladi).
+    """
+
+    def __init__(self, size):
+        self.words = {}
+        self.top = self._rows(StoryScore.objects.all(), size)
+        self.places = {}
+
+    def _rows(self, queryset, limit):
+        rows = []
+        for story_id, author_id, place_id, score, title, content in queryset.order_by('-score', '-story').values_list(
+            'story_id', 'story__author_id', 'story__place_id', 'score', 'story__title', 'story__content',
+        )[:limit]:
+            if story_id not in self.words:
+                self.words[story_id] = frozenset(text_words(f"{title} {content}"))
+            rows.append((story_id, author_id, place_id, score))
+        return rows
+
+    def for_place(self, place_id):
+        if place_id not in self.places:
+            self.places[place_id] = self._rows(StoryScore.objects.filter(story__place_id=place_id), PLACE_CANDIDATES)
+        return self.places[place_id]
+
+    def interest_affinity(self, story_id, interests):
+        # Ko'p so'zli qiziqish ("street food") — hamma so'zi story'da bo'lsa
+        words = self.words[story_id]
+        return INTEREST_AFFINITY * sum(1 for interest in interests if words.issuperset(interest))
+
+
+def rank_for_user(user_id, places, interests, pool, limit):
+    """[(story_id, ball)] — eng yaxshi limit ta, o'z story'larisiz."""
+    scores = {}
+    # Yaqinligi yo'q story'lar tartibi umumiy bilan bir xil: top'dan limit tasi yetarli, yaqin joylarniki for_place'da
+    plain = 0
+    for story_id, author_id, place_id, score in pool.top:
+        if plain >= limit:
+            break
+        if author_id == user_id:
+            continue
+        affinity = places.get(place_id, 0) + pool.interest_affinity(story_id, interests)
+        if not affinity:
+            plain += 1
+        scores[story_id] = score + affinity_boost(affinity)
+
+    for place_id, affinity in places.items():
+        for story_id, author_id, _, score in pool.for_place(place_id):
+            if author_id != user_id:
+                scores[story_id] = score + affinity_boost(affinity + pool.interest_affinity(story_id, interests))
+
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+def build_feed_candidates(batch_size=200, now=None):
+    """Faol (STORY_RANK_ACTIVE_DAYS ichida kirgan) userlar uchun FeedCandidate ro'yxatlari. Ko'rilgan userlar soni."""
+    now = now or timezone.now()
+    limit = settings.STORY_RANK_CANDIDATES
+    active = Q(is_active=True, last_login__gte=now - timedelta(days=settings.STORY_RANK_ACTIVE_DAYS))
+
+    # Faol bo'lmay qolganlarning ro'yxati endi yangilanmaydi — o'chiramiz (feed umumiy reytingga o'tadi)
+    FeedCandidate.objects.exclude(user__in=User.objects.filter(active)).delete()
+
+    pool = CandidatePool(settings.STORY_RANK_POOL)
+    users = User.objects.filter(active).order_by('pk').values_list('pk', flat=True)
+
+    built = 0
+    last_pk = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not user_ids:
+            break
+        last_pk = user_ids[-1]
+
+        # Yaqin joylari ham, qiziqishlari ham yo'q user'ning ro'yxati umumiy reyting bilan bir xil — saqlanmaydi,
+        # feed StoryScore'dan o'qiydi
+        affinities = user_affinities(user_ids)
+        interests = user_interests(user_ids)
+        rows = [
+            (user_id, story_id, score)
+            for user_id, places in affinities.items() if places or interests[user_id]
+            for story_id, score in rank_for_user(user_id, places, interests[user_id], pool, limit)
+        ]
+        with transaction.atomic():
+            FeedCandidate.objects.filter(user_id__in=user_ids).delete()
+            # Yuz minglab qator: model obyektlarisiz, to'g'ridan-to'g'ri executemany
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {FeedCandidate._meta.db_table} (user_id, story_id, score) VALUES (%s, %s, %s)", rows,
+                )
+        built += len(user_ids)
+
+    return built
+
+
+# --- Feed sahifasi ---
+
+# Cursor = "manba|ball|id" (base64); xronologik fallback'da "c|<feed cursor>"
+def encode_rank_cursor(source, position):
+    return base64.urlsafe_b64encode(f"{source}|{position}".encode()).decode()
+
+
+def decode_rank_cursor(cursor):
+    try:
+        source, position = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        if source == SOURCE_RECENT:
+            return source, position
+        if source not in (SOURCE_USER, SOURCE_GLOBAL):
+            raise ValueError(f"unknown source {source!r}")
+        score, story_id = position.split('|')
+        return source, (float(score), int(story_id))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def ranked_queryset(user, source):
+    # Tartib va keyset reyting jadvali ustunlarida — (score, story) indeksi bo'yicha o'qiladi
+    relation = 'feed_candidates' if source == SOURCE_USER else 'ranking'
+    queryset = feed_queryset(user)
+    if source == SOURCE_USER:
+        # filter() dan keyin annotate() — o'sha JOIN (faqat shu user'ning qatori)
+        queryset = queryset.filter(feed_candidates__user=user)
+    else:
+        queryset = queryset.filter(ranking__isnull=False)
+    return queryset.annotate(
+        rank_score=F(f'{relation}__score'), rank_story=F(f'{relation}__story'),
+    ).order_by('-rank_score', '-rank_story')
+
+
+def get_ranked_page(user, cursor=None, limit=FEED_PAGE_SIZE):
+    """'For you' sahifasi. Manba birinchi sahifada tanlanadi va cursor bilan keyingi sahifalarga o'tadi."""
+    if cursor:
+        source, position = decode_rank_cursor(cursor)
+        sources = [source]
+    else:
+        position = None
+        sources = [SOURCE_USER, SOURCE_GLOBAL, SOURCE_RECENT]
+
+    for source in sources:
+        if source == SOURCE_RECENT:
+            stories, next_cursor = get_feed_page(user, cursor=position, limit=limit)
+            return stories, encode_rank_cursor(SOURCE_RECENT, next_cursor) if next_cursor else None
+
+        queryset = ranked_queryset(user, source)
+        if position:
+            score, story_id = position
+            # (score, story) < (ball, id); score <= ball — indeks diapazoni uchun
+            queryset = queryset.filter(Q(rank_score__lte=score), Q(rank_score__lt=score) | Q(rank_story__lt=story_id))
+        # Bitta ortiqcha yozuv — keyingi sahifa bormi
+        stories = list(queryset[:limit + 1])
+        if stories or cursor:
+            break
+
+    if len(stories) > limit:
+        last = stories[limit - 1]
+        return stories[:limit], encode_rank_cursor(source, f"{last.rank_score!r}|{last.id}")
+    return stories, None
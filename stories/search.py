@@ -0,0 +1,279 @@
+# stories/search.py
+#
+# Story qidiruvi: title, location (+ Place nomi), content va komment matnlari bo'yicha full-text indeks.
+#   Postgres — stories_story_search jadvali (tsvector, GIN indeks), ts_rank bilan (title > location > content > komment)
+#   SQLite   — stories_story_fts (FTS5 virtual jadval), bm25 bilan
+#   boshqa   — indekssiz icontains (faqat lokal ishlab chiqish uchun)
+# Indeks signals.py orqali (on_commit) yangilanadi — story tahriri darhol, kommentlar esa fon thread'ida
+# guruhlab (queue_reindex: ko'p kommentli story interval ichida bir marta qayta indekslanadi); matn normalize_search_text bilan indekslanadi, shuning uchun
+# "sao" -> "São Paulo". So'rovning har bir so'zi prefiks sifatida, hammasi AND.
+# Latency jadval hajmiga bog'liq bo'lmasligi uchun faqat eng yangi STORY_SEARCH_CANDIDATES ta moslik reytinglanadi.
+
+import atexit
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+
+from trips.models import normalize_search_text
+
+from .feed import feed_queryset
+from .models import Comment, Story
+
+SEARCH_PAGE_SIZE = 10
+MAX_TERMS = 8
+SNIPPET_WORDS = 30
+
+_TERM_RE = re.compile(r'\w+')
+
+# Migratsiya (0007_story_search) bilan bir xil nomlar
+PG_TABLE = 'stories_story_search'
+FTS_TABLE = 'stories_story_fts'
+
+logger = logging.getLogger(__name__)
+
+# Kommentlari o'zgargan, hali qayta indekslanmagan story id'lari
+_pending = set()
+_pending_lock = threading.Lock()
+_flush_requested = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def parse_query(query):
+    """'Samarqand  bozori!' -> ['samarqand', 'bozori'] (normalizatsiya qilingan, faqat so'z belgilari)"""
+    return _TERM_RE.findall(normalize_search_text(query))[:MAX_TERMS]
+
+
+# --- Indekslash ---
+
+def story_documents(story_ids):
+    """Indeksga tushadigan matnlar (normalizatsiya qilingan), story_id -> dict. O'chirilgan story'lar tushmaydi."""
+    stories = Story.objects.select_related('place').filter(pk__in=story_ids) \
+        .only('pk', 'title', 'location', 'content', 'place__name')
+    comments = {}
+    for story_id, text in Comment.objects.filter(story_id__in=story_ids).order_by('pk').values_list('story_id', 'text'):
+        comments.setdefault(story_id, []).append(text)
+
+    documents = {}
+    for story in stories:
+        location = f"{story.location} {story.place.name}" if story.place_id else story.location
+        documents[story.pk] = {
+            'title': normalize_search_text(story.title),
+            'location': normalize_search_text(location),
+            'content': normalize_search_text(story.content),
+            'comments': normalize_search_text(' '.join(comments.get(story.pk, []))),
+        }
+    return documents
+
+
+def index_stories(story_ids):
+    """Story'larni indeksga yozadi (bor bo'lsa almashtiradi): 2 ta SELECT va partiya uchun executemany."""
+    story_ids = list(story_ids)
+    documents = story_documents(story_ids)
+    rows = [
+        [story_id, document['title'], document['location'], document['content'], document['comments']]
+        for story_id, document in documents.items()
+    ]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {PG_TABLE} (story_id, document) VALUES (%s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'D')) "
+                    "ON CONFLICT (story_id) DO UPDATE SET document = EXCLUDED.document",
+                    rows,
+                )
+            removed = [story_id for story_id in story_ids if story_id not in documents]
+            if removed:
+                cursor.execute(f"DELETE FROM {PG_TABLE} WHERE story_id = ANY(%s)", [removed])
+        elif connection.vendor == 'sqlite':
+            # FTS5 jadvalida UPSERT yo'q: avval o'chiramiz (o'chirilgan story'lar ham shu bilan ketadi)
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[story_id] for story_id in story_ids])
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, location, content, comments) VALUES (%s, %s, %s, %s, %s)",
+                    rows,
+                )
+
+
+def index_story(story_id):
+    index_stories([story_id])
+
+
+def remove_story(story_id):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE story_id = %s", [story_id])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [story_id])
+
+
+def queue_reindex(story_id):
+    """Story'ni fon thread'ida qayta indekslash uchun navbatga qo'yadi (komment qo'shilganda/o'chirilganda)."""
+    with _pending_lock:
+        _pending.add(story_id)
+        pending_total = len(_pending)
+
+    _ensure_flusher()
+    if pending_total >= settings.STORY_SEARCH_REINDEX_BATCH:
+        _flush_requested.set()
+
+
+def flush_reindex():
+    """Navbatdagi story'larni bitta partiyada indekslaydi. Qaytaradi: nechta story."""
+    global _pending
+    with _pending_lock:
+        batch, _pending = _pending, set()
+    if not batch:
+        return 0
+
+    try:
+        with transaction.atomic():
+            index_stories(sorted(batch))
+    except Exception:
+        # Yozilmadi — keyingi flush'da qayta urinamiz
+        with _pending_lock:
+            _pending.update(batch)
+        raise
+    return len(batch)
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(settings.STORY_SEARCH_REINDEX_INTERVAL)
+        _flush_requested.clear()
+        try:
+            flush_reindex()
+        except Exception:
+            logger.exception("Story search reindex error")
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='story-search-reindex', daemon=True)
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Jarayon to'xtayotganda navbatdagilar yo'qolmasin (yo'qolsa ham `rebuild_story_search` tiklaydi)
+    if _pending:
+        try:
+            flush_reindex()
+        except Exception:
+            logger.exception("Story search reindex error")
+
+
+# --- Qidiruv ---
+
+def ranked_ids(terms, offset, limit):
+    """Moslik bo'yicha tartiblangan story id'lari: eng yangi STORY_SEARCH_CANDIDATES tadan [offset:offset+limit]."""
+    candidates = settings.STORY_SEARCH_CANDIDATES
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        sql = (
+            "SELECT story_id FROM ("
+            f"  SELECT story_id, document FROM {PG_TABLE}"
+            "   WHERE document @@ to_tsquery('simple', %s) ORDER BY story_id DESC LIMIT %s"
+            ") AS matches "
+            "ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, story_id DESC LIMIT %s OFFSET %s"
+        )
+        params = [tsquery, candidates, tsquery, limit, offset]
+    elif connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # bm25: kichikroq — yaxshiroq. Og'irliklar ustunlar tartibida: title, location, content, comments
+        sql = (
+            "SELECT rowid FROM ("
+            f"  SELECT rowid, bm25({FTS_TABLE}, 10.0, 5.0, 1.0, 0.5) AS score FROM {FTS_TABLE}"
+            f"   WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s"
+            ") ORDER BY score, rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [match, candidates, limit, offset]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(content__icontains=term) | Q(location__icontains=term)
+        return list(
+            Story.objects.filter(condition).order_by('-created_at', '-id')
+            .values_list('pk', flat=True)[offset:offset + limit]
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_stories(user, query, page=1, limit=SEARCH_PAGE_SIZE):
+    """Bitta sahifa natija (feed bilan bir xil so'rovlar) va keyingi sahifa raqami (yoki None)."""
+    terms = parse_query(query)
+    if not terms:
+        return [], None
+
+    offset = (page - 1) * limit
+    ids = ranked_ids(terms, offset, limit + 1)
+    has_next = len(ids) > limit and offset + limit < settings.STORY_SEARCH_CANDIDATES
+    ids = ids[:limit]
+
+    stories = {story.pk: story for story in feed_queryset(user).filter(pk__in=ids)}
+    return [stories[pk] for pk in ids if pk in stories], page + 1 if has_next else None
+
+
+# --- Snippet ---
+
+def _matches(word, terms):
+    folded = normalize_search_text(word)
+    return any(folded.startswith(term) for term in terms)
+
+
+def highlight(text, terms, words=SNIPPET_WORDS):
+    """
+    Birinchi moslik atrofidagi parcha (words=None — butun matn), mos so'zlar <mark> ichida.
+    Matn escape qilinadi — natijani HTML sifatida ko'rsatish xavfsiz. Moslik bo'lmasa None.
+    """
+    spans = list(_TERM_RE.finditer(text or ''))
+    hits = {i for i, span in enumerate(spans) if _matches(span.group(), terms)}
+    if not hits:
+        return None
+
+    if words is None:
+        start, end = 0, len(spans)
+    else:
+        start = max(0, min(hits) - words // 4)
+        end = min(len(spans), start + words)
+
+    parts = ['…'] if start > 0 else []
+    # Parcha boshdan bo'lsa birinchi so'zdan oldingi matn (tinish belgilari, teglar) ham qoladi
+    position = spans[start].start() if start > 0 else 0
+    for i in range(start, end):
+        span = spans[i]
+        parts.append(escape(text[position:span.start()]))
+        parts.append(f"<mark>{escape(span.group())}</mark>" if i in hits else escape(span.group()))
+        position = span.end()
+    if end < len(spans):
+        parts.append('…')
+    elif words is None:
+        parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def snippet(story, terms):
+    # Content'da bo'lmasa — feed bilan kelgan oxirgi kommentlardan (qo'shimcha so'rovsiz)
+    for text in (story.content, *(comment.text for comment in story.latest_comments)):
+        fragment = highlight(text, terms)
+        if fragment:
+            return fragment
+    return escape(story.content[:250])
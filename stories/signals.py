@@ -0,0 +1,135 @@
+# stories/signals.py
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Story, StoryImage, Comment
+from . import search
+from config import share_cache
+
+# Qidiruv indeksiga tushadigan maydonlar (Story.TRACKED_FIELDS): faqat shular saqlansa indeks yangilanadi
+SEARCH_FIELDS = {'title', 'content', 'location', 'place'}
+
+
+def bump_counter(story_id, field, delta):
+    # Read-modify-write emas: bazaning o'zida atomik qo'shamiz/ayiramiz
+    queryset = Story.objects.filter(pk=story_id)
+    if delta < 0:
+        # Drift bo'lsa ham manfiyga tushmasin
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def invalidate_story_page(story_id):
+    # Story o'zi o'chirilayotgan bo'lsa (cascade) uuid topilmaydi — uning signali o'zi tozalaydi
+    share_uuid = Story.objects.filter(pk=story_id).values_list('share_uuid', flat=True).first()
+    if share_uuid:
+        share_cache.invalidate('story', share_uuid)
+
+
+def count_subquery(through, fk_name='story_id'):
+    counts = through.objects.filter(**{fk_name: OuterRef('pk')}) \
+        .order_by() \
+        .values(fk_name) \
+        .annotate(total=Count('*')) \
+        .values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount_stories(queryset):
+    """Hisoblagichlarni M2M/Comment jadvallaridan qayta hisoblaydi (bitta UPDATE)."""
+    return queryset.update(
+        likes_count=count_subquery(Story.likes.through),
+        saves_count=count_subquery(Story.saved_by.through),
+        comments_count=count_subquery(Comment, fk_name='story'),
+    )
+
+
+def _sync_m2m_counter(field, through, instance, action, reverse, pk_set):
+    # toggle_like/toggle_save through jadvaliga to'g'ridan-to'g'ri yozadi (signal chiqmaydi).
+    # Bu yerga admin, shell va boshqa .add()/.remove()/.clear() yo'llari keladi.
+    cleared_attr = f'_{field}_cleared_ids'
+
+    if reverse and action == 'pre_clear':
+        # user.liked_stories.clear() -> post_clear da pk_set bo'lmaydi, shuning uchun oldindan eslab qolamiz
+        story_ids = through.objects.filter(user_id=instance.pk).values_list('story_id', flat=True)
+        setattr(instance, cleared_attr, set(story_ids))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        story_ids = {instance.pk}
+    elif action == 'post_clear':
+        story_ids = getattr(instance, cleared_attr, set())
+    else:
+        story_ids = pk_set
+
+    if story_ids:
+        Story.objects.filter(pk__in=story_ids).update(**{field: count_subquery(through)})
+
+
+@receiver(m2m_changed, sender=Story.likes.through)
+def sync_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _sync_m2m_counter('likes_count', sender, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Story.saved_by.through)
+def sync_saves_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _sync_m2m_counter('saves_count', sender, instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        bump_counter(instance.story_id, 'comments_count', 1)
+        invalidate_story_page(instance.story_id)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    bump_counter(instance.story_id, 'comments_count', -1)
+    invalidate_story_page(instance.story_id)
+
+
+# Public story sahifasi (/stories/<uuid>/) keshi: tahrir/o'chirish/rasmlar o'zgarganda yangi versiya.
+# Like/save hisoblagichlari (bump_counter) versiyani o'zgartirmaydi — SHARE_PAGE_CACHE_TTL gacha eskirishi mumkin.
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def reset_story_share_page(sender, instance, **kwargs):
+    share_cache.invalidate('story', instance.share_uuid)
+
+
+@receiver(post_save, sender=StoryImage)
+@receiver(post_delete, sender=StoryImage)
+def reset_story_share_page_images(sender, instance, **kwargs):
+    invalidate_story_page(instance.story_id)
+
+
+# Qidiruv indeksi (search.py): tranzaksiya commit bo'lgandan keyin, story yoki kommentlari o'zgarganda
+@receiver(post_save, sender=Story)
+def reindex_story(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    # To'liq save() (masalan shares_count += 1): indekslangan maydonlar o'zgarmagan bo'lsa — tegmaymiz
+    if not instance.changed_fields():
+        return
+    transaction.on_commit(lambda: search.index_story(instance.pk))
+
+
+@receiver(post_delete, sender=Story)
+def unindex_story(sender, instance, **kwargs):
+    story_id = instance.pk
+    transaction.on_commit(lambda: search.remove_story(story_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def reindex_story_comments(sender, instance, **kwargs):
+    # Har komment uchun emas: fon thread'ida partiya bilan (STORY_SEARCH_REINDEX_INTERVAL)
+    story_id = instance.story_id
+    transaction.on_commit(lambda: search.queue_reindex(story_id))
@@ -1,3 +1,325 @@
-from django.test import TestCase
+import json
+import uuid
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from trips.models import Trip
+
+from config.benchmarks import BenchmarkTestCase
+
+from .feed import FEED_INLINE_COMMENTS
+from .images import RENDITIONS, claim_image, process_story_image
+from .models import Comment, FeedCandidate, Story, StoryImage
+from .ranking import build_feed_candidates, update_story_scores
+from .search import flush_reindex
+from .view_counter import client_ip, flush_views, pending_views
+
+
+class StoryViewBenchmarks(BenchmarkTestCase):
+    """Feed, detail (minglab kommentli story), komment sahifalari va like/save: query soni va vaqt chegaralari."""
+
+    def setUp(self):
+        super().setUp()
+        self.story = self.data.hot_story
+        self.client.force_login(self.data.owner)
+
+    def tearDown(self):
+        # record_view buferi shu test bazasiga yozilib bo'shatiladi
+        flush_views()
+        super().tearDown()
+
+    def test_feed_page(self):
+        self.assertBenchmark(
+            'stories.feed_page', lambda: self.client.get(reverse('stories_feed')), max_queries=3, max_ms=150,
+        )
+
+    def test_feed_api(self):
+        response = self.assertBenchmark(
+            'stories.feed_api', lambda: self.client.get(reverse('stories_feed_api')), max_queries=5, max_ms=400,
+        )
+        stories = response.json()['results']
+        hot = next(story for story in stories if story['id'] == self.story.pk)
+        # Minglab komment feed payload'iga tushmaydi
+        self.assertEqual(len(hot['comments']), FEED_INLINE_COMMENTS)
+        self.assertIsNotNone(hot['commentsCursor'])
+
+    def test_feed_api_next_page(self):
+        cursor = self.client.get(reverse('stories_feed_api'), {'limit': 50}).json()['next_cursor']
+        self.assertBenchmark(
+            'stories.feed_api_page_2',
+            lambda: self.client.get(reverse('stories_feed_api'), {'cursor': cursor, 'limit': 50}),
+            max_queries=5, max_ms=600,
+        )
+
+    def test_feed_api_for_you(self):
+        # Davriy ishchi o'rniga: reyting va owner'ning (trip joylari bor) shaxsiy ro'yxati
+        update_story_scores()
+        build_feed_candidates()
+        url = reverse('stories_feed_api')
+        response = self.assertBenchmark(
+            'stories.feed_api_for_you', lambda: self.client.get(url, {'filter': 'foryou'}), max_queries=5, max_ms=400,
+        )
+        cursor = response.json()['next_cursor']
+        self.assertBenchmark(
+            'stories.feed_api_for_you_page_2',
+            lambda: self.client.get(url, {'filter': 'foryou', 'cursor': cursor}),
+            max_queries=5, max_ms=400,
+        )
+
+    def test_story_detail(self):
+        url = reverse('story_detail', args=[self.story.share_uuid])
+        self.assertBenchmark('stories.detail', lambda: self.client.get(url), max_queries=10, max_ms=300)
+
+    def test_story_detail_anonymous(self):
+        self.client.logout()
+        url = reverse('story_detail', args=[self.story.share_uuid])
+        response = self.assertBenchmark(
+            'stories.detail_anonymous_cold', lambda: self.client.get(url),
+            max_queries=5, max_ms=300, before=self.reset_caches,
+        )
+        # Keshlanadigan sahifada tashrifchining CSRF token'i bo'lmasligi kerak
+        self.assertContains(response, "csrfToken: '',")
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        # Ko'rish hisobi (cache) + share sahifa keshi: bazaga tegmaydi
+        self.assertBenchmark(
+            'stories.detail_anonymous_cached', lambda: self.client.get(url), max_queries=0, max_ms=50,
+        )
+
+    def test_comments_api(self):
+        url = reverse('story_comments_api', args=[self.story.pk])
+        cursor = self.client.get(url).json()['next_cursor']
+        self.assertBenchmark(
+            'stories.comments_api', lambda: self.client.get(url, {'cursor': cursor}), max_queries=2, max_ms=150,
+        )
+
+    def test_toggle_like(self):
+        url = reverse('toggle_like', args=[self.story.pk])
+        self.assertBenchmark('stories.toggle_like', lambda: self.client.post(url), max_queries=11, max_ms=100)
+
+    def test_toggle_save(self):
+        url = reverse('toggle_save', args=[self.story.pk])
+        self.assertBenchmark('stories.toggle_save', lambda: self.client.post(url), max_queries=11, max_ms=100)
+
+    def test_add_comment(self):
+        url = reverse('add_comment', args=[self.story.pk])
+        self.assertBenchmark(
+            'stories.add_comment',
+            lambda: self.client.post(url, json.dumps({'text': 'Great trip!'}), content_type='application/json'),
+            max_queries=9, max_ms=100,
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', "FTS5 indeksi (SQLite)")
+@override_settings(STORY_SEARCH_REINDEX_INTERVAL=3600)
+class StorySearchTests(TestCase):
+    """Qidiruv API FTS5 yo'li: indekslash signallari, bm25 reytingi va escape qilingan parchalar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_story(self, **fields):
+        # Indeks on_commit'da yoziladi — test tranzaksiyasida qo'lda ishga tushiramiz
+        with self.captureOnCommitCallbacks(execute=True):
+            return Story.objects.create(author=self.user, **fields)
+
+    def search(self, query):
+        return self.client.get(reverse('stories_search_api'), {'q': query}).json()['results']
+
+    def test_title_match_ranks_above_content_match(self):
+        in_content = self.create_story(title='Weekend', location='Tashkent', content='We walked to the Registan at night.')
+        in_title = self.create_story(title='Registan at sunrise', location='Samarkand', content='Early start.')
+        self.create_story(title='Lake day', location='Charvak', content='Cold water.')
+
+        results = self.search('registan')
+        self.assertEqual([story['id'] for story in results], [in_title.pk, in_content.pk])
+        self.assertEqual(results[0]['titleHtml'], '<mark>Registan</mark> at sunrise')
+
+    def test_prefix_and_accent_folding(self):
+        story = self.create_story(title='Coffee stop', location='São Paulo', content='Strong espresso.')
+        self.assertEqual([result['id'] for result in self.search('sao espr')], [story.pk])
+        self.assertEqual(self.search('sao tea'), [])
+
+    def test_snippet_escapes_html(self):
+        self.create_story(
+            title='<b>Khiva</b>', location='Khiva', content='<script>alert(1)</script> Ichan Kala & walls',
+        )
+        result = self.search('ichan')[0]
+        self.assertEqual(result['snippet'], '&lt;script&gt;alert(1)&lt;/script&gt; <mark>Ichan</mark> Kala &amp; walls')
+        self.assertEqual(self.search('khiva')[0]['titleHtml'], '&lt;b&gt;<mark>Khiva</mark>&lt;/b&gt;')
+
+    def test_counter_save_skips_reindex(self):
+        story = Story.objects.get(pk=self.create_story(title='Bazaar', location='Bukhara', content='Spices.').pk)
+        story.views_count += 1
+        # Faqat UPDATE — indeks (SELECT + DELETE + INSERT) qayta yozilmaydi
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            story.save()
+
+        story.title = 'Old bazaar'
+        with self.captureOnCommitCallbacks(execute=True):
+            story.save()
+        self.assertEqual([result['id'] for result in self.search('old')], [story.pk])
+
+    def test_comment_reindex_is_batched(self):
+        story = self.create_story(title='Market day', location='Bukhara', content='Spices.')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(story=story, author=self.user, text='Try the plov!')
+            Comment.objects.create(story=story, author=self.user, text='Plov is best at noon.')
+        # Navbatda — fon thread'i (yoki flush) indekslamaguncha topilmaydi
+        self.assertEqual(self.search('plov'), [])
+
+        self.assertEqual(flush_reindex(), 1)
+        self.assertEqual([result['id'] for result in self.search('plov')], [story.pk])
+
+
+class StoryRankingTests(TestCase):
+    """Shaxsiy ro'yxat: trip qiziqishlari story sarlavhasi/matni bilan solishtiriladi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader', last_login=timezone.now())
+
+    def create_story(self, title, content):
+        return Story.objects.create(author=self.author, title=title, location='Atlantis', content=content)
+
+    def ranked_ids(self):
+        update_story_scores()
+        build_feed_candidates()
+        return list(
+            FeedCandidate.objects.filter(user=self.reader).order_by('-score').values_list('story_id', flat=True)
+        )
+
+    def test_interests_boost_matching_stories(self):
+        # Eskiroq story'lar umumiy reytingda pastroq — faqat qiziqish ularni ko'taradi
+        match = self.create_story('Night market', 'The best STREET food in town.')
+        partial = self.create_story('Lunch', 'Food was fine.')
+        history = self.create_story('Old walls', 'A walk through local history.')
+        plain = self.create_story('Lake day', 'Cold water.')
+        # Joyi noma'lum trip: faqat qiziqishlar
+        Trip.objects.create(user=self.reader, destination='Nowhere', interests='Street food, History')
+
+        # "street food" — ikkala so'z ham kerak (katta-kichik harf farqi yo'q); qolganlari umumiy tartibda
+        self.assertEqual(self.ranked_ids(), [history.pk, match.pk, plain.pk, partial.pk])
+
+
+@override_settings(STORAGES={**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}})
+class StoryImageProcessingTests(TestCase):
+    """Fon ishchisi: claim, renditionlar, buzuq fayl va yarim yozilgan fayllarni tozalash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('photographer')
+        cls.story = Story.objects.create(author=cls.user, title='Sunset', location='Khiva', content='Walls at dusk.')
+
+    def upload(self, content=None, name='photo.png'):
+        if content is None:
+            buffer = BytesIO()
+            Image.new('RGB', (1600, 1200), (200, 120, 40)).save(buffer, format='PNG')
+            content = buffer.getvalue()
+        return StoryImage.objects.create(story=self.story, image=ContentFile(content, name=name))
+
+    def test_valid_upload_is_processed(self):
+        row = self.upload()
+        original = row.image.name
+
+        process_story_image(row.pk)
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, StoryImage.STATUS_READY)
+        self.assertEqual((row.width, row.height), (1600, 1200))
+        self.assertTrue(row.blurhash)
+        for field in (row.image, row.thumbnail, row.feed_image):
+            self.assertTrue(default_storage.exists(field.name), field.name)
+        self.assertTrue(row.thumbnail.name.endswith('.webp'))
+        self.assertTrue(row.image.name.endswith('.jpg'))
+        self.assertFalse(default_storage.exists(original))
+
+    def test_undecodable_file_fails(self):
+        row = self.upload(b'definitely not a png')
+        with self.assertLogs('stories.images', 'WARNING'):
+            process_story_image(row.pk)
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, StoryImage.STATUS_FAILED)
+        self.assertFalse(row.thumbnail)
+
+    def test_second_claim_is_noop(self):
+        row = self.upload()
+        self.assertIsNotNone(claim_image(row.pk))
+        self.assertIsNone(claim_image(row.pk))
+
+        # Boshqa ishchi olib bo'lgan qator — tegilmaydi
+        process_story_image(row.pk)
+        row.refresh_from_db()
+        self.assertEqual(row.status, StoryImage.STATUS_PROCESSING)
+        self.assertFalse(row.thumbnail)
+        self.assertTrue(default_storage.exists(row.image.name))
+
+    def test_failure_removes_partial_renditions(self):
+        row = self.upload()
+        original = row.image.name
+
+        with mock.patch('stories.images.blurhash', side_effect=OSError('storage down')), \
+                mock.patch.object(default_storage, 'delete', wraps=default_storage.delete) as delete:
+            with self.assertRaises(OSError):
+                process_story_image(row.pk)
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, StoryImage.STATUS_PENDING)
+        self.assertEqual(row.image.name, original)
+        self.assertTrue(default_storage.exists(original))
+        self.assertEqual(len(delete.call_args_list), len(RENDITIONS))
+        for call in delete.call_args_list:
+            self.assertFalse(default_storage.exists(call.args[0]))
+
+
+@override_settings(STORY_VIEW_FLUSH_INTERVAL=3600)
+class StoryViewCountTests(TestCase):
+    """Ko'rishlar faqat mavjud story uchun va soxtalashtirib bo'lmaydigan IP bo'yicha sanaladi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer')
+
+    def tearDown(self):
+        flush_views()
+
+    def test_unknown_story_is_not_counted(self):
+        share_uuid = uuid.uuid4()
+        response = self.client.get(reverse('story_detail', args=[share_uuid]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(pending_views(share_uuid), 0)
+
+    def test_forwarded_for_rotation_does_not_inflate_views(self):
+        story = Story.objects.create(author=self.user, title='Minaret', location='Khiva', content='Blue tiles.')
+        url = reverse('story_detail', args=[story.share_uuid])
+        for forwarded in ('1.1.1.1', '2.2.2.2', '3.3.3.3, 10.0.0.1'):
+            self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR=forwarded).status_code, 200)
+        self.assertEqual(pending_views(story.share_uuid), 1)
+
+        flush_views()
+        story.refresh_from_db()
+        self.assertEqual(story.views_count, 1)
+
+    def test_client_ip_trusts_only_proxy_hops(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '10.0.0.1')
+        with override_settings(STORY_VIEW_TRUSTED_PROXIES=1):
+            self.assertEqual(client_ip(request), '203.0.113.7')
+        with override_settings(STORY_VIEW_TRUSTED_PROXIES=3):
+            # Kutilgandan kam hop — sarlavha ishonchsiz
+            self.assertEqual(client_ip(request), '10.0.0.1')
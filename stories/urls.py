@@ -8,10 +8,13 @@ urlpatterns = [
     path('<uuid:uuid>/', views.story_detail, name='story_detail'),
 
     # API endpoints (Ichki ishlatish uchun ID qulay)
+    path('api/feed/', views.stories_feed_api, name='stories_feed_api'),
+    path('api/search/', views.stories_search_api, name='stories_search_api'),
     path('api/create/', views.create_story, name='create_story'),
     path('api/like/<int:story_id>/', views.toggle_like, name='toggle_like'),
     path('api/save/<int:story_id>/', views.toggle_save, name='toggle_save'),
     path('api/comment/<int:story_id>/', views.add_comment, name='add_comment'),
+    path('api/comments/<int:story_id>/', views.story_comments_api, name='story_comments_api'),
     path('api/delete/<int:story_id>/', views.delete_story, name='delete_story'),
     path('api/share/<int:story_id>/', views.increment_share_count, name='increment_share'),
     path('api/edit/<int:story_id>/', views.edit_story, name='edit_story'),
@@ -0,0 +1,131 @@
+# stories/view_counter.py
+#
+# story_detail ko'rishlarini hisoblash: request ichida bazaga ham, sessiyaga ham yozilmaydi.
+# 1. Dedupe: har bir (story, tashrifchi) uchun cache'da qisqa hashlangan kalit (TTL bilan, cache.add atomik).
+# 2. Yangi ko'rishlar xotiradagi buferga qo'shiladi.
+# 3. Fon thread'i buferni har STORY_VIEW_FLUSH_INTERVAL soniyada (yoki bufer to'lsa darhol)
+#    `views_count = F('views_count') + n` bilan guruhlab yozadi.
+
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.crypto import salted_hmac
+
+from .models import Story
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flush_requested = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def client_ip(request):
+    # X-Forwarded-For'ning chap tomonini client o'zi yozadi — faqat ishonchli proxy'lar qo'shgan o'ng tomon
+    hops = settings.STORY_VIEW_TRUSTED_PROXIES
+    if hops:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def visitor_id(request):
+    """Login bo'lsa user id, aks holda IP + User-Agent ning qisqa HMAC'i (sessiyasiz)."""
+    if request.user.is_authenticated:
+        return f"u{request.user.pk}"
+    ip = client_ip(request)
+    agent = request.META.get('HTTP_USER_AGENT', '')
+    return salted_hmac('stories.views', f"{ip}|{agent}").hexdigest()[:16]
+
+
+def seen_cache_key(share_uuid, visitor):
+    return f"stories:viewed:{share_uuid}:{visitor}"
+
+
+def record_view(request, share_uuid):
+    """
+    Birinchi ko'rish bo'lsa buferga qo'shadi. True = hisoblandi.
+    share_uuid bo'yicha: keshlangan sahifa (config/share_cache.py) bazaga tegmasa ham ko'rish sanaladi.
+    Faqat mavjud story uchun chaqiriladi (story_detail — 200 javobdan keyin).
+    """
+    # cache.add faqat kalit yo'q bo'lsa yozadi — bir vaqtdagi so'rovlar ikki marta sanalmaydi
+    if not cache.add(seen_cache_key(share_uuid, visitor_id(request)), 1, timeout=settings.STORY_VIEW_DEDUPE_TTL):
+        return False
+
+    with _pending_lock:
+        _pending[str(share_uuid)] += 1
+        pending_total = sum(_pending.values())
+
+    _ensure_flusher()
+    if pending_total >= settings.STORY_VIEW_FLUSH_THRESHOLD:
+        _flush_requested.set()
+    return True
+
+
+def pending_views(share_uuid):
+    with _pending_lock:
+        return _pending.get(str(share_uuid), 0)
+
+
+def flush_views():
+    """Buferdagi ko'rishlarni bazaga yozadi. Bir xil n li storylar bitta UPDATE da."""
+    global _pending
+    with _pending_lock:
+        batch, _pending = _pending, Counter()
+
+    by_increment = defaultdict(list)
+    for share_uuid, views in batch.items():
+        by_increment[views].append(share_uuid)
+
+    updated = 0
+    try:
+        with transaction.atomic():
+            for views, share_uuids in by_increment.items():
+                updated += Story.objects.filter(share_uuid__in=share_uuids).update(views_count=F('views_count') + views)
+    except Exception:
+        # Yozilmadi — keyingi flush'da qayta urinamiz
+        with _pending_lock:
+            _pending.update(batch)
+        raise
+    return updated
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(settings.STORY_VIEW_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Story views flush error")
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='story-views-flush', daemon=True)
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Jarayon to'xtayotganda buferdagilar yo'qolmasin
+    if _pending:
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Story views flush error")
@@ -1,85 +1,113 @@
 import json
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
+from django.utils.html import escape
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
+from django.db import IntegrityError, transaction
 from .models import Story, StoryImage, Comment
 
 from .forms import StoryForm
-@login_required
-def stories_feed(request):
-    stories = Story.objects.all()
-    stories_data = []
+from .signals import bump_counter
+from .feed import (
+    COMMENTS_MAX_PAGE_SIZE, COMMENTS_PAGE_SIZE, FEED_MAX_PAGE_SIZE, FEED_PAGE_SIZE, InvalidCursor,
+    get_comments_page, get_feed_page, serialize_comment, serialize_story,
+)
+from .ranking import get_ranked_page
+from .search import highlight, parse_query, search_stories, snippet
+from .view_counter import record_view
+from .images import create_story_images
+from config.share_cache import cache_share_page
+from config.media import media_url
 
-    for story in stories:
-        images = [img.image.url for img in story.images.all()]
-
-        comments = []
-        for c in story.comments.all():
-            comments.append({
-                'id': c.id,
-                'author': c.author.username,
-                'authorAvatar': c.author.profile.profile_picture.url if hasattr(c.author,
-                                                                                'profile') and c.author.profile.profile_picture else None,
-                'text': c.text,
-                'timestamp': c.get_date()
-            })
-
-        user_avatar = None
-        if hasattr(story.author, 'profile') and story.author.profile.profile_picture:
-            user_avatar = story.author.profile.profile_picture.url
-
-        stories_data.append({
-            'id': story.id,
-            'share_uuid': str(story.share_uuid),  # <--- UUID NI STRING QILIB BERAMIZ
-            'author': story.author.username,
-            'authorId': story.author.id,
-            'authorAvatar': user_avatar,
-            'location': story.location,
-            'date': story.get_date(),
-            'title': story.title,
-            'content': story.content,
-            'images': images,
-            'likes': story.likes.count(),
-            'views': story.views_count,
-            'comments': comments,
-            'isLiked': request.user in story.likes.all(),
-            'isSaved': request.user in story.saved_by.all(),
-        })
 
+@login_required
+def stories_feed(request):
+    # Hikoyalar endi sahifalab stories_feed_api orqali yuklanadi
     context = {
-        'stories_json': json.dumps(stories_data),
         'current_user_id': request.user.id,
         'current_user_name': request.user.username
     }
     return render(request, 'stories/feed.html', context)
 
 
-# stories/views.py
+@login_required
+def stories_feed_api(request):
+    """Feedning bitta sahifasini JSON qilib qaytaradi (cursor: created_at + id; filter=foryou — reyting bo'yicha)"""
+    feed_filter = request.GET.get('filter', 'all')
+    try:
+        limit = min(max(int(request.GET.get('limit', FEED_PAGE_SIZE)), 1), FEED_MAX_PAGE_SIZE)
+        place_id = int(request.GET['place']) if request.GET.get('place') else None
+        if feed_filter == 'foryou' and place_id is None:
+            # Tayyor reyting bo'yicha (stories/ranking.py), cursor: manba + ball + id
+            stories, next_cursor = get_ranked_page(request.user, cursor=request.GET.get('cursor'), limit=limit)
+        else:
+            stories, next_cursor = get_feed_page(
+                request.user,
+                cursor=request.GET.get('cursor'),
+                limit=limit,
+                feed_filter=feed_filter,
+                place_id=place_id,
+            )
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor, limit or place'}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'results': [serialize_story(story) for story in stories],
+        'next_cursor': next_cursor,
+    })
 
-# ... tepadagi kodlar ...
 
-# PUBLIC DETAIL VIEW (UUID BILAN)
-from django.shortcuts import render, get_object_or_404
-from .models import Story
+@login_required
+@require_GET
+def stories_search_api(request):
+    """Story qidiruvi (stories/search.py): reyting bo'yicha, sahifalab, moslik parchalari bilan"""
+    query = request.GET.get('q', '')
+    try:
+        page = max(int(request.GET.get('page') or 1), 1)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid page'}, status=400)
 
+    stories, next_page = search_stories(request.user, query, page=page)
+    terms = parse_query(query)
+    results = []
+    for story in stories:
+        data = serialize_story(story)
+        # HTML (escape qilingan, faqat <mark> teglari)
+        data['titleHtml'] = highlight(story.title, terms, words=None) or escape(story.title)
+        data['snippet'] = snippet(story, terms)
+        results.append(data)
+
+    return JsonResponse({
+        'status': 'success',
+        'results': results,
+        # Feed bilan bir xil kalit: frontend uchun sahifa raqami ham "cursor"
+        'next_cursor': str(next_page) if next_page else None,
+    })
 
+
+# PUBLIC DETAIL VIEW (UUID BILAN)
 def story_detail(request, uuid):
+    # View Count: bazaga/sessiyaga yozmaydi — cache'da dedupe, fon thread'ida guruhlab flush (view_counter.py).
+    # Sahifa keshdan berilsa ham sanaladi; story topilmasa (404) — yo'q: tasodifiy UUID'lar buferni to'ldirmasin.
+    response = story_detail_page(request, uuid=uuid)
+    if response.status_code == 200:
+        record_view(request, uuid)
+    return response
+
+
+# Anonim tashrifchilar uchun to'liq sahifa keshi + ETag/304 (config/share_cache.py)
+@cache_share_page('story', 'uuid')
+def story_detail_page(request, uuid):
     # 1. Storyni topamiz
     story = get_object_or_404(Story, share_uuid=uuid)
 
-    # 2. View Count Logikasi (O'zgarishsiz qoldi)
-    session_key = f'viewed_story_{story.id}'
-    if not request.session.get(session_key):
-        story.views_count += 1
-        story.save()
-        request.session[session_key] = True
-        request.session.modified = True
-
     # 3. Avatar Logikasi
     user_avatar = None
     if hasattr(story.author, 'profile') and story.author.profile.profile_picture:
-        user_avatar = story.author.profile.profile_picture.url
+        user_avatar = media_url(story.author.profile.profile_picture)
 
     # --- 4. ENG MUHIM JOYI: USER HOLATINI TEKSHIRISH ---
     is_liked = False
@@ -94,16 +122,15 @@ def story_detail(request, uuid):
         # Odatda ko'p ishlatiladigan variant:
         is_saved = story.saved_by.filter(id=request.user.id).exists()
 
-    # 5. Rasmlar (To'g'ridan-to'g'ri obyektni beramiz, shunda template .url qilib oladi)
-    images = story.images.all()
-
-    # Kommentariyalarni eng yangisidan boshlab olamiz
-    comments = story.comments.all().order_by('-created_at')
+    # Kommentariyalar: faqat birinchi sahifa (eng yangisidan), qolgani "Load more" bilan API orqali
+    comments, comments_cursor = get_comments_page(story.id)
 
     context = {
         'story': story,
-        'images': story.images.all(),
+        # Rasmlar: obyektni beramiz (template .url qilib oladi), xato bo'lganlari chiqmaydi
+        'images': story.images.exclude(status=StoryImage.STATUS_FAILED),
         'comments': comments,  # <--- MANA SHU KERAK
+        'comments_cursor': comments_cursor,
         'is_liked': is_liked,
         'is_saved': is_saved,
     }
@@ -120,45 +147,77 @@ def create_story(request):
         content = request.POST.get('content')
         images = request.FILES.getlist('images')
 
-        story = Story.objects.create(
-            author=request.user,
-            title=title,
-            location=location,
-            content=content
-        )
-
-        for image in images:
-            StoryImage.objects.create(story=story, image=image)
+        with transaction.atomic():
+            story = Story.objects.create(
+                author=request.user,
+                title=title,
+                location=location,
+                content=content
+            )
+            # Asl fayllar bitta INSERT bilan; resize/WebP fon rejimida (images.py)
+            create_story_images(story, images)
 
         return JsonResponse({'status': 'success'})
+    except ValidationError as e:
+        return JsonResponse({'status': 'error', 'message': ' '.join(e.messages)}, status=400)
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
+def _toggle_membership(story_id, through, user, counter_field):
+    """Like/Save toggle: bitta exists() + insert/delete, hisoblagich F() bilan yangilanadi."""
+    membership = through.objects.filter(story_id=story_id, user_id=user.id)
+
+    with transaction.atomic():
+        if membership.exists():
+            removed, _ = membership.delete()
+            if removed:
+                bump_counter(story_id, counter_field, -1)
+            active = False
+        else:
+            try:
+                with transaction.atomic():
+                    through.objects.create(story_id=story_id, user_id=user.id)
+                bump_counter(story_id, counter_field, 1)
+            except IntegrityError:
+                pass  # Parallel so'rov allaqachon qo'shib bo'lgan
+            active = True
+
+    total = Story.objects.filter(pk=story_id).values_list(counter_field, flat=True).first()
+    return active, total
+
+
 @login_required
 @require_POST
 def toggle_like(request, story_id):
-    story = get_object_or_404(Story, id=story_id)
-    if request.user in story.likes.all():
-        story.likes.remove(request.user)
-        liked = False
-    else:
-        story.likes.add(request.user)
-        liked = True
-    return JsonResponse({'status': 'success', 'liked': liked})
+    story = get_object_or_404(Story.objects.only('id'), id=story_id)
+    liked, likes = _toggle_membership(story.id, Story.likes.through, request.user, 'likes_count')
+    return JsonResponse({'status': 'success', 'liked': liked, 'likes': likes})
 
 
 @login_required
 @require_POST
 def toggle_save(request, story_id):
-    story = get_object_or_404(Story, id=story_id)
-    if request.user in story.saved_by.all():
-        story.saved_by.remove(request.user)
-        saved = False
-    else:
-        story.saved_by.add(request.user)
-        saved = True
-    return JsonResponse({'status': 'success', 'saved': saved})
+    story = get_object_or_404(Story.objects.only('id'), id=story_id)
+    saved, saves = _toggle_membership(story.id, Story.saved_by.through, request.user, 'saves_count')
+    return JsonResponse({'status': 'success', 'saved': saved, 'saves': saves})
+
+
+@require_GET
+def story_comments_api(request, story_id):
+    """Kommentlarning bitta sahifasi (yangisidan eskisiga, cursor: created_at + id)"""
+    get_object_or_404(Story.objects.only('id'), id=story_id)
+    try:
+        limit = min(max(int(request.GET.get('limit', COMMENTS_PAGE_SIZE)), 1), COMMENTS_MAX_PAGE_SIZE)
+        comments, next_cursor = get_comments_page(story_id, cursor=request.GET.get('cursor'), limit=limit)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor or limit'}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'results': [serialize_comment(comment) for comment in comments],
+        'next_cursor': next_cursor,
+    })
 
 
 @login_required
@@ -167,9 +226,12 @@ def add_comment(request, story_id):
     data = json.loads(request.body)
     text = data.get('text')
     if text:
-        story = get_object_or_404(Story, id=story_id)
-        Comment.objects.create(story=story, author=request.user, text=text)
-        return JsonResponse({'status': 'success'})
+        story = get_object_or_404(Story.objects.only('id'), id=story_id)
+        # comments_count ni post_save signali F() bilan oshiradi
+        with transaction.atomic():
+            comment = Comment.objects.create(story=story, author=request.user, text=text)
+        # Frontend sahifani qayta yuklamasdan ro'yxatga qo'shadi
+        return JsonResponse({'status': 'success', 'comment': serialize_comment(comment)})
     return JsonResponse({'status': 'error'}, status=400)
 
 
@@ -202,14 +264,16 @@ def edit_story(request, story_id):
             images = request.FILES.getlist('images')
 
             if images:
-                # 1. Eski rasmlarni o'chirish (agar yangi rasm tanlangan bo'lsa)
-                story.images.all().delete()
+                with transaction.atomic():
+                    # 1. Eski rasmlarni o'chirish (agar yangi rasm tanlangan bo'lsa)
+                    story.images.all().delete()
 
-                # 2. Yangi rasmlarni saqlash
-                for image in images:
-                    StoryImage.objects.create(story=story, image=image)
+                    # 2. Yangi rasmlarni saqlash (qayta ishlash fon rejimida)
+                    create_story_images(story, images)
 
             return JsonResponse({'status': 'success'})
+        except ValidationError as e:
+            return JsonResponse({'status': 'error', 'message': ' '.join(e.messages)}, status=400)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
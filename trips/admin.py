@@ -1,3 +1,81 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.utils import timezone
+
+from .itinerary_cache import stats
+from .llm import usage_summary
+from .models import ItineraryCacheEntry, LLMUsage, Place, TripExport
+
+
+@admin.register(ItineraryCacheEntry)
+class ItineraryCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('destination', 'duration_days', 'budget_type', 'interests', 'hits', 'last_used_at')
+    list_filter = ('budget_type',)
+    search_fields = ('destination',)
+    ordering = ('-last_used_at',)
+    readonly_fields = ('key', 'hits', 'created_at', 'refreshed_at', 'last_used_at')
+
+    def changelist_view(self, request, extra_context=None):
+        # Umumiy hit/miss statistikasini sahifa sarlavhasida ko'rsatamiz
+        cache_stats = stats()
+        extra_context = extra_context or {}
+        extra_context['title'] = (
+            f"Itinerary cache — {cache_stats['entries']} entries, "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"(hit rate {cache_stats['hit_rate']:.0%})"
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(TripExport)
+class TripExportAdmin(admin.ModelAdmin):
+    list_display = ('user', 'trip', 'format', 'status', 'created_at', 'finished_at')
+    list_filter = ('format', 'status')
+    readonly_fields = ('content_hash', 'file_name', 'error', 'created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'country', 'latitude', 'longitude', 'population')
+    list_filter = ('country',)
+    search_fields = ('name', 'slug')
+    ordering = ('name',)
+
+
+@admin.register(LLMUsage)
+class LLMUsageAdmin(admin.ModelAdmin):
+    list_display = (
+        'hour', 'model', 'backend', 'calls', 'deduplicated', 'failure_rate', 'timeouts',
+        'avg_latency_ms', 'max_latency_ms', 'prompt_tokens', 'completion_tokens',
+    )
+    list_filter = ('model', 'backend')
+    date_hierarchy = 'hour'
+    ordering = ('-hour', 'model')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='failure rate')
+    def failure_rate(self, obj):
+        return f"{obj.failures / obj.calls:.1%}" if obj.calls else '-'
+
+    @admin.display(description='avg latency (ms)')
+    def avg_latency_ms(self, obj):
+        return round(obj.latency_ms / obj.calls) if obj.calls else '-'
 
-# Register your models here.
+    def changelist_view(self, request, extra_context=None):
+        # Oxirgi 24 soat, model bo'yicha xulosa sahifa sarlavhasida
+        summary = usage_summary(since=timezone.now() - timedelta(hours=24))
+        extra_context = extra_context or {}
+        extra_context['title'] = "LLM usage (24h) — " + ("; ".join(
+            f"{row['model']}: {row['calls']} calls (+{row['deduplicated']} dedup), "
+            f"{row['failure_rate']:.1%} failed, avg {row['avg_latency_ms']} ms, "
+            f"{row['prompt_tokens'] + row['completion_tokens']} tokens"
+            for row in summary
+        ) or "no calls")
+        return super().changelist_view(request, extra_context=extra_context)
@@ -0,0 +1,345 @@
+# trips/exports.py
+#
+# Itinerary eksporti: PDF (WeasyPrint), iCalendar (har bir aktivlik — alohida event) va JSON.
+# Render hech qachon request ichida bajarilmaydi: view TripExport qatorini yaratadi va navbatga qo'yadi,
+# ishchi (thread pool yoki `manage.py process_trip_exports`) faylni TRIP_EXPORT_ROOT ga yozadi.
+# Fayl nomi = (trip, trip'lar versiyasi hash'i): trip o'zgarmagan bo'lsa keyingi so'rov darhol diskdan beriladi.
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Trip, TripExport
+
+logger = logging.getLogger(__name__)
+
+# Render formati o'zgarsa oshiriladi — eski fayllar hash orqali eskiradi
+EXPORT_VERSION = 1
+
+CONTENT_TYPES = {
+    TripExport.FORMAT_PDF: 'application/pdf',
+    TripExport.FORMAT_ICS: 'text/calendar; charset=utf-8',
+    TripExport.FORMAT_JSON: 'application/json',
+}
+
+_TIME_RE = re.compile(r'(\d{1,2})[:.](\d{2})\s*([AaPp][Mm])?')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_storage():
+    return FileSystemStorage(location=settings.TRIP_EXPORT_ROOT)
+
+
+def export_trips(user, trip=None):
+    if trip is not None:
+        return [trip]
+    return list(
+        Trip.objects.filter(user=user, itinerary__isnull=False)
+        .defer('destination_search')
+        .order_by('start_date', 'id')
+    )
+
+
+def export_versions(user, trip=None):
+    """[(id, updated_at)] — eksportga kiradigan triplar. Request ichida: itinerary'lar o'qilmaydi."""
+    if trip is not None:
+        return [(trip.pk, trip.updated_at)]
+    return list(
+        Trip.objects.filter(user=user, itinerary__isnull=False)
+        .order_by('start_date', 'id')
+        .values_list('pk', 'updated_at')
+    )
+
+
+def content_hash(versions, fmt):
+    """Triplar versiyalari bo'yicha sha256 (updated_at — Trip.CONTENT_FIELDS o'zgarganda yangilanadi)."""
+    payload = json.dumps([EXPORT_VERSION, fmt, versions], cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def artifact_name(user, trip, fmt, digest):
+    scope = f"trip-{trip.pk}" if trip is not None else f"user-{user.pk}"
+    return f"{scope}/{digest}.{fmt}"
+
+
+def download_filename(export):
+    if export.trip_id:
+        stem = re.sub(r'[^\w-]+', '-', export.trip.destination).strip('-').lower() or 'trip'
+    else:
+        stem = 'my-trips'
+    return f"{stem}.{export.format}"
+
+
+# --- Navbat ---
+
+def request_export(user, fmt, trip=None):
+    """
+    Eksport so'rovi (request ichida — faqat hash va bitta qator). Fayl diskda bo'lsa darhol 'done',
+    aks holda ishchiga navbatga qo'yiladi. Xato bilan tugagan eksport qayta navbatga qo'yiladi.
+    """
+    digest = content_hash(export_versions(user, trip), fmt)
+    name = artifact_name(user, trip, fmt, digest)
+
+    # Unique constraint'lar bilan: parallel so'rov (ikki marta bosish) qatorni yaratib ulgurgan bo'lsa, o'shani oladi
+    export, _ = TripExport.objects.get_or_create(
+        user=user, trip=trip, format=fmt, content_hash=digest, defaults={'file_name': name},
+    )
+
+    if export.status != TripExport.STATUS_DONE and get_storage().exists(name):
+        # Oldingi eksport (masalan, yozuvi o'chirilgan) fayli diskda qolgan
+        TripExport.objects.filter(pk=export.pk).update(
+            status=TripExport.STATUS_DONE, error="", finished_at=timezone.now()
+        )
+        export.status = TripExport.STATUS_DONE
+        return export
+
+    if export.status == TripExport.STATUS_FAILED:
+        TripExport.objects.filter(pk=export.pk).update(status=TripExport.STATUS_PENDING, error="")
+        export.status = TripExport.STATUS_PENDING
+
+    if export.status == TripExport.STATUS_PENDING:
+        enqueue_export(export.pk)
+    return export
+
+
+def claim_export(export_id):
+    """Eksportni 'running' ga o'tkazadi. Boshqa ishchi olib bo'lgan bo'lsa None qaytaradi."""
+    claimed = TripExport.objects.filter(
+        pk=export_id, status=TripExport.STATUS_PENDING
+    ).update(status=TripExport.STATUS_RUNNING, started_at=timezone.now())
+    if not claimed:
+        return None
+    return TripExport.objects.select_related('user', 'trip').get(pk=export_id)
+
+
+def build_export(export_id):
+    """Ishchi funksiya: faylni render qilib diskka yozadi."""
+    export = claim_export(export_id)
+    if export is None:
+        return
+
+    storage = get_storage()
+    try:
+        if not storage.exists(export.file_name):
+            trips = export_trips(export.user, export.trip)
+            content = RENDERERS[export.format](trips)
+            saved_name = storage.save(export.file_name, ContentFile(content))
+            if saved_name != export.file_name:
+                # Parallel ishchi xuddi shu faylni yozib ulgurgan — bizniki ortiqcha
+                storage.delete(saved_name)
+    except Exception as e:
+        logger.exception("Trip export %s failed", export_id)
+        export.status = TripExport.STATUS_FAILED
+        export.error = str(e)[:1000]
+        export.finished_at = timezone.now()
+        export.save(update_fields=['status', 'error', 'finished_at'])
+        return
+
+    export.status = TripExport.STATUS_DONE
+    export.error = ""
+    export.finished_at = timezone.now()
+    export.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def run_in_worker(export_id):
+    try:
+        build_export(export_id)
+    except Exception:
+        logger.exception("Trip export worker error (export %s)", export_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TRIP_EXPORT_WORKERS,
+                thread_name_prefix='trip-export',
+            )
+        return _executor
+
+
+def enqueue_export(export_id):
+    # TRIP_EXPORT_USE_THREADS=False bo'lsa `manage.py process_trip_exports` bazadan o'zi topib oladi.
+    # Sinxron variant yo'q: PDF render CPU'ni uzoq band qiladi, request ichida bajarilmasligi kerak.
+    if settings.TRIP_EXPORT_USE_THREADS:
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, export_id))
+
+
+def requeue_stale(timeout_seconds):
+    """Ishchi o'lib qolgan bo'lsa, uzoq 'running' turgan eksportlarni qayta 'pending' qiladi."""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return TripExport.objects.filter(
+        status=TripExport.STATUS_RUNNING,
+        started_at__lt=cutoff,
+    ).update(status=TripExport.STATUS_PENDING)
+
+
+# --- Render ---
+
+def parse_activity_time(value):
+    """'09:00', '9.30 pm', '14:00 - 16:00' -> (soat, daqiqa). Tushunarsiz bo'lsa ('Morning') None."""
+    match = _TIME_RE.search(value or '')
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), (match.group(3) or '').lower()
+    if meridiem == 'pm' and hour < 12:
+        hour += 12
+    elif meridiem == 'am' and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def trip_days(trip):
+    """Itinerary JSON -> sanasi hisoblangan kunlar ro'yxati (barcha formatlar uchun umumiy)."""
+    days = []
+    for index, day in enumerate((trip.itinerary or {}).get('days') or [], start=1):
+        number = day.get('day') or index
+        try:
+            offset = int(number) - 1
+        except (TypeError, ValueError):
+            offset = index - 1
+        days.append({
+            'number': number,
+            'date': trip.start_date + timedelta(days=offset),
+            'title': str(day.get('title') or ''),
+            'activities': [
+                {
+                    'time': str(activity.get('time') or ''),
+                    'title': str(activity.get('title') or ''),
+                    'description': str(activity.get('description') or ''),
+                    'location': str(activity.get('location') or ''),
+                    'type': str(activity.get('type') or ''),
+                    'cost': str(activity.get('cost') or ''),
+                }
+                for activity in day.get('activities') or []
+            ],
+        })
+    return days
+
+
+def render_json(trips):
+    data = {
+        'exported_at': timezone.now(),
+        'trips': [
+            {
+                'id': trip.pk,
+                'destination': trip.destination,
+                'start_date': trip.start_date,
+                'duration_days': trip.duration_days,
+                'budget_type': trip.budget_type,
+                'budget_amount': trip.budget_amount,
+                'currency': (trip.itinerary or {}).get('currency', 'USD'),
+                'interests': trip.get_interests_list(),
+                'days': trip_days(trip),
+            }
+            for trip in trips
+        ],
+    }
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2).encode()
+
+
+def _ics_escape(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _ics_fold(line):
+    # RFC 5545: satr 75 oktetdan oshmasin, davomi bitta bo'shliq bilan boshlanadi
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # UTF-8 belgini bo'lmaymiz
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts)
+
+
+def render_ics(trips):
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//TravelScout//Trip Export//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+    ]
+
+    for trip in trips:
+        for day in trip_days(trip):
+            for order, activity in enumerate(day['activities']):
+                start = parse_activity_time(activity['time'])
+                if start is not None:
+                    # Mahalliy (floating) vaqt: manzil vaqt zonasi noma'lum
+                    begins = datetime.combine(day['date'], datetime.min.time()).replace(hour=start[0], minute=start[1])
+                    timing = [
+                        f"DTSTART:{begins:%Y%m%dT%H%M%S}",
+                        f"DTEND:{begins + timedelta(hours=1):%Y%m%dT%H%M%S}",
+                    ]
+                else:
+                    timing = [
+                        f"DTSTART;VALUE=DATE:{day['date']:%Y%m%d}",
+                        f"DTEND;VALUE=DATE:{day['date'] + timedelta(days=1):%Y%m%d}",
+                    ]
+
+                description = activity['description']
+                if activity['cost']:
+                    description = f"{description}\nCost: {activity['cost']}".strip()
+
+                lines += [
+                    'BEGIN:VEVENT',
+                    f"UID:trip-{trip.pk}-day-{day['number']}-{order}@travelscout",
+                    f"DTSTAMP:{stamp}",
+                    *timing,
+                    f"SUMMARY:{_ics_escape(activity['title'] or day['title'] or trip.destination)}",
+                    f"DESCRIPTION:{_ics_escape(description)}",
+                    f"LOCATION:{_ics_escape(activity['location'] or trip.destination)}",
+                    f"CATEGORIES:{_ics_escape(trip.destination)}",
+                    'END:VEVENT',
+                ]
+
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(_ics_fold(line) for line in lines) + '\r\n').encode()
+
+
+def render_pdf(trips):
+    # WeasyPrint og'ir (cairo/pango) — faqat ishchida import qilinadi
+    from weasyprint import HTML
+
+    html = render_to_string('trip_export.html', {
+        'trips': [{'trip': trip, 'days': trip_days(trip)} for trip in trips],
+        'exported_at': timezone.now(),
+    })
+    return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
+
+
+RENDERERS = {
+    TripExport.FORMAT_PDF: render_pdf,
+    TripExport.FORMAT_ICS: render_ics,
+    TripExport.FORMAT_JSON: render_json,
+}
@@ -6,6 +6,13 @@ from .models import Trip, Profile
 
 
 class TripForm(forms.ModelForm):
+    # Keshdagi tayyor itinerary o'rniga yangisini generatsiya qilish (opt-out)
+    force_regenerate = forms.BooleanField(
+        required=False,
+        label="Generate a fresh itinerary",
+        widget=forms.CheckboxInput(attrs={'class': 'w-5 h-5 rounded accent-orange-500'}),
+    )
+
     class Meta:
         model = Trip
         fields = ['destination', 'duration_days', 'budget_type', 'interests']
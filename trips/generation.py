@@ -0,0 +1,288 @@
+# trips/generation.py
+#
+# Itinerary generatsiyasi request ichida emas, fon rejimida ishlaydi:
+# TripCreateView tripni 'pending' holatda saqlaydi va enqueue_generation() ni chaqiradi.
+# Ishchi (thread pool yoki `manage.py process_itineraries`) tripni 'running' ga o'tkazib,
+# LLM chaqiruvini (trips/llm.py) retry/backoff bilan bajaradi va natijani 'done'/'failed' qilib yozadi.
+
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import timedelta
+
+import groq
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import itinerary_cache, llm
+from .models import Trip
+
+logger = logging.getLogger(__name__)
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+# Qayta urinishga arziydigan xatolar (rate limit, tarmoq va timeout, 5xx, buzuq JSON)
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+    json.JSONDecodeError,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def build_prompt(destination, days, budget_type, interests):
+    return f"""
+                                Act as a local travel expert. Generate a {days}-day itinerary for {destination}.
+                                Budget Level: {budget_type}. Interests: {interests}.
+
+                                CRITICAL INSTRUCTIONS FOR COST CALCULATION:
+                                1. Calculate TOTAL COST for ONE PERSON (Excluding Flights).
+                                2. Be CONSERVATIVE and REALISTIC. Do not overestimate.
+                                3. Logic:
+                                   - Economy: Hostels/Budget Hotels, Street Food, Public Transport. (~$50-$100/day excluding accommodation)
+                                   - Standard: 3-Star Hotels, Casual Dining, Mix of Taxi/Metro.
+                                   - Luxury: 4-5 Star Hotels, Fine Dining, Private Transport.
+
+                                4. RETURN ONLY RAW JSON. Format:
+                                {{
+                                  "estimated_cost": 800,  <-- Example: Moderate price for {days} days
+                                  "currency": "USD",
+                                  "days": [
+                                    {{
+                                      "day": 1,
+                                      "title": "Title",
+                                      "activities": [
+                                        {{
+                                          "time": "09:00",
+                                          "title": "Activity",
+                                          "description": "Short desc",
+                                          "location": "Loc",
+                                          "type": "morning",
+                                          "icon": "coffee",
+                                          "cost": "$10"
+                                        }}
+                                      ]
+                                    }}
+                                  ]
+                                }}
+                                """
+
+
+def parse_itinerary(ai_reply):
+    clean_json = ai_reply.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_json)
+
+
+def parse_estimated_cost(json_data):
+    """AI bergan narxdan faqat raqamni oladi. Noto'g'ri bo'lsa None."""
+    raw_cost = json_data.get('estimated_cost')
+    if not raw_cost:
+        return None
+    # Har qanday belgilarni olib tashlab, faqat raqamni olamiz
+    clean_cost = re.sub(r'[^\d]', '', str(raw_cost))
+    if not clean_cost or int(clean_cost) <= 0:
+        return None
+    return int(clean_cost)
+
+
+def itinerary_messages(trip):
+    prompt = build_prompt(trip.destination, trip.duration_days, trip.budget_type, trip.interests)
+    return [
+        {"role": "system", "content": "You are a JSON generator."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def request_itinerary(trip):
+    """Bitta LLM chaqiruvi (retry'siz). Parse qilingan dict qaytaradi."""
+    # Client, timeout, semafora, dedup va token hisobi — trips/llm.py
+    completion = llm.complete(
+        itinerary_messages(trip),
+        model=GROQ_MODEL,
+        temperature=0.5,
+        response_format={"type": "json_object"}
+    )
+    return parse_itinerary(completion.text)
+
+
+def iter_streamed_days(chunks):
+    """
+    LLM stream bo'laklaridan "days" massividagi har bir kunni tayyor bo'lishi bilanoq qaytaradi.
+    Oxirida (StopIteration.value) butun javob matni qaytadi.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = None  # "days": [ dan keyingi joy
+
+    for chunk in chunks:
+        buffer += chunk
+
+        if pos is None:
+            match = re.search(r'"days"\s*:\s*\[', buffer)
+            if not match:
+                continue
+            pos = match.end()
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer) or buffer[pos] != '{' or '}' not in buffer[pos:]:
+                break
+            try:
+                day, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Kun hali to'liq kelmagan
+            pos = end
+            yield day
+
+    return buffer
+
+
+def stream_itinerary(trip):
+    """
+    Streaming rejim: har bir kun kelishi bilan ItineraryDay/Activity qatori yoziladi — SSE view (boshqa
+    jarayonda bo'lsa ham) bazadan o'qiydi. Yakuniy saqlashda qatorlar sync_itinerary_rows() bilan qayta quriladi.
+    """
+    # Oldingi urinishdan qolgan kunlar
+    trip.days.all().delete()
+
+    # JSON mode streaming bilan ishlamaydi, shuning uchun response_format yo'q — prompt o'zi JSON so'raydi.
+    # closing(): xato bo'lsa ham stream darhol yopiladi va semafora bo'shaydi
+    with closing(llm.stream(itinerary_messages(trip), model=GROQ_MODEL, temperature=0.5)) as chunks:
+        day_iter = iter_streamed_days(chunks)
+        for number in itertools.count(1):
+            try:
+                day = next(day_iter)
+            except StopIteration as done:
+                ai_reply = done.value
+                break
+            trip.add_itinerary_days([day], start=number)
+
+    return parse_itinerary(ai_reply)
+
+
+def backoff_delay(attempt):
+    # Exponential backoff + jitter: 2s, 4s, 8s ... (maksimum ITINERARY_BACKOFF_MAX)
+    delay = settings.ITINERARY_BACKOFF_BASE * (2 ** (attempt - 1))
+    return min(delay, settings.ITINERARY_BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+def claim_trip(trip_id):
+    """Tripni 'running' ga o'tkazadi. Boshqa ishchi olib bo'lgan bo'lsa None qaytaradi."""
+    claimed = Trip.objects.filter(
+        pk=trip_id, generation_status=Trip.GENERATION_PENDING
+    ).update(generation_status=Trip.GENERATION_RUNNING, generation_started_at=timezone.now())
+    if not claimed:
+        return None
+    return Trip.objects.get(pk=trip_id)
+
+
+def run_generation(trip_id):
+    """Ishchi funksiya: tripni claim qiladi, LLM'ni chaqiradi va natijani saqlaydi."""
+    trip = claim_trip(trip_id)
+    if trip is None:
+        return
+
+    if not llm.is_configured():
+        trip.itinerary = None
+        trip.generation_status = Trip.GENERATION_DONE
+        trip.save(update_fields=['itinerary', 'generation_status'])
+        return
+
+    last_error = None
+    for attempt in range(1, settings.ITINERARY_MAX_RETRIES + 1):
+        trip.generation_attempts = attempt
+        try:
+            if settings.ITINERARY_STREAMING:
+                json_data = stream_itinerary(trip)
+            else:
+                json_data = request_itinerary(trip)
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            logger.exception("AI error (attempt %s)", attempt)
+            if attempt < settings.ITINERARY_MAX_RETRIES:
+                time.sleep(backoff_delay(attempt))
+            continue
+        except Exception as e:
+            last_error = e
+            logger.exception("AI error")
+            break
+
+        # 2. ITINERARYNI SAQLASH
+        trip.itinerary = json_data
+
+        # 3. NARXNI YANGILASH (Agar AI to'g'ri bersa, aks holda Fixed narx qoladi)
+        final_cost = parse_estimated_cost(json_data)
+        if final_cost:
+            trip.budget_amount = final_cost
+
+        trip.generation_status = Trip.GENERATION_DONE
+        trip.generation_error = ""
+        with transaction.atomic():
+            trip.save(update_fields=[
+                'itinerary', 'budget_amount', 'generation_status',
+                'generation_error', 'generation_attempts',
+            ])
+            trip.sync_itinerary_rows()
+        itinerary_cache.store(trip)
+        return
+
+    trip.itinerary = None
+    trip.generation_status = Trip.GENERATION_FAILED
+    trip.generation_error = str(last_error)[:1000]
+    with transaction.atomic():
+        trip.save(update_fields=['itinerary', 'generation_status', 'generation_error', 'generation_attempts'])
+        # Streaming'dan qolgan chala kunlar
+        trip.days.all().delete()
+
+
+def run_in_worker(trip_id):
+    # Thread o'z DB ulanishini ochadi — ishi tugagach yopib qo'yamiz
+    try:
+        run_generation(trip_id)
+    except Exception:
+        logger.exception("Itinerary worker error (trip %s)", trip_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ITINERARY_WORKERS,
+                thread_name_prefix='itinerary',
+            )
+        return _executor
+
+
+def enqueue_generation(trip_id):
+    """Trip commit bo'lgandan keyin generatsiyani navbatga qo'yadi."""
+    if not settings.ITINERARY_ASYNC:
+        transaction.on_commit(lambda: run_generation(trip_id))
+        return
+
+    # ITINERARY_USE_THREADS=False bo'lsa (masalan Vercel), tripni
+    # `manage.py process_itineraries` ishchisi bazadan o'zi topib oladi.
+    if settings.ITINERARY_USE_THREADS:
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, trip_id))
+
+
+def requeue_stale(timeout_seconds):
+    """Ishchi o'lib qolgan bo'lsa, uzoq 'running' turgan triplarni qayta 'pending' qiladi."""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return Trip.objects.filter(
+        generation_status=Trip.GENERATION_RUNNING,
+        generation_started_at__lt=cutoff,
+    ).update(generation_status=Trip.GENERATION_PENDING)
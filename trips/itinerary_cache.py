@@ -0,0 +1,123 @@
+# trips/itinerary_cache.py
+#
+# "Paris, 5 days, Standard, Culture, Food" kabi bir xil so'rovlar uchun Groq'ni qayta chaqirmaymiz.
+# Kalit = normalizatsiya qilingan (destination, days, budget, interests) ning sha256 hashi.
+# Hit/miss har bir lookup() da cache.incr bilan sanaladi (flights/offers.py metrikalari kabi);
+# qatordagi hits — LRU va admin uchun.
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ItineraryCacheEntry, normalize_search_text as normalize_text
+
+METRIC_NAMES = ('hits', 'misses')
+
+
+def normalize_interests(interests):
+    # "Food, culture ,food" -> "culture,food"
+    items = {normalize_text(x) for x in (interests or '').split(',')}
+    return ','.join(sorted(x for x in items if x))
+
+
+def cache_key(destination, duration_days, budget_type, interests):
+    payload = json.dumps([
+        normalize_text(destination),
+        int(duration_days),
+        normalize_text(budget_type),
+        normalize_interests(interests),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _metric_key(name):
+    return f"itinerary_cache:metrics:{name}"
+
+
+def _incr(name):
+    key = _metric_key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Kalit shu orada o'chib ketgan bo'lsa
+        cache.set(key, 1, timeout=None)
+
+
+def reset_metrics():
+    cache.delete_many([_metric_key(name) for name in METRIC_NAMES])
+
+
+def _fresh_after():
+    return timezone.now() - timedelta(days=settings.ITINERARY_CACHE_TTL_DAYS)
+
+
+def lookup(destination, duration_days, budget_type, interests):
+    """Keshdagi yangi (TTL ichidagi) yozuvni qaytaradi, bo'lmasa None."""
+    if not settings.ITINERARY_CACHE_ENABLED:
+        return None
+
+    key = cache_key(destination, duration_days, budget_type, interests)
+    entry = ItineraryCacheEntry.objects.filter(key=key, refreshed_at__gte=_fresh_after()) \
+        .only('pk', 'itinerary', 'estimated_cost') \
+        .first()
+
+    if entry is None:
+        # Generatsiya keyin muvaffaqiyatsiz tugasa ham — bu miss
+        _incr('misses')
+        return None
+
+    # LRU uchun oxirgi ishlatilgan vaqtni yangilaymiz (atomik)
+    ItineraryCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    _incr('hits')
+    return entry
+
+
+def store(trip):
+    """Generatsiya qilingan itinerary ni keshga yozadi (miss yoki majburiy qayta generatsiya — sanalmaydi)."""
+    if not settings.ITINERARY_CACHE_ENABLED or not trip.itinerary:
+        return
+
+    now = timezone.now()
+    entry, created = ItineraryCacheEntry.objects.update_or_create(
+        key=cache_key(trip.destination, trip.duration_days, trip.budget_type, trip.interests),
+        defaults={
+            'destination': normalize_text(trip.destination),
+            'duration_days': trip.duration_days,
+            'budget_type': trip.budget_type,
+            'interests': normalize_interests(trip.interests),
+            'itinerary': trip.itinerary,
+            'estimated_cost': trip.budget_amount,
+            'refreshed_at': now,
+            'last_used_at': now,
+        },
+    )
+    if created:
+        evict()
+
+
+def evict():
+    """Muddati o'tganlarni va MAX_ENTRIES dan oshganlarini (eng kam ishlatilgan) o'chiradi."""
+    ItineraryCacheEntry.objects.filter(refreshed_at__lt=_fresh_after()).delete()
+
+    excess = ItineraryCacheEntry.objects.count() - settings.ITINERARY_CACHE_MAX_ENTRIES
+    if excess > 0:
+        stale_ids = ItineraryCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:excess]
+        ItineraryCacheEntry.objects.filter(pk__in=list(stale_ids)).delete()
+
+
+def stats():
+    values = cache.get_many([_metric_key(name) for name in METRIC_NAMES])
+    hits = values.get(_metric_key('hits'), 0)
+    misses = values.get(_metric_key('misses'), 0)
+    return {
+        'entries': ItineraryCacheEntry.objects.count(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+    }
@@ -0,0 +1,509 @@
+# trips/llm.py
+#
+# LLM gateway: barcha LLM chaqiruvlari shu yerdan o'tadi.
+#   - bitta uzoq yashaydigan client (HTTP connection pool qayta ishlatiladi), har bir chaqiruvga timeout
+#   - global semafora (LLM_MAX_CONCURRENCY) — thread pool ham, `manage.py process_itineraries` ham
+#   - bir xil so'rov (model + xabarlar + parametrlar) bajarilayotgan bo'lsa, keyingisi provayderga bormaydi,
+#     o'sha natijani (yoki xatoni) kutadi. Streaming'da ham: keyingilar birinchi oqimning bo'laklarini oladi
+#   - tokenlar, latency, xato/timeout'lar model va soat bo'yicha xotirada yig'iladi va fon thread'i
+#     LLMUsage jadvaliga guruhlab yozadi (stories/view_counter.py kabi) — admin'da model bo'yicha xulosa
+#
+# LLM_BACKEND:
+#   'groq' — Groq API
+#   'fake' — tarmoqsiz, prompt'dagi manzil/kunlar bo'yicha tayyor itinerary (LLM_FAKE_LATENCY_MS kechikish bilan)
+# yoki o'z backend klassingizga dotted path.
+
+import atexit
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import groq
+import httpx
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from groq import Groq
+
+from config.perf import timed
+
+from .models import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+Completion = namedtuple('Completion', 'text prompt_tokens completion_tokens')
+
+# Semafora jarayon bo'yicha bitta (override_settings bilan o'zgarmaydi)
+_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+_inflight = {}  # so'rov kaliti -> Future
+_inflight_streams = {}  # so'rov kaliti -> StreamFanout
+_inflight_lock = threading.Lock()
+
+
+def approx_tokens(text):
+    # Provayder usage bermasa: ~4 belgi = 1 token
+    return (len(text) + 3) // 4
+
+
+def is_timeout(error):
+    return isinstance(error, (groq.APITimeoutError, httpx.TimeoutException, TimeoutError))
+
+
+def request_timeout(timeout=None):
+    # Float berilsa SDK client'ning connect timeout'ini ham almashtiradi — connect alohida saqlanadi
+    return httpx.Timeout(timeout or settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+# --- Backend'lar ---
+
+class LLMBackend(ABC):
+    name = None
+
+    @property
+    def configured(self):
+        return True
+
+    @abstractmethod
+    def complete(self, messages, model, timeout, **params):
+        """Completion qaytaradi. timeout — httpx.Timeout."""
+
+    @abstractmethod
+    def stream(self, messages, model, timeout, **params):
+        """Matn bo'laklarini yield qiladi; oxirida (StopIteration.value) (prompt_tokens, completion_tokens)."""
+
+
+class GroqBackend(LLMBackend):
+    name = 'groq'
+
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(settings.GROQ_API_KEY)
+
+    def get_client(self):
+        """Client bir marta yaratiladi — HTTP ulanishlari (keep-alive) chaqiruvlar orasida qayta ishlatiladi."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = Groq(
+                    api_key=settings.GROQ_API_KEY,
+                    # Retry'ni generation.py boshqaradi, shuning uchun SDK ning ichki retry'si o'chirilgan
+                    max_retries=0,
+                    timeout=request_timeout(),
+                    http_client=groq.DefaultHttpxClient(limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONCURRENCY * 2,
+                        max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                    )),
+                )
+            return self._client
+
+    def complete(self, messages, model, timeout, **params):
+        response = self.get_client().chat.completions.create(
+            messages=messages, model=model, timeout=timeout, **params,
+        )
+        text = response.choices[0].message.content
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return Completion(text, approx_tokens(json.dumps(messages)), approx_tokens(text))
+        return Completion(text, usage.prompt_tokens, usage.completion_tokens)
+
+    def stream(self, messages, model, timeout, **params):
+        stream = self.get_client().chat.completions.create(
+            messages=messages, model=model, timeout=timeout, stream=True, **params,
+        )
+        usage = None
+        parts = []
+        for chunk in stream:
+            # Groq usage'ni oxirgi bo'lakda x_groq.usage ichida yuboradi
+            x_groq = getattr(chunk, 'x_groq', None)
+            if x_groq is not None and getattr(x_groq, 'usage', None) is not None:
+                usage = x_groq.usage
+            if chunk.choices:
+                text = chunk.choices[0].delta.content or ""
+                parts.append(text)
+                yield text
+
+        if usage is None:
+            return approx_tokens(json.dumps(messages)), approx_tokens(''.join(parts))
+        return usage.prompt_tokens, usage.completion_tokens
+
+
+class FakeBackend(LLMBackend):
+    """Tarmoqsiz: build_prompt() dagi "N-day itinerary for X" bo'yicha tayyor itinerary JSON."""
+    name = 'fake'
+
+    PROMPT_RE = re.compile(r'(\d+)-day itinerary for (.+?)\.\s')
+    ACTIVITIES = [
+        ('09:00', 'Breakfast at a local cafe', 'morning', 'coffee', '$10'),
+        ('11:00', 'Old town walking tour', 'morning', 'map', '$15'),
+        ('14:00', 'Museum visit', 'afternoon', 'landmark', '$20'),
+        ('19:00', 'Dinner with local food', 'evening', 'utensils', '$25'),
+    ]
+
+    def render(self, messages):
+        prompt = messages[-1]['content']
+        match = self.PROMPT_RE.search(prompt)
+        days, destination = (min(int(match.group(1)), 30), match.group(2)) if match else (3, 'the city')
+        itinerary = {
+            'estimated_cost': 120 * days,
+            'currency': 'USD',
+            'days': [
+                {
+                    'day': day,
+                    'title': f"Day {day} in {destination}",
+                    'activities': [
+                        {
+                            'time': time_, 'title': title, 'description': f"{title} in {destination}.",
+                            'location': destination, 'type': kind, 'icon': icon, 'cost': cost,
+                        }
+                        for time_, title, kind, icon, cost in self.ACTIVITIES
+                    ],
+                }
+                for day in range(1, days + 1)
+            ],
+        }
+        return json.dumps(itinerary)
+
+    def complete(self, messages, model, timeout, **params):
+        text = self.render(messages)
+        time.sleep(settings.LLM_FAKE_LATENCY_MS / 1000)
+        return Completion(text, approx_tokens(json.dumps(messages)), approx_tokens(text))
+
+    def stream(self, messages, model, timeout, **params):
+        text = self.render(messages)
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+        for chunk in chunks:
+            time.sleep(settings.LLM_FAKE_LATENCY_MS / 1000 / len(chunks))
+            yield chunk
+        return approx_tokens(json.dumps(messages)), approx_tokens(text)
+
+
+BACKENDS = {
+    'groq': GroqBackend,
+    'fake': FakeBackend,
+}
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = settings.LLM_BACKEND
+            backend_class = BACKENDS.get(name) or import_string(name)
+            _backend = backend_class()
+        return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    # override_settings(LLM_BACKEND=..., GROQ_API_KEY=...) testlarda darhol ishlashi uchun
+    global _backend
+    if setting in ('LLM_BACKEND', 'GROQ_API_KEY', 'LLM_TIMEOUT', 'LLM_CONNECT_TIMEOUT'):
+        with _backend_lock:
+            _backend = None
+
+
+def is_configured():
+    return get_backend().configured
+
+
+# --- Chaqiruvlar ---
+
+def request_key(model, messages, params):
+    payload = json.dumps([model, messages, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@contextmanager
+def _provider_call(backend, model):
+    """Bitta provayder chaqiruvi: semafora, timed() span va hisob (muvaffaqiyat ham, xato ham)."""
+    queued = time.perf_counter()
+    with _slots:
+        started = time.perf_counter()
+        call = SimpleNamespace(tokens=(0, 0))
+        failed = timed_out = False
+        try:
+            with timed(backend.name):
+                yield call
+        except GeneratorExit:
+            # Stream o'qilmay yopildi — xato emas
+            raise
+        except BaseException as e:
+            failed, timed_out = True, is_timeout(e)
+            raise
+        finally:
+            record_call(
+                model, backend.name,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                queue_ms=(started - queued) * 1000,
+                prompt_tokens=call.tokens[0],
+                completion_tokens=call.tokens[1],
+                failed=failed,
+                timed_out=timed_out,
+            )
+
+
+def complete(messages, model, timeout=None, **params):
+    """
+    Bitta chat completion (retry'siz). Completion(text, prompt_tokens, completion_tokens) qaytaradi.
+    Xuddi shu so'rov hozir bajarilayotgan bo'lsa, provayderga bormay uning natijasini (yoki xatosini) oladi.
+    """
+    key = request_key(model, messages, params)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        result = future.result()
+        record_call(model, get_backend().name, deduplicated=True)
+        return result
+
+    backend = get_backend()
+    try:
+        with _provider_call(backend, model) as call:
+            result = backend.complete(messages, model, request_timeout(timeout), **params)
+            call.tokens = (result.prompt_tokens, result.completion_tokens)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+class StreamFanout:
+    """Bitta provayder oqimi, bir nechta o'quvchi: bo'laklar ro'yxatga yoziladi, kutayotganlar Condition'da."""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.followers = 0  # _inflight_lock ostida o'zgaradi
+        self._changed = threading.Condition()
+
+    def publish(self, chunk):
+        with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.finished, self.error = True, error
+            self._changed.notify_all()
+
+    def follow(self):
+        position = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: position < len(self.chunks) or self.finished)
+                chunks, finished, error = self.chunks[position:], self.finished, self.error
+            position += len(chunks)
+            yield from chunks
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+
+def stream(messages, model, timeout=None, **params):
+    """
+    Matn bo'laklari generatori. Semafora oxirgi bo'lak o'qilguncha (yoki generator yopilguncha) band.
+    Xuddi shu oqim hozir bajarilayotgan bo'lsa, provayderga bormay uning bo'laklarini (boshidan) oladi.
+    """
+    key = request_key(model, messages, {**params, 'stream': True})
+    with _inflight_lock:
+        fanout = _inflight_streams.get(key)
+        leader = fanout is None
+        if leader:
+            fanout = _inflight_streams[key] = StreamFanout()
+        else:
+            fanout.followers += 1
+
+    if not leader:
+        try:
+            yield from fanout.follow()
+        finally:
+            with _inflight_lock:
+                fanout.followers -= 1
+        record_call(model, get_backend().name, deduplicated=True)
+        return
+
+    backend = get_backend()
+    chunks = backend.stream(messages, model, request_timeout(timeout), **params)
+    reading = True
+    error = None
+    try:
+        with _provider_call(backend, model) as call:
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    call.tokens = stop.value
+                    break
+                fanout.publish(chunk)
+                if not reading:
+                    continue
+                try:
+                    yield chunk
+                except GeneratorExit:
+                    with _inflight_lock:
+                        if not fanout.followers:
+                            _inflight_streams.pop(key, None)
+                            raise
+                    # O'quvchi to'xtadi, lekin kutayotganlar bor — oqimni ular uchun oxirigacha o'qiymiz
+                    reading = False
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        chunks.close()
+        with _inflight_lock:
+            if _inflight_streams.get(key) is fanout:
+                del _inflight_streams[key]
+        fanout.finish(error)
+
+
+# --- Hisob (LLMUsage) ---
+
+_pending = {}  # (model, backend, soat) -> hisoblagichlar
+_pending_lock = threading.Lock()
+_flush_requested = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+COUNTERS = ('calls', 'failures', 'timeouts', 'deduplicated', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'queue_ms')
+
+
+def record_call(model, backend, latency_ms=0, queue_ms=0, prompt_tokens=0, completion_tokens=0,
+                failed=False, timed_out=False, deduplicated=False):
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    with _pending_lock:
+        bucket = _pending.setdefault((model, backend, hour), dict.fromkeys(COUNTERS, 0) | {'max_latency_ms': 0})
+        if deduplicated:
+            bucket['deduplicated'] += 1
+        else:
+            bucket['calls'] += 1
+            bucket['failures'] += int(failed)
+            bucket['timeouts'] += int(timed_out)
+            bucket['prompt_tokens'] += prompt_tokens
+            bucket['completion_tokens'] += completion_tokens
+            bucket['latency_ms'] += round(latency_ms)
+            bucket['queue_ms'] += round(queue_ms)
+            bucket['max_latency_ms'] = max(bucket['max_latency_ms'], round(latency_ms))
+    _ensure_flusher()
+
+
+def flush_usage():
+    """Buferni LLMUsage'ga yozadi: har bir (model, backend, soat) uchun bitta UPDATE (yo'q bo'lsa INSERT)."""
+    global _pending
+    with _pending_lock:
+        batch, _pending = _pending, {}
+
+    try:
+        with transaction.atomic():
+            for (model, backend, hour), values in batch.items():
+                _flush_bucket(model, backend, hour, values)
+    except Exception:
+        # Yozilmadi — keyingi flush'da qayta urinamiz
+        with _pending_lock:
+            for key, values in batch.items():
+                bucket = _pending.setdefault(key, dict.fromkeys(COUNTERS, 0) | {'max_latency_ms': 0})
+                for name in COUNTERS:
+                    bucket[name] += values[name]
+                bucket['max_latency_ms'] = max(bucket['max_latency_ms'], values['max_latency_ms'])
+        raise
+    return len(batch)
+
+
+def _flush_bucket(model, backend, hour, values):
+    rows = LLMUsage.objects.filter(model=model, backend=backend, hour=hour)
+    increments = {name: F(name) + values[name] for name in COUNTERS}
+    if rows.update(**increments, max_latency_ms=Greatest(F('max_latency_ms'), values['max_latency_ms'])):
+        return
+    try:
+        # Boshqa jarayon shu soatni hozirgina yaratgan bo'lishi mumkin
+        with transaction.atomic():
+            LLMUsage.objects.create(model=model, backend=backend, hour=hour, **values)
+    except IntegrityError:
+        rows.update(**increments, max_latency_ms=Greatest(F('max_latency_ms'), values['max_latency_ms']))
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(settings.LLM_USAGE_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        try:
+            flush_usage()
+        except Exception:
+            logger.exception("LLM usage flush error")
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='llm-usage-flush', daemon=True)
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _pending:
+        try:
+            flush_usage()
+        except Exception:
+            logger.exception("LLM usage flush error")
+
+
+def usage_summary(since=None):
+    """Model bo'yicha: chaqiruvlar, xato/timeout ulushi, o'rtacha latency, tokenlar (admin xulosasi)."""
+    queryset = LLMUsage.objects.all()
+    if since is not None:
+        queryset = queryset.filter(hour__gte=since)
+    rows = queryset.values('model').annotate(
+        **{name: Sum(name) for name in COUNTERS},
+    ).order_by('model')
+
+    summary = []
+    for row in rows:
+        calls = row['calls'] or 0
+        summary.append({
+            'model': row['model'],
+            'calls': calls,
+            'deduplicated': row['deduplicated'] or 0,
+            'failure_rate': round(row['failures'] / calls, 3) if calls else 0.0,
+            'timeout_rate': round(row['timeouts'] / calls, 3) if calls else 0.0,
+            'avg_latency_ms': round(row['latency_ms'] / calls) if calls else 0,
+            'avg_queue_ms': round(row['queue_ms'] / calls) if calls else 0,
+            'prompt_tokens': row['prompt_tokens'] or 0,
+            'completion_tokens': row['completion_tokens'] or 0,
+        })
+    return summary
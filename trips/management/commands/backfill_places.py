@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from stories.models import Story
+from trips.models import Trip
+from trips.places import place_ids
+from trips.stats import stats_cache_key
+
+TARGETS = {
+    'trips': (Trip, 'destination'),
+    'stories': (Story, 'location'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mavjud Trip.destination va Story.location qatorlarini gazetteer'dagi Place'ga bog'laydi. "
+        "pk bo'yicha partiyalab (keyset), save() va signallarsiz — bitta partiyaga bir nechta so'rov."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(TARGETS), action='append', help="Default: hammasi")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--relink', action='store_true',
+            help="Allaqachon bog'langan qatorlarni ham qayta moslaydi (gazetteer yangilanganda)",
+        )
+
+    def handle(self, *args, **options):
+        for name in options['model'] or sorted(TARGETS):
+            model, field = TARGETS[name]
+            scanned, linked = self.backfill(model, field, options['batch_size'], options['relink'])
+            self.stdout.write(f"{name}: {scanned} ta ko'rildi, {linked} ta bog'landi")
+
+    def backfill(self, model, field, batch_size, relink):
+        queryset = model.objects.order_by('pk')
+        if not relink:
+            queryset = queryset.filter(place__isnull=True)
+        only = ['pk', field, 'place'] + (['user'] if model is Trip else [])
+
+        scanned = linked = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).only(*only)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            scanned += len(rows)
+
+            ids = place_ids({getattr(row, field) for row in rows})
+            changed = []
+            for row in rows:
+                place_id = ids.get(getattr(row, field))
+                if place_id != row.place_id and (place_id is not None or relink):
+                    row.place_id = place_id
+                    changed.append(row)
+
+            if changed:
+                model.objects.bulk_update(changed, ['place'])
+                linked += len(changed)
+                if model is Trip:
+                    # bulk_update signal yubormaydi — dashboard stats keshini o'zimiz tozalaymiz
+                    cache.delete_many([stats_cache_key(user_id) for user_id in {row.user_id for row in changed}])
+            self.stdout.write(f"  {model.__name__} pk <= {last_pk}: {len(changed)} ta yangilandi")
+
+        return scanned, linked
@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.test import override_settings
+
+from trips import llm
+from trips.generation import GROQ_MODEL, build_prompt
+from trips.models import LLMUsage
+from trips.places import get_gazetteer
+
+
+class Command(BaseCommand):
+    help = (
+        "LLM gateway throughput'ini tarmoqsiz o'lchaydi (LLM_BACKEND='fake'): bir vaqtdagi so'rovlar, "
+        "bir xil so'rovlar dedup'i va semafora navbati. Parallellik LLM_MAX_CONCURRENCY bilan cheklangan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--distinct', type=int, default=50, help="Shuncha xil prompt (qolganlari takror)")
+        parser.add_argument('--threads', type=int, default=32, help="Bir vaqtda so'rov yuboruvchilar")
+        parser.add_argument('--latency-ms', type=int, default=200, help="Fake backend javob vaqti")
+        parser.add_argument('--stream', action='store_true', help="complete() o'rniga stream()")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        names = sorted(entry.name for entry in get_gazetteer().by_slug.values())
+        prompts = [
+            build_prompt(rng.choice(names), rng.randint(1, 7), rng.choice(['Economy', 'Standard', 'Luxury']), 'Food')
+            for _ in range(options['distinct'])
+        ]
+        messages = [
+            [{"role": "system", "content": "You are a JSON generator."}, {"role": "user", "content": rng.choice(prompts)}]
+            for _ in range(options['requests'])
+        ]
+
+        def call(message):
+            started = time.perf_counter()
+            if options['stream']:
+                text = ''.join(llm.stream(message, model=GROQ_MODEL, temperature=0.5))
+            else:
+                text = llm.complete(message, model=GROQ_MODEL, temperature=0.5).text
+            return (time.perf_counter() - started) * 1000, len(text)
+
+        before = self.usage()
+        with override_settings(LLM_BACKEND='fake', LLM_FAKE_LATENCY_MS=options['latency_ms']):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                results = list(executor.map(call, messages))
+            elapsed = time.perf_counter() - started
+            llm.flush_usage()
+        # Hisob soat bo'yicha yig'iladi — shu ishga tushirishniki = keyin - oldin
+        usage = {name: value - before.get(name, 0) for name, value in self.usage().items()}
+
+        timings = sorted(ms for ms, _ in results)
+        self.stdout.write(
+            f"{len(results)} requests ({options['distinct']} distinct, {options['threads']} threads, "
+            f"LLM_MAX_CONCURRENCY={settings.LLM_MAX_CONCURRENCY}, {options['latency_ms']} ms/backend call): "
+            f"{elapsed:.2f}s, {len(results) / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f"latency: median {statistics.median(timings):.0f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.0f} ms, max {timings[-1]:.0f} ms"
+        )
+        if usage:
+            self.stdout.write(
+                f"usage: {usage['calls']} backend calls, {usage['deduplicated']} deduplicated, "
+                f"avg queue {usage['queue_ms'] / max(usage['calls'], 1):.0f} ms, "
+                f"{usage['prompt_tokens']} + {usage['completion_tokens']} tokens"
+            )
+
+    def usage(self):
+        return LLMUsage.objects.filter(backend='fake', model=GROQ_MODEL).aggregate(
+            **{name: Sum(name, default=0) for name in llm.COUNTERS},
+        )
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trips.generation import requeue_stale, run_in_worker
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    help = "Bazadagi 'pending' triplar uchun itinerary generatsiya qiladi (DB-backed navbat ishchisi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Navbatni bir marta bo'shatib chiqib ketadi")
+        parser.add_argument('--interval', type=float, default=2.0, help="Navbat bo'sh bo'lganda kutish (soniya)")
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=300,
+            help="Shuncha soniyadan beri 'running' turgan triplar qayta navbatga qo'yiladi",
+        )
+
+    def handle(self, *args, **options):
+        # Parallellik LLM_MAX_CONCURRENCY semaforasi bilan cheklangan (trips/llm.py)
+        with ThreadPoolExecutor(max_workers=settings.ITINERARY_WORKERS) as executor:
+            while True:
+                requeued = requeue_stale(options['stale_after'])
+                if requeued:
+                    self.stdout.write(f"Qayta navbatga qo'yildi: {requeued}")
+
+                trip_ids = list(
+                    Trip.objects.filter(generation_status=Trip.GENERATION_PENDING)
+                    .order_by('created_at')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+
+                if trip_ids:
+                    list(executor.map(run_in_worker, trip_ids))
+                    self.stdout.write(f"Ishlandi: {len(trip_ids)} ta trip")
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
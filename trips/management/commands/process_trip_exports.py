@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.exports import build_export, requeue_stale
+from trips.models import TripExport
+
+
+class Command(BaseCommand):
+    help = "Bazadagi 'pending' eksportlar uchun PDF/ICS/JSON fayllarini yaratadi (DB-backed navbat ishchisi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Navbatni bir marta bo'shatib chiqib ketadi")
+        parser.add_argument('--interval', type=float, default=2.0, help="Navbat bo'sh bo'lganda kutish (soniya)")
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help="Shuncha soniyadan beri 'running' turgan eksportlar qayta navbatga qo'yiladi",
+        )
+
+    def handle(self, *args, **options):
+        # PDF render CPU'ga og'ir — bitta jarayonda ketma-ket; parallellik uchun bir nechta ishchi ishga tushiring
+        while True:
+            requeued = requeue_stale(options['stale_after'])
+            if requeued:
+                self.stdout.write(f"Qayta navbatga qo'yildi: {requeued}")
+
+            export_ids = list(
+                TripExport.objects.filter(status=TripExport.STATUS_PENDING)
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+
+            if export_ids:
+                for export_id in export_ids:
+                    build_export(export_id)
+                self.stdout.write(f"Ishlandi: {len(export_ids)} ta eksport")
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
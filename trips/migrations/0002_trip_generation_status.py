@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+def mark_existing_done(apps, schema_editor):
+    # Eski triplar request ichida generatsiya qilingan — ular tayyor
+    Trip = apps.get_model('trips', 'Trip')
+    Trip.objects.update(generation_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='generation_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='generation_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='generation_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='generation_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 12:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0002_trip_generation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItineraryCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('destination', models.CharField(max_length=200)),
+                ('duration_days', models.IntegerField()),
+                ('budget_type', models.CharField(max_length=20)),
+                ('interests', models.CharField(max_length=500)),
+                ('itinerary', models.TextField()),
+                ('estimated_cost', models.IntegerField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('misses', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
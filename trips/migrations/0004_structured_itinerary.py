@@ -0,0 +1,114 @@
+# Generated by Django 6.0 on 2026-10-18 13:00
+
+import json
+import re
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clean_itinerary_text(apps, schema_editor):
+    # JSONField ga o'tishdan oldin: bo'sh ('') va buzuq JSON matnlarni NULL qilamiz
+    Trip = apps.get_model('trips', 'Trip')
+    for trip in Trip.objects.exclude(itinerary__isnull=True).only('pk', 'itinerary').iterator():
+        try:
+            json.loads(trip.itinerary)
+        except (TypeError, ValueError):
+            Trip.objects.filter(pk=trip.pk).update(itinerary=None)
+
+
+def parse_cost_amount(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    text = str(value)
+    if text.strip().lower() == 'free':
+        return Decimal('0')
+    match = re.search(r'\d[\d,]*(?:\.\d+)?', text)
+    return Decimal(match.group().replace(',', '')) if match else None
+
+
+def build_itinerary_rows(apps, schema_editor):
+    Trip = apps.get_model('trips', 'Trip')
+    ItineraryDay = apps.get_model('trips', 'ItineraryDay')
+    Activity = apps.get_model('trips', 'Activity')
+
+    for trip in Trip.objects.exclude(itinerary__isnull=True).only('pk', 'itinerary').iterator(chunk_size=200):
+        if not isinstance(trip.itinerary, dict):
+            continue
+        days = trip.itinerary.get('days') or []
+        day_rows = ItineraryDay.objects.bulk_create([
+            ItineraryDay(trip_id=trip.pk, number=day.get('day') or index, title=str(day.get('title') or '')[:200])
+            for index, day in enumerate(days, start=1)
+        ])
+        Activity.objects.bulk_create([
+            Activity(
+                day=day_row,
+                order=order,
+                time=str(activity.get('time') or '')[:20],
+                title=str(activity.get('title') or '')[:200],
+                description=str(activity.get('description') or ''),
+                location=str(activity.get('location') or '')[:200],
+                type=str(activity.get('type') or '')[:50],
+                icon=str(activity.get('icon') or '')[:50],
+                cost=str(activity.get('cost') or '')[:50],
+                cost_amount=parse_cost_amount(activity.get('cost')),
+            )
+            for day_row, day in zip(day_rows, days)
+            for order, activity in enumerate(day.get('activities') or [])
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0003_itinerary_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_itinerary_text, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='itinerarycacheentry',
+            name='itinerary',
+            field=models.JSONField(),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='itinerary',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ItineraryDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='trips.trip')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('time', models.CharField(blank=True, max_length=20)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('type', models.CharField(blank=True, max_length=50)),
+                ('icon', models.CharField(blank=True, max_length=50)),
+                ('cost', models.CharField(blank=True, max_length=50)),
+                ('cost_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('day', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='trips.itineraryday')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.RunPython(build_itinerary_rows, migrations.RunPython.noop),
+    ]
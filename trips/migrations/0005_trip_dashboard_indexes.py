@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 13:04
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_search_text(value):
+    # trips.models.normalize_search_text nusxasi (migratsiya model kodiga bog'lanmasligi uchun)
+    text = unicodedata.normalize('NFKD', value or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def fill_destination_search(apps, schema_editor):
+    Trip = apps.get_model('trips', 'Trip')
+    batch = []
+    for trip in Trip.objects.only('pk', 'destination').iterator(chunk_size=500):
+        trip.destination_search = normalize_search_text(trip.destination)
+        batch.append(trip)
+        if len(batch) >= 500:
+            Trip.objects.bulk_update(batch, ['destination_search'])
+            batch = []
+    if batch:
+        Trip.objects.bulk_update(batch, ['destination_search'])
+
+
+# "contains" qidiruvi uchun trigram indeks — faqat Postgres'da (SQLite'da prefiks indeks yetarli)
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS trip_dest_search_trgm_idx '
+        'ON trips_trip USING gin (destination_search gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS trip_dest_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_structured_itinerary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='destination_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_destination_search, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', '-created_at'], name='trip_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', 'budget_type'], name='trip_user_budget_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['user', 'destination_search'], name='trip_user_dest_search_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
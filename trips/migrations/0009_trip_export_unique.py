@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 14:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    # Constraint'dan oldin: bir xil (trip/user, format, hash) qatorlardan eng eskisi qoladi
+    TripExport = apps.get_model('trips', 'TripExport')
+    seen = set()
+    duplicates = []
+    rows = TripExport.objects.order_by('pk').values_list('pk', 'user_id', 'trip_id', 'format', 'content_hash')
+    for pk, user_id, trip_id, fmt, content_hash in rows.iterator():
+        key = (trip_id, fmt, content_hash) if trip_id is not None else (None, user_id, fmt, content_hash)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+    TripExport.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0008_llm_usage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tripexport',
+            constraint=models.UniqueConstraint(condition=models.Q(('trip__isnull', False)), fields=('trip', 'format', 'content_hash'), name='trip_export_unique_trip'),
+        ),
+        migrations.AddConstraint(
+            model_name='tripexport',
+            constraint=models.UniqueConstraint(condition=models.Q(('trip__isnull', True)), fields=('user', 'format', 'content_hash'), name='trip_export_unique_all'),
+        ),
+    ]
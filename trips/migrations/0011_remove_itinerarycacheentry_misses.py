@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 14:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0010_trip_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='itinerarycacheentry',
+            name='misses',
+        ),
+    ]
@@ -3,9 +3,33 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
+from decimal import Decimal
+import re
+import unicodedata
 import uuid
 
 
+def normalize_search_text(value):
+    # "  São   Paulo " -> "sao paulo" (qidiruv indeksi uchun: kichik harf, diakritikasiz)
+    text = unicodedata.normalize('NFKD', value or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+
+class Place(models.Model):
+    """Gazetteer'dagi kanonik joy (trips/places.py). Trip va Story shu qatorga bog'lanadi."""
+    slug = models.SlugField(max_length=120, unique=True)  # "paris-fr"
+    name = models.CharField(max_length=200)
+    country = models.CharField(max_length=100)
+    country_code = models.CharField(max_length=2)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    population = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}, {self.country}"
+
 
 class Trip(models.Model):
     BUDGET_CHOICES = [
@@ -14,8 +38,29 @@ class Trip(models.Model):
         ('Luxury', 'Luxury'),
     ]
 
+    # AI itinerary generatsiyasi holati (trips/generation.py)
+    GENERATION_PENDING = 'pending'
+    GENERATION_RUNNING = 'running'
+    GENERATION_DONE = 'done'
+    GENERATION_FAILED = 'failed'
+    GENERATION_STATUS_CHOICES = [
+        (GENERATION_PENDING, 'Pending'),
+        (GENERATION_RUNNING, 'Running'),
+        (GENERATION_DONE, 'Done'),
+        (GENERATION_FAILED, 'Failed'),
+    ]
+    # Shulardan biri saqlanganda updated_at yangilanadi (eksport hash'i shunga qaraydi; is_favorite kabilar — yo'q)
+    CONTENT_FIELDS = (
+        'destination', 'start_date', 'duration_days', 'budget_type', 'budget_amount', 'description', 'interests',
+        'itinerary',
+    )
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     destination = models.CharField(max_length=200)
+    # normalize_search_text(destination) — save() da yangilanadi, dashboard qidiruvi shu ustun bo'yicha
+    destination_search = models.CharField(max_length=200, blank=True, default="", editable=False)
+    # Gazetteer bo'yicha aniqlangan joy — stats va qidiruv matn o'rniga shu FK bo'yicha
+    place = models.ForeignKey(Place, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='trips')
     start_date = models.DateField(default=timezone.now)
     duration_days = models.IntegerField(default=5)
 
@@ -32,9 +77,85 @@ class Trip(models.Model):
     # --- O'ZGARISH SHU YERDA ---
     # Oldin: generated_plan = ...
     # Hozir: itinerary = ... (View bilan bir xil bo'lishi shart)
-    itinerary = models.TextField(blank=True, null=True)
+    # JSONField: har sahifada json.loads qilish shart emas. Kunlar/aktivliklar ItineraryDay/Activity da ham bor.
+    itinerary = models.JSONField(blank=True, null=True)
+
+    generation_status = models.CharField(
+        max_length=10, choices=GENERATION_STATUS_CHOICES, default=GENERATION_PENDING, db_index=True
+    )
+    generation_attempts = models.PositiveSmallIntegerField(default=0)
+    generation_error = models.TextField(blank=True, default="")
+    generation_started_at = models.DateTimeField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Dashboard: WHERE user_id = ? ORDER BY created_at DESC LIMIT ...
+            models.Index(fields=['user', '-created_at'], name='trip_user_created_idx'),
+            models.Index(fields=['user', 'budget_type'], name='trip_user_budget_idx'),
+            # Prefiks qidiruv (LIKE 'par%'). Postgres'da trigram GIN indeks migratsiyada qo'shiladi.
+            models.Index(
+                fields=['user', 'destination_search'],
+                name='trip_user_dest_search_idx',
+                opclasses=['', 'varchar_pattern_ops'],
+            ),
+            # Dashboard "top destination": GROUP BY place_id
+            models.Index(fields=['user', 'place'], name='trip_user_place_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'destination' in update_fields:
+            search = normalize_search_text(self.destination)
+            # Joy faqat destination o'zgarganda qayta aniqlanadi (eski qiymat — destination_search)
+            if search != self.destination_search or self.place_id is None:
+                from .places import place_for  # places.py shu modulni import qiladi
+                self.place = place_for(self.destination)
+            self.destination_search = search
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'destination_search', 'place'}
+        if update_fields is not None and not set(update_fields).isdisjoint(self.CONTENT_FIELDS):
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+        super().save(*args, **kwargs)
+
+    @property
+    def is_generating(self):
+        return self.generation_status in (self.GENERATION_PENDING, self.GENERATION_RUNNING)
+
+    def sync_itinerary_rows(self):
+        """itinerary JSON dan ItineraryDay/Activity qatorlarini qayta quradi (generatsiyada bir marta)."""
+        self.days.all().delete()
+        self.add_itinerary_days((self.itinerary or {}).get('days') or [])
+
+    def add_itinerary_days(self, days, start=1):
+        """AI bergan kunlarni ItineraryDay/Activity qatorlari sifatida qo'shadi (streaming'da har kun kelganda)."""
+        day_rows = ItineraryDay.objects.bulk_create([
+            ItineraryDay(
+                trip=self,
+                number=day.get('day') or index,
+                title=str(day.get('title') or '')[:200],
+            )
+            for index, day in enumerate(days, start=start)
+        ])
+
+        Activity.objects.bulk_create([
+            Activity(
+                day=day_row,
+                order=order,
+                time=str(activity.get('time') or '')[:20],
+                title=str(activity.get('title') or '')[:200],
+                description=str(activity.get('description') or ''),
+                location=str(activity.get('location') or '')[:200],
+                type=str(activity.get('type') or '')[:50],
+                icon=str(activity.get('icon') or '')[:50],
+                cost=str(activity.get('cost') or '')[:50],
+                cost_amount=parse_cost_amount(activity.get('cost')),
+            )
+            for day_row, day in zip(day_rows, days)
+            for order, activity in enumerate(day.get('activities') or [])
+        ])
 
     def get_interests_list(self):
         return [x.strip() for x in self.interests.split(',')]
@@ -44,8 +165,165 @@ class Trip(models.Model):
 
 
 
-# 1. ENG MUHIM IMPORT (Buni qo'shish shart)
-from cloudinary_storage.storage import MediaCloudinaryStorage
+def parse_cost_amount(value):
+    """'$10', '€1,200.50', 'Free' -> Decimal. Raqam topilmasa None."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    text = str(value)
+    if text.strip().lower() == 'free':
+        return Decimal('0')
+    match = re.search(r'\d[\d,]*(?:\.\d+)?', text)
+    if not match:
+        return None
+    return Decimal(match.group().replace(',', ''))
+
+
+# Itinerary normalizatsiya qilingan ko'rinishi: SQL'da so'rash/agregatsiya uchun (masalan kunlik xarajat)
+class ItineraryDay(models.Model):
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='days')
+    number = models.PositiveSmallIntegerField()
+    title = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['number']
+
+    def __str__(self):
+        return f"Day {self.number}: {self.title}"
+
+
+class Activity(models.Model):
+    day = models.ForeignKey(ItineraryDay, on_delete=models.CASCADE, related_name='activities')
+    order = models.PositiveSmallIntegerField(default=0)
+    time = models.CharField(max_length=20, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+    description = models.TextField(blank=True)
+    location = models.CharField(max_length=200, blank=True)
+    type = models.CharField(max_length=50, blank=True)
+    icon = models.CharField(max_length=50, blank=True)
+    cost = models.CharField(max_length=50, blank=True)  # AI bergan matn: "$10"
+    cost_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        ordering = ['order']
+
+    def __str__(self):
+        return self.title
+
+
+# AI itinerary keshi: bir xil (destination, days, budget, interests) uchun Groq qayta chaqirilmaydi
+class ItineraryCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)  # sha256 (trips/itinerary_cache.py)
+
+    # Normalizatsiya qilingan qiymatlar (debug va admin uchun)
+    destination = models.CharField(max_length=200)
+    duration_days = models.IntegerField()
+    budget_type = models.CharField(max_length=20)
+    interests = models.CharField(max_length=500)
+
+    itinerary = models.JSONField()
+    estimated_cost = models.IntegerField()
+
+    hits = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)  # TTL shu yerdan hisoblanadi
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)  # LRU eviction
+
+    def __str__(self):
+        return f"{self.destination} / {self.duration_days}d / {self.budget_type}"
+
+
+# Trip eksporti (trips/exports.py): PDF/ICS/JSON fon ishchisida yaratiladi.
+# Tayyor fayl diskda (trip, itinerary hash) bo'yicha saqlanadi — takroriy yuklab olish qayta render qilmaydi.
+class TripExport(models.Model):
+    FORMAT_PDF = 'pdf'
+    FORMAT_ICS = 'ics'
+    FORMAT_JSON = 'json'
+    FORMAT_CHOICES = [
+        (FORMAT_PDF, 'PDF'),
+        (FORMAT_ICS, 'iCalendar'),
+        (FORMAT_JSON, 'JSON'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trip_exports')
+    # None — userning barcha triplari bitta faylda
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, blank=True, null=True, related_name='exports')
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    content_hash = models.CharField(max_length=64)  # sha256: trip(lar) (id, updated_at) + format
+    file_name = models.CharField(max_length=255)  # TRIP_EXPORT_ROOT ichidagi nisbiy yo'l
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'format', 'content_hash'], name='trip_export_lookup_idx'),
+        ]
+        constraints = [
+            # Bir xil kontent uchun bitta qator: ikki marta bosilsa ham ikkinchi eksport yaratilmaydi
+            # (trip NULL bo'lsa unique ishlamaydi — "barcha triplar" eksporti uchun alohida shart)
+            models.UniqueConstraint(
+                fields=['trip', 'format', 'content_hash'],
+                condition=models.Q(trip__isnull=False),
+                name='trip_export_unique_trip',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'format', 'content_hash'],
+                condition=models.Q(trip__isnull=True),
+                name='trip_export_unique_all',
+            ),
+        ]
+
+    @property
+    def is_ready(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __str__(self):
+        scope = self.trip_id or 'all'
+        return f"{self.user_id} / {scope} / {self.format} ({self.status})"
+
+
+# LLM chaqiruvlari hisobi (trips/llm.py): model va soat bo'yicha yig'iladi,
+# xotiradagi buferdan fon thread'i guruhlab yozadi (chaqiruv yo'lida bazaga yozuv yo'q)
+class LLMUsage(models.Model):
+    model = models.CharField(max_length=100)
+    backend = models.CharField(max_length=20)
+    hour = models.DateTimeField()  # soat boshi
+
+    calls = models.PositiveIntegerField(default=0)  # provayderga ketgan chaqiruvlar
+    failures = models.PositiveIntegerField(default=0)  # timeout'lar ham shu ichida
+    timeouts = models.PositiveIntegerField(default=0)
+    deduplicated = models.PositiveIntegerField(default=0)  # bir xil so'rov natijasini kutib olganlar (provayderga bormagan)
+
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    latency_ms = models.PositiveBigIntegerField(default=0)  # jami; o'rtachasi = latency_ms / calls
+    max_latency_ms = models.PositiveIntegerField(default=0)
+    queue_ms = models.PositiveBigIntegerField(default=0)  # semaforada kutish, jami
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'backend', 'hour'], name='llm_usage_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} @ {self.hour:%Y-%m-%d %H}:00"
 
 
 class Profile(models.Model):
@@ -55,7 +333,7 @@ class Profile(models.Model):
         upload_to='profile_pics/',
         blank=True,
         null=True,
-        storage=MediaCloudinaryStorage()
+        # Storage: STORAGES['default'] (MEDIA_STORAGE orqali tanlanadi)
     )
 
     def __str__(self):
@@ -0,0 +1,148 @@
+# trips/places.py
+#
+# Joy normalizatsiyasi: erkin matn ("paris", "Paris ", "Paris, France", "Lisboa") -> bitta Place qatori.
+# Gazetteer (PLACES_GAZETTEER, CSV) bir marta o'qiladi: nom va muqobil nomlar normalize_search_text kalitlariga.
+# Moslash tartibi: to'liq matn -> vergulgacha qism (keyingi qism mamlakat bo'lsa, shu bilan aniqlashtiriladi)
+# -> difflib bilan fuzzy. Natija matn bo'yicha lru_cache'da, Place qatori faqat birinchi marta yaratiladi.
+
+import csv
+import difflib
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.text import slugify
+
+from .models import Place, normalize_search_text
+
+FUZZY_CUTOFF = 0.85
+
+Entry = namedtuple('Entry', 'slug name country_code country latitude longitude population')
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+class Gazetteer:
+    def __init__(self, entries):
+        self.by_slug = {entry.slug: entry for entry in entries}
+        self.by_key = {}  # normalize_search_text(nom yoki muqobil nom) -> [Entry]
+        self.countries = {}  # "france" / "fr" -> "FR"
+
+        for entry, aliases in entries.items():
+            for name in (entry.name, *aliases):
+                key = normalize_search_text(name)
+                if key and entry not in self.by_key.setdefault(key, []):
+                    self.by_key[key].append(entry)
+            self.countries[normalize_search_text(entry.country)] = entry.country_code
+            self.countries[entry.country_code.lower()] = entry.country_code
+
+        self.keys = list(self.by_key)
+
+    def match(self, text, fuzzy=True):
+        normalized = normalize_search_text(text)
+        if not normalized:
+            return None
+
+        parts = [part.strip() for part in normalized.split(',') if part.strip()]
+        if len(parts) == 1 and ' ' in normalized:
+            # "Kyoto Japan": oxirgi so'z mamlakat bo'lsa, vergul bilan yozilgandek
+            head, tail = normalized.rsplit(' ', 1)
+            if tail in self.countries:
+                parts = [head, tail]
+        country = self.countries.get(parts[-1]) if len(parts) > 1 else None
+
+        candidates = self.by_key.get(normalized) or self.by_key.get(parts[0])
+        if not candidates and fuzzy:
+            close = difflib.get_close_matches(parts[0], self.keys, n=1, cutoff=FUZZY_CUTOFF)
+            candidates = self.by_key[close[0]] if close else None
+        if not candidates:
+            return None
+
+        if country:
+            in_country = [entry for entry in candidates if entry.country_code == country]
+            candidates = in_country or candidates
+        # Bir xil nomli joylardan eng kattasi ("Valencia" -> Ispaniya)
+        return max(candidates, key=lambda entry: entry.population)
+
+
+def load_gazetteer(path):
+    entries = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            entry = Entry(
+                slug=slugify(f"{row['name']}-{row['country_code']}"),
+                name=row['name'].strip(),
+                country_code=row['country_code'].strip().upper(),
+                country=row['country'].strip(),
+                latitude=float(row['latitude']),
+                longitude=float(row['longitude']),
+                population=int(row['population'] or 0) * 1000,  # faylda — ming kishi
+            )
+            entries[entry] = [alias.strip() for alias in (row['aliases'] or '').split('|') if alias.strip()]
+    return Gazetteer(entries)
+
+
+def get_gazetteer():
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = load_gazetteer(settings.PLACES_GAZETTEER)
+        return _gazetteer
+
+
+@lru_cache(maxsize=8192)
+def match_slug(text, fuzzy=True):
+    """Matn -> gazetteer slug (yoki None). Bazaga bormaydi."""
+    entry = get_gazetteer().match(text, fuzzy=fuzzy)
+    return entry.slug if entry else None
+
+
+def _place_fields(entry):
+    return {
+        'name': entry.name,
+        'country': entry.country,
+        'country_code': entry.country_code,
+        'latitude': entry.latitude,
+        'longitude': entry.longitude,
+        'population': entry.population,
+    }
+
+
+def place_for(text):
+    """Trip/Story saqlanganda: matn -> Place. Gazetteer'da topilmasa None (bazaga bormaydi)."""
+    slug = match_slug(text or '')
+    if slug is None:
+        return None
+    place, _ = Place.objects.get_or_create(slug=slug, defaults=_place_fields(get_gazetteer().by_slug[slug]))
+    return place
+
+
+def place_ids(texts):
+    """Backfill uchun: {matn: place_id} — bitta SELECT va yetishmagan joylar uchun bitta bulk INSERT."""
+    slugs = {text: match_slug(text or '') for text in texts}
+    wanted = {slug for slug in slugs.values() if slug}
+
+    ids = dict(Place.objects.filter(slug__in=wanted).values_list('slug', 'pk'))
+    missing = wanted - ids.keys()
+    if missing:
+        gazetteer = get_gazetteer()
+        Place.objects.bulk_create(
+            [Place(slug=slug, **_place_fields(gazetteer.by_slug[slug])) for slug in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(Place.objects.filter(slug__in=missing).values_list('slug', 'pk'))
+
+    return {text: ids[slug] for text, slug in slugs.items() if slug in ids}
+
+
+@receiver(setting_changed)
+def reset_gazetteer(setting, **kwargs):
+    global _gazetteer
+    if setting == 'PLACES_GAZETTEER':
+        with _gazetteer_lock:
+            _gazetteer = None
+        match_slug.cache_clear()
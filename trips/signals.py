@@ -1,9 +1,11 @@
 # trips/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, Trip
+from .stats import invalidate_dashboard_stats
+from config import share_cache
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
@@ -16,4 +18,18 @@ def create_profile(sender, instance, created, **kwargs):
 def save_profile(sender, instance, **kwargs):
     # Bu yerda ham ehtiyotkor bo'lamiz: profil borligini tekshiramiz
     if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+        instance.profile.save()
+
+
+# Dashboard stats keshini tozalash (trip yaratildi/o'zgardi/favorite/o'chirildi)
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def reset_dashboard_stats(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.user_id)
+
+
+# Public share sahifasi (/share/<uuid>/) keshi: yangi versiya -> eski sahifa endi berilmaydi
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def reset_share_page(sender, instance, **kwargs):
+    share_cache.invalidate('trip', instance.share_uuid)
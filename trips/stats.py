@@ -0,0 +1,53 @@
+# trips/stats.py
+#
+# Dashboard statistikasi: bitta aggregate() + top destination (Place bo'yicha), natija har bir user uchun keshlanadi.
+# Kesh trip saqlanganda/o'chirilganda (signals.py) tozalanadi.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Trip
+
+
+def stats_cache_key(user_id):
+    return f"trips:dashboard_stats:{user_id}"
+
+
+def compute_dashboard_stats(user_id):
+    user_trips = Trip.objects.filter(user_id=user_id)
+
+    stats = user_trips.aggregate(
+        trips_count=Count('pk'),
+        total_budget=Coalesce(Sum('budget_amount'), 0),
+        favorites_count=Count('pk', filter=Q(is_favorite=True)),
+    )
+
+    # Top Destination: gazetteer'dagi joylar place_id (integer FK) bo'yicha — "paris", "Paris " va
+    # "Paris, France" bitta joy. Hech bir trip bog'lanmagan bo'lsa (backfill'dan oldin) matn bo'yicha.
+    top_place = user_trips.filter(place__isnull=False).values('place_id', 'place__name') \
+        .annotate(num_trips=Count('pk')) \
+        .order_by('-num_trips') \
+        .first()
+    if top_place:
+        stats['top_destination'] = top_place['place__name']
+    else:
+        top_dest_data = user_trips.values('destination_search') \
+            .annotate(num_trips=Count('pk'), destination=Min('destination')) \
+            .order_by('-num_trips') \
+            .first()
+        stats['top_destination'] = top_dest_data['destination'] if top_dest_data else "No trips yet"
+    return stats
+
+
+def get_dashboard_stats(user_id):
+    return cache.get_or_set(
+        stats_cache_key(user_id),
+        lambda: compute_dashboard_stats(user_id),
+        timeout=settings.DASHBOARD_STATS_CACHE_TTL,
+    )
+
+
+def invalidate_dashboard_stats(user_id):
+    cache.delete(stats_cache_key(user_id))
@@ -5,6 +5,9 @@ register = template.Library()
 
 @register.filter
 def json_load(value):
+    # Trip.itinerary endi JSONField — tayyor dict/list kelsa qayta parse qilmaymiz
+    if isinstance(value, (dict, list)):
+        return value
     try:
         return json.loads(value)
     except (ValueError, TypeError):
@@ -1,3 +1,521 @@
-from django.test import TestCase
+import difflib
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from config.benchmarks import BenchmarkTestCase, StubGroq
+
+from .exports import build_export, get_storage, render_ics, render_json, request_export
+from .generation import iter_streamed_days, run_generation
+from . import itinerary_cache
+from .itinerary_cache import cache_key, normalize_interests, normalize_text
+from . import llm
+from .llm import flush_usage
+from .models import ItineraryDay, LLMUsage, Place, Trip, TripExport
+from .places import FUZZY_CUTOFF, match_slug, place_for, place_ids
+
+
+class TripViewBenchmarks(BenchmarkTestCase):
+    """Dashboard, detail, public share va toggle endpointlari: query soni va javob vaqti chegaralari."""
+
+    def setUp(self):
+        super().setUp()
+        self.trip = self.data.owner_trips[0]
+        self.client.force_login(self.data.owner)
+
+    def test_dashboard(self):
+        # Sovuq: stats keshi bo'sh
+        self.assertBenchmark(
+            'trips.dashboard', lambda: self.client.get(reverse('my_plans_list')),
+            max_queries=8, max_ms=300, before=self.reset_caches,
+        )
+
+    def test_dashboard_search_and_filter(self):
+        url = reverse('my_plans_list') + '?q=par&budget=Economy&budget=Luxury'
+        self.assertBenchmark('trips.dashboard_filtered', lambda: self.client.get(url), max_queries=8, max_ms=250)
+
+    def test_dashboard_list_mode(self):
+        self.client.cookies['travelScoutViewMode'] = 'list'
+        url = reverse('my_plans_list') + '?page=2'
+        self.assertBenchmark('trips.dashboard_list_mode', lambda: self.client.get(url), max_queries=8, max_ms=300)
+
+    def test_trip_detail(self):
+        url = reverse('trip_detail', args=[self.trip.pk])
+        self.assertBenchmark('trips.detail', lambda: self.client.get(url), max_queries=6, max_ms=250)
+
+    def test_public_trip_detail(self):
+        self.client.logout()
+        url = reverse('trip_share', args=[self.trip.share_uuid])
+        self.assertBenchmark(
+            'trips.public_detail_cold', lambda: self.client.get(url),
+            max_queries=3, max_ms=250, before=self.reset_caches,
+        )
+
+    def test_public_trip_detail_cached(self):
+        # Anonim so'rovlar share sahifa keshidan: bazaga tegmaydi
+        self.client.logout()
+        url = reverse('trip_share', args=[self.trip.share_uuid])
+        self.client.get(url)
+        self.assertBenchmark('trips.public_detail_cached', lambda: self.client.get(url), max_queries=0, max_ms=50)
+
+    def test_toggle_favorite(self):
+        url = reverse('toggle_favorite', args=[self.trip.pk])
+        self.assertBenchmark('trips.toggle_favorite', lambda: self.client.post(url), max_queries=6, max_ms=100)
+
+    def test_trip_create_with_stub_generation(self):
+        StubGroq.calls = 0
+        form = {'destination': 'Benchmarkistan', 'duration_days': 3, 'budget_type': 'Standard', 'interests': 'Food'}
+
+        def create():
+            # ITINERARY_ASYNC=False: generatsiya on_commit'da, StubGroq bilan
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(reverse('trip_new'), form)
+
+        self.assertBenchmark('trips.create_generate', create, max_queries=21, max_ms=300, status=302, runs=1)
+        self.assertEqual(StubGroq.calls, 1)
+        trip = Trip.objects.get(user=self.data.owner, destination='Benchmarkistan')
+        self.assertEqual(trip.generation_status, Trip.GENERATION_DONE)
+        self.assertEqual(trip.days.count(), 3)
+
+        # Gateway hisobi (trips/llm.py): bitta provayder chaqiruvi, tokenlar bilan
+        flush_usage()
+        usage = LLMUsage.objects.get()
+        self.assertEqual((usage.calls, usage.failures), (1, 0))
+        self.assertGreater(usage.completion_tokens, 0)
+
+        # Ikkinchi marta — itinerary keshidan, Groq chaqirilmaydi
+        self.assertBenchmark('trips.create_cached', create, max_queries=10, max_ms=200, status=302, runs=1)
+        self.assertEqual(StubGroq.calls, 1)
+
+
+def collect_days(chunks):
+    """iter_streamed_days: [(kun, shu paytgacha o'qilgan bo'laklar soni)] va oxiridagi to'liq matn."""
+    consumed = []
+
+    def source():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    days = []
+    day_iter = iter_streamed_days(source())
+    while True:
+        try:
+            days.append((next(day_iter), len(consumed)))
+        except StopIteration as done:
+            return days, done.value
+
+
+class ItineraryCacheKeyTests(SimpleTestCase):
+    """Kesh kaliti: yozilishi boshqacha, lekin bir xil so'rovlar bitta kalitga tushadi."""
+
+    def key(self, destination='Paris', days=5, budget='Standard', interests='Culture, Food'):
+        return cache_key(destination, days, budget, interests)
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('  New \t  York\n'), 'new york')
+        self.assertEqual(normalize_text('São Paulo'), 'sao paulo')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_normalize_interests(self):
+        self.assertEqual(normalize_interests('Food, culture ,food'), 'culture,food')
+        self.assertEqual(normalize_interests(' , Street   Food,,'), 'street food')
+        self.assertEqual(normalize_interests(None), '')
+
+    def test_case_whitespace_and_interest_order_share_a_key(self):
+        key = self.key()
+        self.assertEqual(self.key(destination='  PARIS '), key)
+        self.assertEqual(self.key(destination='São Paulo'), self.key(destination='sao  paulo'))
+        self.assertEqual(self.key(budget='standard'), key)
+        self.assertEqual(self.key(days='5'), key)
+        self.assertEqual(self.key(interests='food,  CULTURE, Food'), key)
+
+    def test_different_requests_get_different_keys(self):
+        key = self.key()
+        self.assertNotEqual(self.key(destination='Paris, Texas'), key)
+        self.assertNotEqual(self.key(days=6), key)
+        self.assertNotEqual(self.key(budget='Luxury'), key)
+        self.assertNotEqual(self.key(interests='Culture'), key)
+        # Vergul — qiziqishlar chegarasi: "Culture Food" bitta qiziqish
+        self.assertNotEqual(self.key(interests='Culture Food'), key)
+
+
+@override_settings(ITINERARY_CACHE_ENABLED=True)
+class ItineraryCacheStatsTests(TestCase):
+    """hit_rate — lookup()'lar bo'yicha: majburiy qayta generatsiya (store) miss emas."""
+
+    def setUp(self):
+        itinerary_cache.reset_metrics()
+        self.addCleanup(itinerary_cache.reset_metrics)
+        self.user = User.objects.create_user('planner')
+
+    def lookup(self):
+        return itinerary_cache.lookup('São Paulo', 3, 'Standard', 'Food')
+
+    def test_hits_and_misses_counted_on_lookup(self):
+        self.assertIsNone(self.lookup())
+        # Generatsiya muvaffaqiyatsiz — store yo'q, lekin miss sanalgan
+        self.assertEqual(itinerary_cache.stats()['misses'], 1)
+
+        trip = Trip.objects.create(
+            user=self.user, destination='Sao Paulo', duration_days=3, interests='food',
+            itinerary={'days': []}, generation_status=Trip.GENERATION_DONE,
+        )
+        itinerary_cache.store(trip)
+        itinerary_cache.store(trip)
+        self.assertIsNotNone(self.lookup())
+
+        stats = itinerary_cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 1, 0.5))
+
+
+class GatedBackend(llm.FakeBackend):
+    """Testlar uchun: provayder chaqiruvi gate ochilguncha kutadi (stream'da — birinchi bo'lakdan keyin)."""
+    name = 'gated'
+    CHUNKS = ['{"days": ', '[1, ', '2]}']
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.error = None
+
+    def complete(self, messages, model, timeout, **params):
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return llm.Completion('{"days": []}', 10, 5)
+
+    def stream(self, messages, model, timeout, **params):
+        self.calls += 1
+        yield self.CHUNKS[0]
+        self.gate.wait(5)
+        yield from self.CHUNKS[1:]
+        return 10, 5
+
+
+class WaiterCountingFuture(Future):
+    """result() ni kutayotganlar soni — lider gate'ni hamma follower'lar ulangandan keyin ochadi."""
+    waiters = 0
+    lock = threading.Lock()
+
+    def result(self, timeout=None):
+        with self.lock:
+            WaiterCountingFuture.waiters += 1
+        return super().result(timeout)
+
+
+@override_settings(LLM_BACKEND='gated', LLM_FAKE_LATENCY_MS=0, LLM_USAGE_FLUSH_INTERVAL=3600)
+class LLMGatewayTests(TestCase):
+    """Bir xil so'rovlar dedup'i: complete() Future'i va stream fan-out'i."""
+    MESSAGES = [{'role': 'user', 'content': 'Plan a trip'}]
+    MODEL = 'test-model'
+
+    def setUp(self):
+        backends = mock.patch.dict(llm.BACKENDS, {'gated': GatedBackend})
+        backends.start()
+        self.addCleanup(backends.stop)
+        llm.reset_backend('LLM_BACKEND')
+        self.backend = llm.get_backend()
+        WaiterCountingFuture.waiters = 0
+
+    def tearDown(self):
+        self.backend.gate.set()
+        flush_usage()
+        self.assertEqual(llm._inflight, {})
+        self.assertEqual(llm._inflight_streams, {})
+
+    def run_concurrently(self, count):
+        """count ta bir xil complete(): lider backend'da turganda qolganlari ulanadi, keyin gate ochiladi."""
+        def call():
+            try:
+                return llm.complete(self.MESSAGES, self.MODEL)
+            except Exception as e:
+                return e
+
+        with mock.patch('trips.llm.Future', WaiterCountingFuture), ThreadPoolExecutor(count) as executor:
+            leader = executor.submit(call)
+            self.assertTrue(self.backend.started.wait(5))
+            followers = [executor.submit(call) for _ in range(count - 1)]
+            while WaiterCountingFuture.waiters < count - 1:
+                threading.Event().wait(0.001)
+            self.backend.gate.set()
+            return [leader.result(5)] + [future.result(5) for future in followers]
+
+    def test_identical_completions_make_one_call(self):
+        results = self.run_concurrently(8)
+        self.assertEqual(self.backend.calls, 1)
+        self.assertTrue(all(result == llm.Completion('{"days": []}', 10, 5) for result in results))
+
+    def test_error_reaches_every_waiter(self):
+        self.backend.error = RuntimeError('provider down')
+        results = self.run_concurrently(4)
+        self.assertEqual(self.backend.calls, 1)
+        self.assertTrue(all(result is self.backend.error for result in results))
+
+        # Kalit tozalangan — keyingi so'rov provayderga qayta boradi
+        self.backend.error = None
+        llm.complete(self.MESSAGES, self.MODEL)
+        self.assertEqual(self.backend.calls, 2)
+
+    def test_follower_joining_mid_stream_gets_all_chunks(self):
+        leader = llm.stream(self.MESSAGES, self.MODEL)
+        self.assertEqual(next(leader), '{"days": ')
+        follower = llm.stream(self.MESSAGES, self.MODEL)
+        # Allaqachon kelgan bo'lak darhol, qolganlari lider o'qigan sari
+        self.assertEqual(next(follower), '{"days": ')
+
+        with ThreadPoolExecutor(1) as executor:
+            rest = executor.submit(list, follower)
+            self.backend.gate.set()
+            self.assertEqual(list(leader), ['[1, ', '2]}'])
+            self.assertEqual(rest.result(5), ['[1, ', '2]}'])
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_leader_closing_early_lets_followers_drain(self):
+        leader = llm.stream(self.MESSAGES, self.MODEL)
+        next(leader)
+        follower = llm.stream(self.MESSAGES, self.MODEL)
+        next(follower)
+
+        self.backend.gate.set()
+        # O'quvchi ketdi, lekin follower bor — lider oqimni oxirigacha o'qib tarqatadi
+        leader.close()
+        self.assertEqual(list(follower), ['[1, ', '2]}'])
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_leader_closing_alone_stops_stream(self):
+        leader = llm.stream(self.MESSAGES, self.MODEL)
+        next(leader)
+        leader.close()
+        # Kalit bo'shadi — keyingi oqim yangi provayder chaqiruvi
+        self.backend.gate.set()
+        self.assertEqual(''.join(llm.stream(self.MESSAGES, self.MODEL)), ''.join(GatedBackend.CHUNKS))
+        self.assertEqual(self.backend.calls, 2)
+
+
+class StreamedDaysTests(SimpleTestCase):
+    """LLM stream bo'laklaridan kunlarni ajratish (chala JSON)."""
+    REPLY = json.dumps({
+        'estimated_cost': 300,
+        'meta': {'days': 2},
+        'days': [
+            {'day': 1, 'title': 'Old {town}', 'activities': [{'title': 'Walk "}" tour', 'time': '09:00'}]},
+            {'day': 2, 'title': 'Bazaar', 'activities': []},
+        ],
+    })
+
+    def test_days_yielded_as_soon_as_complete(self):
+        chunks = [self.REPLY[i:i + 7] for i in range(0, len(self.REPLY), 7)]
+        days, text = collect_days(chunks)
+
+        self.assertEqual([day['title'] for day, _ in days], ['Old {town}', 'Bazaar'])
+        self.assertEqual(days[0][0]['activities'][0]['title'], 'Walk "}" tour')
+        # Birinchi kun ikkinchisi kelishidan oldin: yopuvchi '}' bo'lagidan keyin darhol
+        first_end = self.REPLY.index('{"day": 2')
+        self.assertLessEqual(days[0][1], first_end // 7 + 1)
+        self.assertEqual(text, self.REPLY)
+
+    def test_single_character_chunks(self):
+        days, text = collect_days(list(self.REPLY))
+        self.assertEqual([day['day'] for day, _ in days], [1, 2])
+        self.assertEqual(text, self.REPLY)
+
+    def test_truncated_reply_keeps_complete_days_only(self):
+        cut = self.REPLY.index('"Bazaar"')
+        days, text = collect_days([self.REPLY[:cut]])
+        self.assertEqual([day['day'] for day, _ in days], [1])
+        self.assertEqual(text, self.REPLY[:cut])
+
+    def test_reply_without_days(self):
+        self.assertEqual(collect_days(['{"estimated_cost": ', '10}']), ([], '{"estimated_cost": 10}'))
+
+
+@override_settings(
+    LLM_BACKEND='fake', LLM_FAKE_LATENCY_MS=0, LLM_USAGE_FLUSH_INTERVAL=3600,
+    ITINERARY_ASYNC=False, ITINERARY_STREAMING=True, ITINERARY_STREAM_TIMEOUT=0.3,
+)
+class ItineraryStreamingTests(TestCase):
+    """Streaming generatsiya: kunlar ItineraryDay qatorlariga yoziladi, SSE view ularni bazadan o'qiydi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('streamer')
+
+    def tearDown(self):
+        # Gateway hisobi test bazasiga yozilib bo'shatiladi
+        flush_usage()
+
+    def create_trip(self, **fields):
+        return Trip.objects.create(user=self.user, destination='Samarkand', duration_days=3, **fields)
+
+    def test_days_written_while_streaming(self):
+        trip = self.create_trip()
+        with mock.patch.object(Trip, 'add_itinerary_days', autospec=True, side_effect=Trip.add_itinerary_days) as add:
+            run_generation(trip.pk)
+
+        trip.refresh_from_db()
+        self.assertEqual(trip.generation_status, Trip.GENERATION_DONE)
+        # Har bir kun alohida (stream paytida) yozilgan, yakunda sync_itinerary_rows bilan qayta qurilgan
+        self.assertEqual(
+            [[day['day'] for day in call.args[1]] for call in add.call_args_list], [[1], [2], [3], [1, 2, 3]],
+        )
+        self.assertEqual(list(trip.days.values_list('number', flat=True)), [1, 2, 3])
+
+    async def test_stream_sends_day_rows(self):
+        trip = await Trip.objects.acreate(
+            user=self.user, destination='Samarkand', duration_days=2, generation_status=Trip.GENERATION_RUNNING,
+        )
+        await ItineraryDay.objects.acreate(trip=trip, number=1, title='Registan')
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('trip_itinerary_stream', args=[trip.pk]))
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertEqual(body.count('event: day'), 1)
+        self.assertIn('"title": "Registan"', body)
+        self.assertTrue(body.endswith('event: timeout\ndata: {}\n\n'))
+
+    @override_settings(ITINERARY_STREAMING=False)
+    def test_stream_disabled_under_wsgi(self):
+        trip = self.create_trip(generation_status=Trip.GENERATION_RUNNING)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('trip_itinerary_stream', args=[trip.pk])).status_code, 404)
+        # Sahifa EventSource ochmaydi — status polling
+        page = self.client.get(reverse('trip_detail', args=[trip.pk]))
+        self.assertContains(page, 'x-init="poll()"')
+
+
+@override_settings(TRIP_EXPORT_USE_THREADS=False, TRIP_EXPORT_ROOT=tempfile.mkdtemp(prefix='trip-exports-'))
+class TripExportTests(TestCase):
+    """Eksport: takroriy so'rov yangi qator yaratmaydi; ICS (escape, 75 oktet) va JSON tuzilishi."""
+
+    @classmethod
+    def tearDownClass(cls):
+        # Fayllar har ishga tushirishda yangi vaqtinchalik papkada — eskilari natijaga ta'sir qilmaydi
+        shutil.rmtree(settings.TRIP_EXPORT_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('exporter')
+        cls.trip = Trip.objects.create(
+            user=cls.user, destination='Samarkand', start_date=date(2026, 5, 1), duration_days=2,
+            interests='Food, History', generation_status=Trip.GENERATION_DONE,
+            itinerary={'currency': 'USD', 'days': [
+                {'day': 1, 'title': 'Registan', 'activities': [
+                    {'time': '9:30 pm', 'title': 'Light show; music, tea', 'cost': '$10',
+                     'description': 'Line one\nLine two with a back\\slash ' + 'ö' * 60, 'location': 'Registan'},
+                ]},
+                {'day': 2, 'title': 'Bazaar', 'activities': [
+                    {'time': 'Morning', 'title': 'Siyob bazaar', 'description': '', 'location': ''},
+                ]},
+            ]},
+        )
+
+    def test_request_export_reuses_row(self):
+        first = request_export(self.user, TripExport.FORMAT_ICS, trip=self.trip)
+        second = request_export(self.user, TripExport.FORMAT_ICS, trip=self.trip)
+        everything = request_export(self.user, TripExport.FORMAT_ICS)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(request_export(self.user, TripExport.FORMAT_ICS).pk, everything.pk)
+        self.assertEqual(TripExport.objects.count(), 2)
+        self.assertEqual(first.status, TripExport.STATUS_PENDING)
+
+        build_export(first.pk)
+        self.assertTrue(get_storage().exists(first.file_name))
+        self.assertEqual(request_export(self.user, TripExport.FORMAT_ICS, trip=self.trip).status, TripExport.STATUS_DONE)
+
+    def test_all_trips_hash_uses_versions(self):
+        everything = request_export(self.user, TripExport.FORMAT_JSON)
+        # Itinerary'lar o'qilmaydi: (id, updated_at) va get_or_create
+        with self.assertNumQueries(2), mock.patch('trips.exports.export_trips') as export_trips:
+            self.assertEqual(request_export(self.user, TripExport.FORMAT_JSON).pk, everything.pk)
+        export_trips.assert_not_called()
+
+        # Sevimli — eksport mazmuni emas; itinerary o'zgarsa — yangi fayl
+        self.trip.is_favorite = True
+        self.trip.save(update_fields=['is_favorite'])
+        self.assertEqual(request_export(self.user, TripExport.FORMAT_JSON).pk, everything.pk)
+        self.trip.itinerary = {**self.trip.itinerary, 'currency': 'EUR'}
+        self.trip.save(update_fields=['itinerary'])
+        self.assertNotEqual(request_export(self.user, TripExport.FORMAT_JSON).pk, everything.pk)
+
+    def test_ics_escaping_and_folding(self):
+        content = render_ics([self.trip]).decode()
+        lines = content.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+
+        unfolded = content.replace('\r\n ', '')
+        self.assertIn('SUMMARY:Light show\\; music\\, tea\r\n', unfolded)
+        self.assertIn('DESCRIPTION:Line one\\nLine two with a back\\\\slash ' + 'ö' * 60 + '\\nCost: $10\r\n', unfolded)
+        # Vaqt bo'lsa — soatli (floating), bo'lmasa — butun kunlik hodisa
+        self.assertIn('DTSTART:20260501T213000\r\n', unfolded)
+        self.assertIn('DTSTART;VALUE=DATE:20260502\r\n', unfolded)
+        self.assertIn('LOCATION:Samarkand\r\n', unfolded)
+
+    def test_json_shape(self):
+        data = json.loads(render_json([self.trip]))
+        self.assertEqual(set(data), {'exported_at', 'trips'})
+        trip = data['trips'][0]
+        self.assertEqual(
+            {key: trip[key] for key in ('id', 'destination', 'start_date', 'duration_days', 'currency', 'interests')},
+            {'id': self.trip.pk, 'destination': 'Samarkand', 'start_date': '2026-05-01', 'duration_days': 2,
+             'currency': 'USD', 'interests': ['Food', 'History']},
+        )
+        self.assertEqual([(day['number'], day['date']) for day in trip['days']], [(1, '2026-05-01'), (2, '2026-05-02')])
+        self.assertEqual(
+            set(trip['days'][0]['activities'][0]),
+            {'time', 'title', 'description', 'location', 'type', 'cost'},
+        )
+
+
+class PlaceMatchingTests(TestCase):
+    """Erkin matn -> gazetteer slug -> Place qatori."""
+
+    def test_spellings_map_to_one_place(self):
+        spellings = ['paris', 'Paris ', 'Paris, France', 'PARIS FRANCE']
+        self.assertEqual({match_slug(text) for text in spellings}, {'paris-fr'})
+        self.assertEqual({place_for(text).pk for text in spellings}, {Place.objects.get().pk})
+
+    def test_aliases(self):
+        self.assertEqual(match_slug('Lisboa'), 'lisbon-pt')
+        self.assertEqual(match_slug('Toshkent'), 'tashkent-uz')
+        self.assertEqual(match_slug('Ташкент'), 'tashkent-uz')
+
+    def test_fuzzy_cutoff(self):
+        # 'tashkant' ~ 0.875 — chegaradan yuqori, 'taskunt' ~ 0.8 — past
+        self.assertGreaterEqual(difflib.SequenceMatcher(None, 'tashkant', 'tashkent').ratio(), FUZZY_CUTOFF)
+        self.assertEqual(match_slug('Tashkant'), 'tashkent-uz')
+        self.assertIsNone(match_slug('Tashkant', fuzzy=False))
+        self.assertLess(difflib.SequenceMatcher(None, 'taskunt', 'tashkent').ratio(), FUZZY_CUTOFF)
+        self.assertIsNone(match_slug('Taskunt'))
+
+    def test_unknown_text(self):
+        for text in ('Qwertyville', '', None):
+            with self.subTest(text=text):
+                self.assertIsNone(place_for(text))
+        self.assertFalse(Place.objects.exists())
+
+    def test_place_ids_agree_with_place_for(self):
+        texts = ['paris', 'Paris, France', 'Lisboa', 'Tashkant', 'Qwertyville']
+        ids = place_ids(texts)
+        self.assertEqual(Place.objects.count(), 3)
+        self.assertEqual(ids, {text: place_for(text).pk for text in texts if match_slug(text)})
+        self.assertNotIn('Qwertyville', ids)
+
+        # Mavjud qatorlar qayta yaratilmaydi: bitta SELECT
+        with self.assertNumQueries(1):
+            self.assertEqual(place_ids(texts), ids)
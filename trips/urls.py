@@ -4,7 +4,9 @@ from .views import (
     HomeView, TripCreateView, TripListView, TripDetailView,
     SignUpView, delete_trip, toggle_favorite,
     share_trip_options, public_trip_detail, profile_edit,
-    ajax_password_change  # <--- MANA SHULARNI QO'SHDIM
+    ajax_password_change,  # <--- MANA SHULARNI QO'SHDIM
+    trip_generation_status, trip_itinerary_stream,
+    trip_export, trips_export, trip_export_status, trip_export_download
 )
 
 urlpatterns = [
@@ -16,6 +18,14 @@ urlpatterns = [
     # Create & Detail
     path('trip/new/', TripCreateView.as_view(), name='trip_new'),
     path('trip/<int:pk>/', TripDetailView.as_view(), name='trip_detail'),
+    path('trip/<int:pk>/status/', trip_generation_status, name='trip_generation_status'),
+    path('trip/<int:pk>/stream/', trip_itinerary_stream, name='trip_itinerary_stream'),
+
+    # Eksport (PDF / ICS / JSON) — fon ishchisida tayyorlanadi
+    path('trip/<int:pk>/export/<str:fmt>/', trip_export, name='trip_export'),
+    path('trips/export/<str:fmt>/', trips_export, name='trips_export'),
+    path('exports/<int:export_id>/', trip_export_status, name='trip_export_status'),
+    path('exports/<int:export_id>/download/', trip_export_download, name='trip_export_download'),
 
     # DELETE (Page)
     path('trip/<int:pk>/delete/', delete_trip, name='delete_trip'),
@@ -1,25 +1,33 @@
+import asyncio
 import os
 import json
 import re
+import time
 
 from allauth.account.views import PasswordChangeView
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST, require_http_methods
-from groq import Groq
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView, ListView, CreateView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm
 from django.urls import reverse_lazy, reverse
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.db.models import Sum, Count, Q
 
-from .models import Trip, Profile
+from .models import ItineraryDay, Trip, TripExport, Profile, normalize_search_text
 from .forms import TripForm, UserUpdateForm, ProfileUpdateForm, CustomSignUpForm
+from . import exports, itinerary_cache
+from .generation import enqueue_generation
+from .places import match_slug
+from .stats import get_dashboard_stats
+from config.perf import timed
+from config.share_cache import cache_share_page
 
 
 # 1. Landing Page
@@ -40,36 +48,49 @@ class TripListView(LoginRequiredMixin, ListView):
     context_object_name = 'trips'
     login_url = '/accounts/login/'
 
+    paginate_by = 12
+
     def get_queryset(self):
-        queryset = Trip.objects.filter(user=self.request.user).order_by('-created_at')
+        # (user, -created_at) indeksi bo'yicha; itinerary JSON kartochkalarda kerak emas
+        queryset = Trip.objects.filter(user=self.request.user).defer('itinerary').order_by('-created_at')
 
-        # SEARCH
-        search_query = self.request.GET.get('q')
+        # SEARCH: normalizatsiya qilingan ustun bo'yicha (indeksli)
+        search_query = normalize_search_text(self.request.GET.get('q'))
         if search_query:
-            queryset = queryset.filter(destination__icontains=search_query)
-
-        # FILTER
-        budget_filter = self.request.GET.get('budget')
-        if budget_filter:
-            queryset = queryset.filter(budget_type=budget_filter)
+            if len(search_query) < 3:
+                # Qisqa so'rov: prefiks (varchar_pattern_ops indeksi)
+                text_filter = Q(destination_search__startswith=search_query)
+            else:
+                # Postgres'da trigram GIN indeksi ishlatiladi
+                text_filter = Q(destination_search__contains=search_query)
+            # So'rov gazetteer'dagi joy bo'lsa ("lisboa", "NYC") — shu joyga bog'langan trip'lar ham
+            place_slug = match_slug(search_query, fuzzy=False)
+            if place_slug:
+                text_filter |= Q(place__slug=place_slug)
+            queryset = queryset.filter(text_filter)
+
+        # FILTER: bir nechta budjet tanlash mumkin (?budget=Economy&budget=Luxury)
+        budgets = self.selected_budgets()
+        if budgets:
+            queryset = queryset.filter(budget_type__in=budgets)
 
         return queryset
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user_trips = self.get_queryset()
+    def selected_budgets(self):
+        valid = {value for value, _ in Trip.BUDGET_CHOICES}
+        return [b for b in self.request.GET.getlist('budget') if b in valid]
 
-        # Stats...
-        total = user_trips.aggregate(Sum('budget_amount'))['budget_amount__sum']
-        context['total_budget'] = total if total else 0
-        context['favorites_count'] = user_trips.filter(is_favorite=True).count()
+    def get_view_mode(self):
+        # Faqat tanlangan ko'rinish (grid/list) render qilinadi
+        mode = self.request.COOKIES.get('travelScoutViewMode')
+        return mode if mode in ('grid', 'list') else 'grid'
 
-        # Top Destination...
-        top_dest_data = user_trips.values('destination') \
-            .annotate(num_trips=Count('destination')) \
-            .order_by('-num_trips') \
-            .first()
-        context['top_destination'] = top_dest_data['destination'] if top_dest_data else "No trips yet"
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Stats: butun trip tarixidan, bitta aggregate() bilan va keshdan (trips/stats.py)
+        context.update(get_dashboard_stats(self.request.user.id))
+        context['selected_budgets'] = self.selected_budgets()
+        context['view_mode'] = self.get_view_mode()
 
         # --- O'ZGARTIRILGAN QISM ---
         context['u_form'] = UserUpdateForm(instance=self.request.user)
@@ -100,103 +121,40 @@ class TripCreateView(LoginRequiredMixin, CreateView):
         # Ma'lumotlarni olamiz
         days = form.cleaned_data['duration_days']
         budget_type = form.cleaned_data['budget_type']
-        destination = form.cleaned_data['destination']
-        interests = form.cleaned_data['interests']
 
         cost_map = {'Economy': 100, 'Standard': 250, 'Luxury': 500}
         form.instance.budget_amount = cost_map.get(budget_type, 200) * days
 
-        # --- GROQ AI LOGIC ---
-        try:
-            api_key = getattr(settings, 'GROQ_API_KEY', None)
-
-            if api_key:
-                client = Groq(api_key=api_key)
-
-
-                prompt = f"""
-                                Act as a local travel expert. Generate a {days}-day itinerary for {destination}.
-                                Budget Level: {budget_type}. Interests: {interests}.
-
-                                CRITICAL INSTRUCTIONS FOR COST CALCULATION:
-                                1. Calculate TOTAL COST for ONE PERSON (Excluding Flights).
-                                2. Be CONSERVATIVE and REALISTIC. Do not overestimate.
-                                3. Logic:
-                                   - Economy: Hostels/Budget Hotels, Street Food, Public Transport. (~$50-$100/day excluding accommodation)
-                                   - Standard: 3-Star Hotels, Casual Dining, Mix of Taxi/Metro.
-                                   - Luxury: 4-5 Star Hotels, Fine Dining, Private Transport.
-
-                                4. RETURN ONLY RAW JSON. Format:
-                                {{
-                                  "estimated_cost": 800,  <-- Example: Moderate price for {days} days
-                                  "currency": "USD",
-                                  "days": [
-                                    {{
-                                      "day": 1,
-                                      "title": "Title",
-                                      "activities": [
-                                        {{
-                                          "time": "09:00",
-                                          "title": "Activity",
-                                          "description": "Short desc",
-                                          "location": "Loc",
-                                          "type": "morning",
-                                          "icon": "coffee", 
-                                          "cost": "$10"
-                                        }}
-                                      ]
-                                    }}
-                                  ]
-                                }}
-                                """
-                chat_completion = client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": "You are a JSON generator."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.5,
-                    response_format={"type": "json_object"}
-                )
-
-                ai_reply = chat_completion.choices[0].message.content
-                clean_json = ai_reply.replace("```json", "").replace("```", "").strip()
-                json_data = json.loads(clean_json)
-
-                # 2. ITINERARYNI SAQLASH
-                form.instance.itinerary = json.dumps(json_data)
-
-                # 3. NARXNI YANGILASH (Agar AI to'g'ri bersa)
-                try:
-                    raw_cost = json_data.get('estimated_cost')
-                    if raw_cost:
-                        # Har qanday belgilarni olib tashlab, faqat raqamni olamiz
-                        cost_str = str(raw_cost)
-                        clean_cost = re.sub(r'[^\d]', '', cost_str)
-
-                        final_cost = int(clean_cost)
-
-                        # Agar narx 0 dan katta bo'lsa, o'sha narxni olamiz!
-                        if final_cost > 0:
-                            form.instance.budget_amount = final_cost
-                            print(f"AI narxi qabul qilindi: ${final_cost}")
-                except Exception as cost_e:
-                    print(f"Narxni o'qishda xato: {cost_e}")
-                    # Xato bo'lsa, tepadagi Fixed narx o'zgarishsiz qoladi
-
-            else:
-                form.instance.itinerary = ""
-
-        except Exception as e:
-            print(f"AI Error: {e}")
-            form.instance.itinerary = ""
-            # Xato bo'lsa ham Fixed narx qolaveradi
-
-        return super().form_valid(form)
+        # Kesh: xuddi shu so'rov oldin generatsiya qilingan bo'lsa, Groq'siz darhol tayyor
+        cached = None
+        if not form.cleaned_data.get('force_regenerate'):
+            cached = itinerary_cache.lookup(
+                form.cleaned_data['destination'], days, budget_type, form.cleaned_data['interests']
+            )
+
+        if cached is not None:
+            form.instance.itinerary = cached.itinerary
+            form.instance.budget_amount = cached.estimated_cost
+            form.instance.generation_status = Trip.GENERATION_DONE
+            with transaction.atomic():
+                response = super().form_valid(form)
+                self.object.sync_itinerary_rows()
+            return response
+
+        # Trip darhol saqlanadi, itinerary esa fon ishchisida generatsiya qilinadi
+        form.instance.generation_status = Trip.GENERATION_PENDING
+        response = super().form_valid(form)
+        enqueue_generation(self.object.pk)
+        return response
 
     def get_success_url(self):
         return reverse('trip_detail', kwargs={'pk': self.object.pk})
 
+def itinerary_days(trip):
+    # Kunlar + aktivliklar 2 ta so'rovda, kunlik xarajat SQL'da hisoblanadi
+    return trip.days.annotate(total_cost=Sum('activities__cost_amount')).prefetch_related('activities')
+
+
 # 5. Detail View (MUHIM QISM)
 class TripDetailView(LoginRequiredMixin, DetailView):
     model = Trip
@@ -207,16 +165,11 @@ class TripDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # 1. JSON ni shu yerda Python Dictionaryga aylantiramiz
-        # Shunda template ichida 'load' qilish shart emas
-        try:
-            if self.object.itinerary:
-                context['itinerary_data'] = json.loads(self.object.itinerary)
-            else:
-                context['itinerary_data'] = None
-        except Exception as e:
-            print(f"JSON Parse Error: {e}")
-            context['itinerary_data'] = None
+        # 1. Itinerary endi JSONField + ItineraryDay/Activity jadvallarida — qayta parse qilish yo'q
+        context['itinerary_data'] = self.object.itinerary
+        context['itinerary_days'] = itinerary_days(self.object)
+        # Generatsiya paytida: SSE (faqat ASGI'da yoqilgan) yoki status polling
+        context['itinerary_streaming'] = settings.ITINERARY_STREAMING
 
         # 2. Interests stringini array (ro'yxat) qilamiz
         if self.object.interests:
@@ -226,6 +179,79 @@ class TripDetailView(LoginRequiredMixin, DetailView):
 
 
 
+# Itinerary holati (Detail sahifa shu endpointni polling qiladi)
+@login_required
+def trip_generation_status(request, pk):
+    status = Trip.objects.filter(pk=pk, user=request.user) \
+        .values_list('generation_status', flat=True) \
+        .first()
+    if status is None:
+        return JsonResponse({'status': 'error'}, status=404)
+
+    return JsonResponse({
+        'status': status,
+        'ready': status in (Trip.GENERATION_DONE, Trip.GENERATION_FAILED),
+    })
+
+
+def streamed_day(day):
+    return {
+        'day': day.number,
+        'title': day.title,
+        'activities': [
+            {'time': activity.time, 'title': activity.title, 'description': activity.description,
+             'location': activity.location, 'type': activity.type, 'icon': activity.icon, 'cost': activity.cost}
+            for activity in day.activities.all()
+        ],
+    }
+
+
+# Itinerary streaming (SSE). Faqat ASGI (config/asgi.py) ostida yoqiladi — u yerda worker bloklanmaydi.
+# Generatsiyani fon ishchisi bajaradi va kunlarni ItineraryDay qatorlariga yozadi (stream_itinerary),
+# shuning uchun ishchi boshqa jarayonda bo'lsa ham kunlar ko'rinadi.
+@login_required
+async def trip_itinerary_stream(request, pk):
+    if not settings.ITINERARY_STREAMING:
+        # WSGI: sahifa status polling'ga o'tadi
+        return JsonResponse({'status': 'error', 'message': 'Streaming is disabled'}, status=404)
+    user = await request.auser()
+    if not await Trip.objects.filter(pk=pk, user=user).aexists():
+        return JsonResponse({'status': 'error'}, status=404)
+
+    async def events():
+        last_pk = 0
+        sent = set()  # yuborilgan kun raqamlari — yakuniy qayta qurishda takrorlanmasin
+        started = time.monotonic()
+        last_beat = started
+
+        while time.monotonic() - started < settings.ITINERARY_STREAM_TIMEOUT:
+            status = await Trip.objects.filter(pk=pk).values_list('generation_status', flat=True).afirst()
+            if status in (Trip.GENERATION_DONE, Trip.GENERATION_FAILED, None):
+                yield f"event: {status or Trip.GENERATION_FAILED}\ndata: {{}}\n\n"
+                return
+
+            days = ItineraryDay.objects.filter(trip_id=pk, pk__gt=last_pk).order_by('pk').prefetch_related('activities')
+            async for day in days:
+                last_pk = day.pk
+                if day.number not in sent:
+                    sent.add(day.number)
+                    yield f"event: day\ndata: {json.dumps(streamed_day(day))}\n\n"
+
+            # Proxy ulanishni yopib qo'ymasligi uchun
+            if time.monotonic() - last_beat > 15:
+                yield ": keep-alive\n\n"
+                last_beat = time.monotonic()
+
+            await asyncio.sleep(0.25)
+
+        yield "event: timeout\ndata: {}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # 1. DELETE TRIP (Sahifaga o'tadigan qilish)
 @login_required
 def delete_trip(request, pk):
@@ -253,15 +279,10 @@ def share_trip_options(request, pk):
     })
 
 
+# Anonim tashrifchilar uchun to'liq sahifa keshi + ETag/304 (config/share_cache.py)
+@cache_share_page('trip', 'share_uuid')
 def public_trip_detail(request, share_uuid):
     trip = get_object_or_404(Trip, share_uuid=share_uuid)
-    # Detail View logikasini qaytaramiz (JSON parse)
-    itinerary_data = None
-    try:
-        if trip.itinerary:
-            itinerary_data = json.loads(trip.itinerary)
-    except:
-        pass
 
     clean_interests = []
     if trip.interests:
@@ -269,7 +290,8 @@ def public_trip_detail(request, share_uuid):
 
     return render(request, 'trip_detail.html', {
         'trip': trip,
-        'itinerary_data': itinerary_data,
+        'itinerary_data': trip.itinerary,
+        'itinerary_days': itinerary_days(trip),
         'clean_interests': clean_interests,
         'is_public': True
     })
@@ -283,10 +305,11 @@ def public_trip_detail(request, share_uuid):
 def toggle_favorite(request, pk):
     trip = get_object_or_404(Trip, pk=pk, user=request.user)
     trip.is_favorite = not trip.is_favorite
-    trip.save()
+    trip.save(update_fields=['is_favorite'])
 
     # YANGI QO'SHILGAN QISM: Foydalanuvchining jami likelarini sanaymiz
-    new_total_favorites = Trip.objects.filter(user=request.user, is_favorite=True).count()
+    # (save() signali keshni tozalagan — stats bitta aggregate bilan qayta hisoblanadi)
+    new_total_favorites = get_dashboard_stats(request.user.id)['favorites_count']
 
     return JsonResponse({
         'status': 'ok',
@@ -311,7 +334,9 @@ def profile_edit(request):
             # --- YANGI QISM: O'zgarish borligini tekshirish ---
             if u_form.has_changed() or p_form.has_changed():
                 u_form.save()
-                p_form.save()
+                # Rasm storage'ga (Cloudinary) shu yerda yuklanadi
+                with timed(settings.MEDIA_STORAGE):
+                    p_form.save()
                 # Faqat o'zgarish bo'lsa xabar chiqaramiz
                 messages.success(request, 'Your profile has been updated!')
 
@@ -341,4 +366,75 @@ def ajax_password_change(request):
         return JsonResponse({
             'status': 'error',
             'errors': form.errors.get_json_data()  # Xatolarni to'liq olamiz
-        }, status=400)
\ No newline at end of file
+        }, status=400)
+
+
+# --- EKSPORT (PDF / ICS / JSON) ---
+# Render fon ishchisida (trips/exports.py); sahifa status endpointini polling qiladi va tayyor bo'lgach yuklab oladi.
+
+def export_payload(export):
+    payload = {
+        'status': export.status,
+        'ready': export.is_ready,
+        'status_url': reverse('trip_export_status', args=[export.pk]),
+    }
+    if export.status == TripExport.STATUS_DONE:
+        payload['download_url'] = reverse('trip_export_download', args=[export.pk])
+    elif export.status == TripExport.STATUS_FAILED:
+        payload['error'] = 'Export failed. Please try again.'
+    return payload
+
+
+def _check_format(fmt):
+    if fmt not in exports.RENDERERS:
+        raise Http404("Unknown export format")
+
+
+@login_required
+@require_POST
+def trip_export(request, pk, fmt):
+    _check_format(fmt)
+    trip = get_object_or_404(Trip, pk=pk, user=request.user)
+    if trip.is_generating:
+        return JsonResponse({'status': 'error', 'message': 'Itinerary is still being generated'}, status=409)
+    return JsonResponse(export_payload(exports.request_export(request.user, fmt, trip=trip)))
+
+
+@login_required
+@require_POST
+def trips_export(request, fmt):
+    # Userning barcha triplari bitta faylda
+    _check_format(fmt)
+    return JsonResponse(export_payload(exports.request_export(request.user, fmt)))
+
+
+@login_required
+@require_GET
+def trip_export_status(request, export_id):
+    export = get_object_or_404(TripExport.objects.only('id', 'status'), pk=export_id, user=request.user)
+    return JsonResponse(export_payload(export))
+
+
+@login_required
+@require_GET
+def trip_export_download(request, export_id):
+    export = get_object_or_404(
+        TripExport.objects.select_related('trip'), pk=export_id, user=request.user, status=TripExport.STATUS_DONE
+    )
+    storage = exports.get_storage()
+    if not storage.exists(export.file_name):
+        # Fayl diskdan o'chirilgan (deploy/tozalash) — qayta navbatga qo'yib, status bilan javob beramiz
+        export.status = TripExport.STATUS_PENDING
+        export.save(update_fields=['status'])
+        exports.enqueue_export(export.pk)
+        return JsonResponse(export_payload(export), status=202)
+
+    response = FileResponse(
+        storage.open(export.file_name, 'rb'),
+        as_attachment=True,
+        filename=exports.download_filename(export),
+        content_type=exports.CONTENT_TYPES[export.format],
+    )
+    # Fayl nomi kontent hash'i — o'zgarmaydi
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response